@@ -37,3 +37,63 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+from unittest import mock  # noqa: E402
+
+import pytest  # noqa: E402
+from django.conf import settings  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.db import transaction  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+
+
+@pytest.fixture(scope='session', autouse=True)
+def shared_files(tmp_path_factory):
+    # Кэш, метрики и журнал медленных запросов живут в файлах SQLite в
+    # yatube/cache/, картинки — в yatube/media/: тесты пишут во временные
+    # каталоги, а не в файлы разработчика
+    from core import metrics, slow_queries
+    from core.sqlite import LocalConnection
+    directory = tmp_path_factory.mktemp('cache')
+    caches = {'default': {
+        **settings.CACHES['default'],
+        'LOCATION': str(directory / 'default.sqlite3'),
+    }}
+    media = tmp_path_factory.mktemp('media')
+    with override_settings(CACHES=caches, MEDIA_ROOT=str(media)), \
+            pytest.MonkeyPatch().context() as patch:
+        patch.setattr(metrics, 'store', metrics.Store(
+            path=str(directory / 'metrics.sqlite3')))
+        patch.setattr(slow_queries, 'journal', LocalConnection(
+            str(directory / 'slow_queries.sqlite3'), slow_queries.SCHEMA))
+        yield directory
+
+
+@pytest.fixture(autouse=True)
+def clear_cache(shared_files):
+    # Кэш общий для всех тестов сессии, поэтому очищаем его перед каждым
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def run_on_commit(request, monkeypatch):
+    # Обычный тест откатывает свою транзакцию и до COMMIT не доходит, а
+    # captureOnCommitCallbacks появился только в Django 3.2: выполняем
+    # колбэки сразу. В тестах с transaction=True работает настоящий COMMIT
+    marker = request.node.get_closest_marker('django_db')
+    if marker is not None and (
+            marker.kwargs.get('transaction') or marker.args[:1] == (True,)):
+        return
+    monkeypatch.setattr(
+        transaction, 'on_commit', lambda func, using=None: func())
+
+
+@pytest.fixture(autouse=True)
+def thumbnail_queue():
+    # Пул миниатюр запускает процессы через spawn, а они читают настоящие
+    # настройки: писали бы в yatube/db.sqlite3 и yatube/media/. В тестах
+    # очередь отключена, миниатюры создаёт thumbnails.generate напрямую
+    from posts import thumbnails
+    with mock.patch.object(thumbnails, 'schedule') as schedule:
+        yield schedule
@@ -3,6 +3,7 @@ import tempfile
 import pytest
 from mixer.backend.django import mixer as _mixer
 from posts.models import Post, Group
+from tests.utils import image_file
 
 
 @pytest.fixture()
@@ -23,6 +24,13 @@ def post(user):
     return Post.objects.create(text='Тестовый пост 1', author=user, image=image)
 
 
+@pytest.fixture
+def post_with_image(mock_media, user):
+    post = Post(text='Пост с картинкой', author=user)
+    post.image.save('image.png', image_file(), save=True)
+    return post
+
+
 @pytest.fixture
 def group():
     return Group.objects.create(title='Тестовая группа 1', slug='test-link', description='Тестовое описание группы')
@@ -0,0 +1,48 @@
+import pytest
+from django.core.management import call_command
+
+from posts.models import AuthorStats, Post
+
+pytestmark = [pytest.mark.django_db]
+
+
+def stats_of(user):
+    return AuthorStats.objects.get(user=user)
+
+
+class TestAuthorStats:
+
+    def test_post_counter(self, user):
+        post = Post.objects.create(text='Пост', author=user)
+        Post.objects.create(text='Ещё пост', author=user)
+        assert stats_of(user).post_count == 2, (
+            'Проверьте, что счётчик постов растёт при создании поста'
+        )
+        post.delete()
+        assert stats_of(user).post_count == 1, (
+            'Проверьте, что счётчик постов уменьшается при удалении поста'
+        )
+
+    def test_follow_counters(self, user_client, user, another_user):
+        user_client.get(f'/profile/{another_user.username}/follow/')
+        user_client.get(f'/profile/{another_user.username}/follow/')
+        assert stats_of(another_user).follower_count == 1
+        assert stats_of(user).following_count == 1
+        user_client.get(f'/profile/{another_user.username}/unfollow/')
+        assert stats_of(another_user).follower_count == 0
+        assert stats_of(user).following_count == 0
+
+    def test_profile_uses_counter(self, client, user):
+        Post.objects.create(text='Пост', author=user)
+        response = client.get(f'/profile/{user.username}/')
+        assert response.context['post_count'] == 1
+
+    def test_reconcile_command_repairs_drift(self, user, another_user):
+        Post.objects.create(text='Пост', author=user)
+        AuthorStats.objects.filter(user=user).update(post_count=42)
+        AuthorStats.objects.filter(user=another_user).delete()
+        call_command('reconcile_author_stats', batch_size=1)
+        assert stats_of(user).post_count == 1, (
+            'Проверьте, что `reconcile_author_stats` исправляет счётчики'
+        )
+        assert stats_of(another_user).post_count == 0
@@ -0,0 +1,68 @@
+import pytest
+
+from core import benchmark
+
+pytestmark = [pytest.mark.django_db]
+
+
+def report(p95, queries):
+    return {'results': {'small': {'posts:index': {
+        'p95_ms': p95, 'queries': queries}}}}
+
+
+class TestBenchmark:
+
+    def test_every_url_is_covered(self, post_with_group, user):
+        urls = benchmark.build_urls({
+            'username': user.username,
+            'slug': post_with_group.group.slug,
+            'post_id': post_with_group.pk,
+            'uidb64': 'MQ',
+            'token': 'token',
+        })
+        assert {'posts:index', 'posts:follow_index', 'users:login',
+                'about:tech'} <= set(urls), (
+            'Проверьте, что замеряются адреса posts, users и about'
+        )
+        assert 'users:logout' not in urls, (
+            'Проверьте, что адреса, меняющие состояние, не замеряются'
+        )
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        assert benchmark.percentile(values, 50) == 50
+        assert benchmark.percentile(values, 95) == 95
+        assert benchmark.percentile([3.0], 99) == 3.0
+        assert benchmark.percentile([5, 1, 3], 50) == 3, (
+            'Проверьте, что перцентиль считается по отсортированным значениям'
+        )
+
+    def test_measure(self, user_client, post):
+        result = benchmark.measure(user_client, '/', repeat=5, warmup=1)
+        assert result['status'] == 200
+        assert result['p50_ms'] <= result['p95_ms'] <= result['p99_ms']
+        assert result['alloc_peak_kb'] > 0
+        detail = benchmark.measure(
+            user_client, f'/posts/{post.pk}/', repeat=3, warmup=0)
+        assert detail['queries'] > 0
+        assert detail['template_ms'] > 0, (
+            'Проверьте, что время рендеринга шаблонов учитывается'
+        )
+
+    def test_cold_mode(self, client, post):
+        warm = benchmark.measure(client, '/', repeat=3, warmup=1)
+        cold = benchmark.measure(client, '/', repeat=3, warmup=1, cold=True)
+        assert cold['queries'] > warm['queries'], (
+            'Проверьте, что в холодном режиме страница собирается без кэша'
+        )
+
+    def test_compare(self):
+        baseline = report(10.0, 4)
+        assert benchmark.compare(report(12.0, 4), baseline) == []
+        assert benchmark.compare(report(10.5, 4), report(8.0, 4)) != []
+        assert benchmark.compare(report(1.2, 4), report(0.5, 4)) == [], (
+            'Проверьте, что небольшой рост времени не считается регрессией'
+        )
+        assert len(benchmark.compare(report(10.0, 5), baseline)) == 1, (
+            'Проверьте, что рост числа запросов считается регрессией'
+        )
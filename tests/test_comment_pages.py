@@ -0,0 +1,43 @@
+import pytest
+
+from posts.models import Comment
+from tests.utils import query_budget
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture
+def many_comments(post, user):
+    return [
+        Comment.objects.create(post=post, author=user, text=f'Комментарий {n}')
+        for n in range(45)
+    ]
+
+
+class TestCommentPages:
+
+    def test_post_detail_renders_first_page(self, client, post, many_comments):
+        response = client.get(f'/posts/{post.id}/')
+        comments = response.context['comments']
+        assert len(comments) == 20, (
+            'Проверьте, что на странице поста выводится только первая '
+            'порция комментариев'
+        )
+        assert list(comments) == many_comments[::-1][:20]
+        assert comments.next_cursor is not None
+
+    def test_fragment_returns_rest(self, client, post, many_comments):
+        cursor = client.get(f'/posts/{post.id}/').context['comments'].next_cursor
+        seen = []
+        while cursor:
+            with query_budget(3, '`/posts/<post_id>/comments/`'):
+                response = client.get(
+                    f'/posts/{post.id}/comments/', {'cursor': cursor})
+            assert response.status_code == 200
+            assert '<html' not in response.content.decode(), (
+                'Проверьте, что `/posts/<post_id>/comments/` отдаёт фрагмент'
+            )
+            page = response.context['comments']
+            seen.extend(page)
+            cursor = page.next_cursor
+        assert seen == many_comments[::-1][20:]
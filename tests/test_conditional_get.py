@@ -0,0 +1,110 @@
+import time
+
+import pytest
+from django.utils.http import http_date
+
+from posts.models import Comment, Follow, Post
+from tests.utils import query_budget
+
+pytestmark = [pytest.mark.django_db]
+
+
+def revalidate(client, url):
+    etag = client.get(url)['ETag']
+    return etag, client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+
+class TestConditionalGet:
+
+    @pytest.mark.parametrize('url', ['/', '/group/test-link/'])
+    def test_feed_not_modified(self, client, post_with_group, url):
+        response = client.get(url)
+        assert response.has_header('ETag'), (
+            f'Проверьте, что страница `{url}` отдаёт ETag'
+        )
+        assert response.has_header('Last-Modified'), (
+            f'Проверьте, что страница `{url}` отдаёт Last-Modified'
+        )
+        with query_budget(0, f'Повторный запрос `{url}` с If-None-Match'):
+            response = client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag'])
+        assert response.status_code == 304, (
+            f'Проверьте, что `{url}` отвечает 304, если лента не менялась'
+        )
+
+    def test_last_modified(self, client, post):
+        last_modified = client.get('/')['Last-Modified']
+        response = client.get('/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == 304
+        response = client.get(
+            '/', HTTP_IF_MODIFIED_SINCE=http_date(time.time() - 60))
+        assert response.status_code == 200, (
+            'Проверьте, что Last-Modified соответствует изменению ленты'
+        )
+
+    def test_new_post_changes_etag(self, client, post):
+        etag = client.get('/')['ETag']
+        Post.objects.create(text='Новый пост', author=post.author)
+        response = client.get('/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, (
+            'Проверьте, что новый пост меняет ETag главной страницы'
+        )
+        assert 'Новый пост' in response.content.decode()
+
+    def test_post_detail(self, client, post):
+        url = f'/posts/{post.pk}/'
+        etag, response = revalidate(client, url)
+        assert response.status_code == 304
+        Comment.objects.create(post=post, author=post.author, text='Ответ')
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, (
+            'Проверьте, что новый комментарий меняет ETag страницы поста'
+        )
+
+    def test_single_query(self, user_client, post):
+        url = f'/posts/{post.pk}/'
+        # Первый ответ ставит CSRF-cookie, а она входит в ETag
+        user_client.get(url)
+        etag = user_client.get(url)['ETag']
+        # Сессия и пользователь плюс один запрос для ETag
+        with query_budget(3, f'Запрос `{url}` с If-None-Match'):
+            response = user_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+
+    def test_profile_follow(self, user_client, another_user):
+        url = f'/profile/{another_user.username}/'
+        etag, response = revalidate(user_client, url)
+        assert response.status_code == 304
+        user_client.get(f'/profile/{another_user.username}/follow/')
+        response = user_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, (
+            'Проверьте, что подписка меняет ETag страницы профиля'
+        )
+
+    def test_missing_profile(self, client):
+        response = client.get('/profile/nobody/')
+        assert response.status_code == 404
+
+    def test_follow_feed_per_user(self, client, user, another_user, post):
+        client.force_login(user)
+        etag = client.get('/follow/')['ETag']
+        client.force_login(another_user)
+        response = client.get('/follow/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, (
+            'Проверьте, что ETag ленты подписок зависит от пользователя'
+        )
+        etag = response['ETag']
+        Follow.objects.create(user=another_user, author=user)
+        response = client.get('/follow/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, (
+            'Проверьте, что подписка меняет ETag ленты подписок'
+        )
+        assert post.text in response.content.decode()
+
+    def test_headers(self, user_client, post):
+        response = user_client.get('/')
+        assert 'Cookie' in response['Vary']
+        assert 'no-cache' in response['Cache-Control']
+        assert 'private' in response['Cache-Control'], (
+            'Проверьте, что страница пользователя не кэшируется прокси'
+        )
@@ -0,0 +1,58 @@
+import pytest
+
+from posts.models import Post
+from posts.paginators import CappedPaginator, CursorPaginator
+
+pytestmark = [pytest.mark.django_db]
+
+
+class TestCursorPaginator:
+
+    def walk(self, client, url):
+        seen = []
+        response = client.get(url, {'cursor': ''})
+        while True:
+            seen.extend(response.context['page_obj'])
+            next_cursor = response.context['next_cursor']
+            if next_cursor is None:
+                return seen
+            response = client.get(url, {'cursor': next_cursor})
+
+    def test_cursor_walks_whole_feed(self, client, few_posts_with_group):
+        expected = list(Post.objects.order_by('-pub_date', '-id'))
+        assert self.walk(client, '/') == expected, (
+            'Проверьте, что курсорная навигация по `/` выводит все посты '
+            'ровно один раз и в порядке публикации'
+        )
+        group = few_posts_with_group.group
+        assert self.walk(client, f'/group/{group.slug}/') == expected
+
+    def test_previous_cursor_returns_previous_page(self, few_posts_with_group):
+        paginator = CursorPaginator(Post.objects.all(), 5)
+        first = paginator.get_page(None)
+        second = paginator.get_page(first.next_cursor)
+        third = paginator.get_page(second.next_cursor)
+        back = paginator.get_page(third.previous_cursor)
+        assert list(back) == list(second), (
+            'Проверьте, что ссылка назад ведёт на предыдущую страницу'
+        )
+        assert not paginator.get_page(second.previous_cursor).has_previous()
+
+    def test_invalid_cursor_falls_back_to_first_page(
+            self, client, few_posts_with_group):
+        response = client.get('/', {'cursor': 'не-курсор'})
+        assert response.status_code == 200
+        assert len(response.context['page_obj']) == 10
+
+    def test_follow_feed_cursor(self, user_client,
+                                another_few_posts_with_group_with_follower):
+        assert len(self.walk(user_client, '/follow/')) == 20, (
+            'Проверьте курсорную навигацию по `/follow/`'
+        )
+
+    def test_page_number_is_capped(self, client, few_posts_with_group):
+        paginator = CappedPaginator(Post.objects.all(), 5, max_pages=2)
+        assert paginator.num_pages == 2
+        assert paginator.truncated
+        response = client.get('/', {'page': 1000})
+        assert response.context['page_obj'].number <= 50
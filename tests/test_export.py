@@ -0,0 +1,80 @@
+import csv
+import gzip
+import json
+
+import pytest
+from django.core.management import call_command
+
+from posts.models import Comment, Follow, Post
+
+pytestmark = [pytest.mark.django_db]
+
+
+def read_jsonl(path):
+    with open(path, encoding='utf-8') as stream:
+        return [json.loads(line) for line in stream]
+
+
+class TestExport:
+
+    def test_jsonl(self, tmp_path, user, another_user, post_with_group):
+        Comment.objects.create(
+            post=post_with_group, author=another_user, text='Отлично')
+        Follow.objects.create(user=another_user, author=user)
+        call_command(
+            'export_yatube', output=tmp_path, workers=1, stdout=None)
+        posts = read_jsonl(tmp_path / 'post.jsonl')
+        assert posts == [{
+            'id': post_with_group.pk,
+            'text': post_with_group.text,
+            'pub_date': post_with_group.pub_date.isoformat(),
+            'author': user.username,
+            'group': post_with_group.group.slug,
+            'image': post_with_group.image.name,
+        }], 'Проверьте, что посты выгружаются с естественными ключами'
+        comments = read_jsonl(tmp_path / 'comment.jsonl')
+        assert comments[0]['post'] == post_with_group.pk
+        assert comments[0]['author'] == another_user.username
+        follows = read_jsonl(tmp_path / 'follow.jsonl')
+        assert follows[0]['user'] == another_user.username
+        groups = read_jsonl(tmp_path / 'group.jsonl')
+        assert groups[0]['slug'] == post_with_group.group.slug
+        users = read_jsonl(tmp_path / 'user.jsonl')
+        assert 'password' not in users[0], (
+            'Проверьте, что пароли пользователей не выгружаются'
+        )
+
+    def test_csv_gzip_batches(self, tmp_path, user):
+        Post.objects.bulk_create(
+            Post(text=f'Пост {number}', author=user) for number in range(7))
+        call_command(
+            'export_yatube', 'post', output=tmp_path, format='csv',
+            gzip=True, batch_size=3, workers=1, stdout=None)
+        assert not (tmp_path / 'comment.csv.gz').exists()
+        with gzip.open(tmp_path / 'post.csv.gz', 'rt', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        assert [row['text'] for row in rows] == [
+            f'Пост {number}' for number in range(7)
+        ], 'Проверьте, что все порции выгружаются по порядку id'
+        assert rows[0]['group'] == ''
+
+    def test_incremental(self, tmp_path, user):
+        state = tmp_path / 'state.json'
+        first = Post.objects.create(text='Старый пост', author=user)
+        call_command(
+            'export_yatube', 'post', output=tmp_path, state=state,
+            workers=1, stdout=None)
+        assert json.loads(state.read_text())['post'] == first.pk
+        second = Post.objects.create(text='Новый пост', author=user)
+        call_command(
+            'export_yatube', 'post', output=tmp_path, state=state,
+            workers=1, stdout=None)
+        posts = read_jsonl(tmp_path / 'post.jsonl')
+        assert [post['id'] for post in posts] == [second.pk], (
+            'Проверьте, что с --state выгружаются только новые записи'
+        )
+        call_command(
+            'export_yatube', 'post', output=tmp_path, workers=1,
+            since=second.pub_date.isoformat(), stdout=None)
+        posts = read_jsonl(tmp_path / 'post.jsonl')
+        assert [post['id'] for post in posts] == [second.pk]
@@ -0,0 +1,73 @@
+import pytest
+from django.db import transaction
+from django.test import Client
+
+from posts import feed_cache, fragments
+from posts.models import Post
+from tests.utils import query_budget
+
+pytestmark = [pytest.mark.django_db]
+
+
+class TestFeedCache:
+
+    def test_index_is_cached(self, client, post):
+        client.get('/')
+        with query_budget(0, 'Повторный запрос `/` анонимом'):
+            response = client.get('/')
+        assert post.text in response.content.decode()
+
+    def test_new_post_invalidates_index(self, client, user, post):
+        client.get('/')
+        Post.objects.create(text='Совсем свежий пост', author=user)
+        response = client.get('/')
+        assert 'Совсем свежий пост' in response.content.decode(), (
+            'Проверьте, что новый пост сразу появляется на главной странице'
+        )
+
+    def test_deleted_post_invalidates_index(self, client, post):
+        client.get('/')
+        post.delete()
+        response = client.get('/')
+        assert post.text not in response.content.decode()
+
+    def test_cache_is_split_by_user(self, user_client, user, post):
+        user_client.get('/')
+        anonymous = Client()
+        content = anonymous.get('/').content.decode()
+        assert f'Пользователь: {user.username}' not in content, (
+            'Проверьте, что закэшированная для пользователя главная '
+            'страница не отдаётся анонимам'
+        )
+        assert 'Cookie' in anonymous.get('/')['Vary']
+
+    @pytest.mark.django_db(transaction=True)
+    def test_generation_bumped_after_commit(self, user):
+        before = feed_cache.get_generation()
+        with transaction.atomic():
+            Post.objects.create(text='Пост в транзакции', author=user)
+            assert feed_cache.get_generation() == before, (
+                'Проверьте, что поколение ленты меняется только после '
+                'COMMIT: иначе параллельный запрос закэширует старую '
+                'страницу под новым поколением'
+            )
+        assert feed_cache.get_generation() != before
+
+    def test_author_rename_invalidates_index(self, client, post):
+        client.get('/')
+        author = post.author
+        author.first_name = 'Переименованный'
+        author.save()
+        assert 'Переименованный' in client.get('/').content.decode(), (
+            'Проверьте, что новое имя автора сразу видно на главной'
+        )
+
+    def test_login_keeps_caches(self, client, user, post):
+        key = fragments.version_key('user', user.pk)
+        version = fragments.get_versions([key])[key]
+        generation = feed_cache.get_generation()
+        client.force_login(user)
+        assert fragments.get_versions([key])[key] == version, (
+            'Проверьте, что вход пользователя не сбрасывает его карточки'
+        )
+        assert feed_cache.get_generation() == generation
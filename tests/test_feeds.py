@@ -0,0 +1,97 @@
+import xml.etree.ElementTree as ElementTree
+
+import pytest
+from django.core.cache import cache
+
+from posts import feeds
+from posts.models import Post
+from tests.utils import query_budget
+
+pytestmark = [pytest.mark.django_db]
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+def read(response):
+    content = b''.join(response.streaming_content) if response.streaming \
+        else response.content
+    return ElementTree.fromstring(content)
+
+
+class TestFeeds:
+
+    def test_site_feed(self, client, post_with_group):
+        response = client.get('/feed/')
+        assert response.status_code == 200, (
+            'Проверьте, что страница `/feed/` доступна'
+        )
+        assert response.streaming, (
+            'Проверьте, что лента отдаётся через StreamingHttpResponse'
+        )
+        assert response['Content-Type'].startswith('application/atom+xml')
+        root = read(response)
+        entries = root.findall(f'{ATOM}entry')
+        assert len(entries) == 1
+        assert entries[0].find(f'{ATOM}summary').text == post_with_group.text
+        assert root.find(f'{ATOM}updated') is not None
+
+    def test_rss(self, client, post):
+        response = client.get('/feed/', {'format': 'rss'})
+        assert response['Content-Type'].startswith('application/rss+xml')
+        items = read(response).findall('channel/item')
+        assert [item.find('description').text for item in items] == [
+            post.text]
+
+    def test_group_and_profile(self, client, user, post, post_with_group):
+        group = post_with_group.group
+        root = read(client.get(f'/group/{group.slug}/feed/'))
+        assert len(root.findall(f'{ATOM}entry')) == 1, (
+            'Проверьте, что в ленте группы только посты группы'
+        )
+        root = read(client.get(f'/profile/{user.username}/feed/'))
+        assert len(root.findall(f'{ATOM}entry')) == 2
+        assert client.get('/group/missing/feed/').status_code == 404
+        assert client.get('/profile/nobody/feed/').status_code == 404
+
+    def test_bounded(self, client, user):
+        Post.objects.bulk_create(
+            Post(text=f'Пост {number}', author=user) for number in range(30))
+        root = read(client.get('/feed/'))
+        assert len(root.findall(f'{ATOM}entry')) == 20, (
+            'Проверьте, что в ленту попадает ограниченное число записей'
+        )
+
+    def test_cached_and_not_modified(self, client, user, post):
+        response = client.get(f'/profile/{user.username}/feed/')
+        body = read(response)
+        etag = response['ETag']
+        with query_budget(0, 'Повторный запрос ленты'):
+            cached = client.get(f'/profile/{user.username}/feed/')
+            not_modified = client.get(
+                f'/profile/{user.username}/feed/', HTTP_IF_NONE_MATCH=etag)
+        assert ElementTree.tostring(read(cached)) == \
+            ElementTree.tostring(body)
+        assert not_modified.status_code == 304, (
+            'Проверьте, что лента отвечает 304 на совпавший ETag'
+        )
+        cache.delete(feeds.feed_key(response.wsgi_request))
+        with query_budget(0, 'Запрос ленты с совпавшим ETag'):
+            not_modified = client.get(
+                f'/profile/{user.username}/feed/', HTTP_IF_NONE_MATCH=etag)
+        assert not_modified.status_code == 304, (
+            'Проверьте, что 304 не требует запросов, даже когда ленты нет '
+            'в кэше'
+        )
+
+    def test_new_post_changes_feed(self, client, user, post):
+        etag = client.get('/feed/')['ETag']
+        Post.objects.create(text='Свежий пост', author=user)
+        response = client.get('/feed/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        summaries = [
+            entry.find(f'{ATOM}summary').text
+            for entry in read(response).findall(f'{ATOM}entry')
+        ]
+        assert summaries[0] == 'Свежий пост', (
+            'Проверьте, что новый пост сразу появляется в ленте'
+        )
@@ -0,0 +1,65 @@
+import pytest
+from django.core.management import call_command
+
+from posts import thumbnails
+from posts.models import ImageBlob, Post
+from posts.storage import image_storage
+from tests.utils import create_post, image_file
+
+pytestmark = [pytest.mark.django_db]
+
+
+class TestImageBlobs:
+
+    def test_same_image_is_stored_once(self, mock_media, user_client):
+        create_post(user_client, 'Первый', image_file())
+        first = Post.objects.get(text='Первый')
+        create_post(user_client, 'Второй', image_file())
+        second = Post.objects.get(text='Второй')
+        assert first.image.name == second.image.name, (
+            'Проверьте, что одинаковые картинки хранятся одним файлом'
+        )
+        assert first.image_hash in first.image.name
+        assert ImageBlob.objects.get(name=first.image.name).refcount == 2
+        thumbnails.generate(first.image.name)
+        second.refresh_from_db()
+        assert second.variants, (
+            'Проверьте, что миниатюры общие у постов с одной картинкой'
+        )
+
+    def test_refcount_follows_posts(self, mock_media, user_client):
+        create_post(user_client, 'Пост', image_file())
+        post = Post.objects.get(text='Пост')
+        old_name = post.image.name
+        user_client.post(f'/posts/{post.id}/edit/', data={
+            'text': 'Пост', 'image': image_file(color=(0, 255, 0))})
+        post.refresh_from_db()
+        assert post.image.name != old_name
+        assert ImageBlob.objects.get(name=old_name).refcount == 0, (
+            'Проверьте, что замена картинки освобождает старый файл'
+        )
+        post.delete()
+        assert ImageBlob.objects.get(name=post.image.name).refcount == 0
+
+    def test_gc_deletes_unreferenced(self, mock_media, user_client):
+        create_post(user_client, 'Оставить', image_file())
+        kept = Post.objects.get(text='Оставить')
+        create_post(user_client, 'Удалить', image_file(color=(0, 0, 255)))
+        removed = Post.objects.get(text='Удалить')
+        thumbnails.generate(removed.image.name)
+        removed.refresh_from_db()
+        variant = next(iter(removed.variants.values()))['name']
+        removed.delete()
+        call_command('gc_image_blobs', grace=60, stdout=None)
+        assert image_storage.exists(removed.image.name), (
+            'Проверьте, что недавно изменённые файлы не удаляются'
+        )
+        call_command('gc_image_blobs', grace=0, stdout=None)
+        assert not image_storage.exists(removed.image.name), (
+            'Проверьте, что сборщик удаляет файлы без ссылок'
+        )
+        assert not image_storage.exists(variant), (
+            'Проверьте, что вместе с файлом удаляются его миниатюры'
+        )
+        assert not ImageBlob.objects.filter(name=removed.image.name).exists()
+        assert image_storage.exists(kept.image.name)
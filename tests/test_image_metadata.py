@@ -0,0 +1,77 @@
+import hashlib
+from unittest import mock
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from sorl.thumbnail import default
+
+from posts import feed_cache, fragments, thumbnails
+from posts.models import Post
+from tests.utils import image_file
+
+pytestmark = [pytest.mark.django_db]
+
+
+class TestImageMetadata:
+
+    def test_upload_fills_metadata(self, mock_media, user_client):
+        user_client.post('/create/', data={
+            'text': 'Пост с картинкой', 'image': image_file('upload.png')})
+        post = Post.objects.get(text='Пост с картинкой')
+        with post.image.open('rb'):
+            content = post.image.read()
+        assert (post.image_width, post.image_height) == (400, 600), (
+            'Проверьте, что при загрузке сохраняются размеры картинки'
+        )
+        assert post.image_size == len(content)
+        assert post.image_hash == hashlib.sha256(content).hexdigest()
+        assert post.variants == {}
+
+    def test_generate_records_variants(self, post_with_image):
+        key = fragments.version_key('post', post_with_image.pk)
+        version = fragments.get_versions([key])[key]
+        generation = feed_cache.get_generation()
+        thumbnails.generate(post_with_image.image.name)
+        post_with_image.refresh_from_db()
+        assert fragments.get_versions([key])[key] != version, (
+            'Проверьте, что готовые миниатюры сбрасывают карточку поста'
+        )
+        assert feed_cache.get_generation() == generation, (
+            'Проверьте, что запись миниатюр не сбрасывает кэш всех лент'
+        )
+        variant = post_with_image.variants[thumbnails.preset_key(
+            thumbnails.CARD_GEOMETRY, thumbnails.CARD_OPTIONS)]
+        assert (variant['width'], variant['height']) == (200, 300), (
+            'Проверьте, что готовые миниатюры записываются в пост'
+        )
+        kv_cache = default.kvstore.cache
+        with mock.patch.object(kv_cache, 'get_many') as get_many, \
+                CaptureQueriesContext(connection) as queries:
+            images = thumbnails.resolve([post_with_image.image])
+        assert not get_many.called and not queries, (
+            'Проверьте, что миниатюра из карты вариантов не требует '
+            'обращений к KV-хранилищу'
+        )
+        assert images[post_with_image.image.name].name == variant['name']
+
+    def test_backfill_command(self, post_with_image):
+        thumbnails.generate(post_with_image.image.name)
+        Post.objects.filter(pk=post_with_image.pk).update(image_variants='')
+        key = fragments.version_key('post', post_with_image.pk)
+        version = fragments.get_versions([key])[key]
+        call_command('backfill_image_metadata', workers=2, stdout=None)
+        post_with_image.refresh_from_db()
+        assert (post_with_image.image_width, post_with_image.image_height) == (
+            400, 600), (
+            'Проверьте, что команда заполняет метаданные старых картинок'
+        )
+        assert post_with_image.image_hash
+        assert thumbnails.preset_key(
+            thumbnails.CARD_GEOMETRY, thumbnails.CARD_OPTIONS
+        ) in post_with_image.variants
+        assert fragments.get_versions([key])[key] != version, (
+            'Проверьте, что команда сбрасывает закэшированные карточки '
+            'обновлённых постов'
+        )
@@ -0,0 +1,143 @@
+from unittest import mock
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+
+from posts import timeline
+from posts.models import AuthorStats, Comment, Follow, Group, Post, User
+
+pytestmark = [pytest.mark.django_db]
+
+
+def snapshot():
+    return {
+        'posts': sorted(Post.objects.values_list(
+            'text', 'pub_date', 'author__username', 'group__slug')),
+        'comments': sorted(Comment.objects.values_list(
+            'post__text', 'author__username', 'text', 'created')),
+        'follows': sorted(Follow.objects.values_list(
+            'user__username', 'author__username')),
+        'groups': sorted(Group.objects.values_list('slug', 'title')),
+    }
+
+
+class TestImport:
+
+    @pytest.mark.parametrize('file_format', ['jsonl', 'csv'])
+    def test_round_trip(self, tmp_path, user, another_user, group,
+                        file_format):
+        post = Post.objects.create(text='Пост', author=user, group=group)
+        Post.objects.create(text='Без группы', author=another_user)
+        Comment.objects.create(post=post, author=another_user, text='Ок')
+        Follow.objects.create(user=another_user, author=user)
+        call_command(
+            'export_yatube', output=tmp_path, format=file_format,
+            gzip=True, workers=1, stdout=None)
+        before = snapshot()
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+        User.objects.all().delete()
+        call_command(
+            'import_yatube', str(tmp_path), batch_size=1,
+            transaction_size=2, stdout=None)
+        assert snapshot() == before, (
+            'Проверьте, что после выгрузки и загрузки данные совпадают'
+        )
+        stats = AuthorStats.objects.get(user__username=user.username)
+        assert (stats.post_count, stats.follower_count) == (1, 1), (
+            'Проверьте, что после загрузки пересчитываются счётчики авторов'
+        )
+        reader = User.objects.get(username=another_user.username)
+        assert reader.timeline.count() == 1, (
+            'Проверьте, что после загрузки пересобираются ленты подписок'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_defer_indexes(self, tmp_path, user):
+        Post.objects.create(text='Пост', author=user)
+        call_command('export_yatube', output=tmp_path, workers=1,
+                     stdout=None)
+        Post.objects.all().delete()
+        call_command(
+            'import_yatube', str(tmp_path), defer_indexes=True, stdout=None)
+        assert Post.objects.filter(text='Пост').exists()
+        indexes = {index.name for index in Post._meta.indexes}
+        with connection.cursor() as cursor:
+            existing = set(connection.introspection.get_constraints(
+                cursor, Post._meta.db_table))
+        assert indexes <= existing, (
+            'Проверьте, что после загрузки индексы построены заново'
+        )
+
+    def test_import_twice(self, tmp_path, user, another_user):
+        post = Post.objects.create(text='Пост', author=user)
+        Comment.objects.create(post=post, author=another_user, text='Ок')
+        Follow.objects.create(user=another_user, author=user)
+        call_command('export_yatube', output=tmp_path, workers=1,
+                     stdout=None)
+        before = snapshot()
+        for _ in range(2):
+            call_command('import_yatube', str(tmp_path), stdout=None)
+        assert User.objects.count() == 2, (
+            'Проверьте, что существующие пользователи не создаются заново'
+        )
+        assert snapshot() == before, (
+            'Проверьте, что повторная загрузка не дублирует посты и '
+            'комментарии'
+        )
+        assert another_user.timeline.count() == 1
+        assert AuthorStats.objects.get(user=user).post_count == 1
+
+    def test_finish_touches_only_imported(self, tmp_path, user, another_user):
+        Post.objects.create(text='Пост', author=user)
+        call_command('export_yatube', output=tmp_path, workers=1,
+                     stdout=None)
+        Post.objects.all().delete()
+        reader = User.objects.create(username='reader')
+        Follow.objects.create(user=reader, author=user)
+        Follow.objects.create(user=user, author=another_user)
+        with mock.patch.object(
+                timeline, 'rebuild', wraps=timeline.rebuild) as rebuild:
+            call_command('import_yatube', str(tmp_path), stdout=None)
+        rebuilt = {
+            user_id for call in rebuild.call_args_list
+            for user_id in call[1]['users']
+        }
+        assert rebuilt == {reader.pk}, (
+            'Проверьте, что после загрузки пересобираются ленты только '
+            'подписчиков загруженных авторов'
+        )
+        assert reader.timeline.count() == 1
+
+
+class TestSeed:
+
+    def seed(self):
+        call_command(
+            'seed_yatube', users=30, groups=3, posts=60, comments=80,
+            follows=50, celebrities=2, image_share=0.2, workers=1,
+            seed=7, stdout=None)
+
+    def test_seed(self, mock_media):
+        self.seed()
+        assert User.objects.count() == 30
+        assert Post.objects.count() == 60
+        assert Comment.objects.count() == 80
+        top = AuthorStats.objects.order_by('-follower_count').first()
+        assert top.user.username in ('user0', 'user1'), (
+            'Проверьте, что у знаменитостей больше всего подписчиков'
+        )
+        with_image = Post.objects.exclude(image='')
+        assert with_image.exists()
+        assert not with_image.filter(image_width=None).exists()
+
+    def test_deterministic(self, mock_media):
+        self.seed()
+        first = snapshot()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.seed()
+        assert snapshot() == first, (
+            'Проверьте, что данные с одинаковым seed совпадают'
+        )
@@ -0,0 +1,90 @@
+from unittest import mock
+
+import pytest
+from django.test import Client
+
+from core import metrics
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture(autouse=True)
+def clean_store():
+    metrics.store.clear()
+
+
+class TestMetrics:
+
+    def test_view_metrics(self, client, post):
+        client.get('/')
+        client.get(f'/posts/{post.pk}/')
+        response = client.get('/metrics')
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('text/plain')
+        text = response.content.decode()
+        assert (
+            'yatube_requests_total{method="GET",status="200",'
+            'view="posts:index"} 1'
+        ) in text, 'Проверьте, что запросы считаются по имени view'
+        assert (
+            'yatube_request_duration_seconds_bucket'
+            '{view="posts:index",le="+Inf"} 1'
+        ) in text, 'Проверьте, что корзины гистограммы накопительные'
+        assert 'yatube_request_duration_seconds_count{view="posts:index"} 1' \
+            in text
+        assert 'yatube_response_size_bytes_sum{view="posts:post_detail"}' \
+            in text
+        assert 'yatube_db_queries_total{view="posts:post_detail"}' in text
+        assert 'yatube_cache_requests_total{result="hit"}' in text
+        metrics.count_thumbnails(5, 1, 4)
+        text = client.get('/metrics').content.decode()
+        assert '\nyatube_thumbnail_round_trips_saved_total 4\n' in text, (
+            'Проверьте, что метрики без меток выводятся без фигурных скобок'
+        )
+        assert '# TYPE yatube_request_duration_seconds histogram' in text
+
+    def test_shared_store(self, tmp_path):
+        path = str(tmp_path / 'metrics.sqlite3')
+        first = metrics.Store(path, flush_interval=0)
+        second = metrics.Store(path, flush_interval=60)
+        key = ('yatube_requests_total', metrics.labels(view='posts:index'))
+        first.add({key: 2})
+        second.add({key: 3})
+        assert second.collect() == [(key[0], key[1], 5)], (
+            'Проверьте, что счётчики воркеров складываются в общем хранилище'
+        )
+
+    def test_flush_without_upsert(self, tmp_path):
+        store = metrics.Store(str(tmp_path / 'metrics.sqlite3'))
+        statements = []
+        store.db.set_trace_callback(statements.append)
+        for value in (1, 2):
+            store.add({('yatube_requests_total', ''): value})
+            store.flush()
+        assert store.collect() == [('yatube_requests_total', '', 3)]
+        assert not any('ON CONFLICT' in sql for sql in statements), (
+            'Проверьте, что сброс счётчиков работает без UPSERT '
+            '(его нет в SQLite до 3.24)'
+        )
+
+    def test_metrics_not_public(self):
+        client = Client(REMOTE_ADDR='10.0.0.1')
+        assert client.get('/metrics').status_code == 404, (
+            'Проверьте, что /metrics доступен только с разрешённых адресов'
+        )
+
+    def test_metrics_token(self):
+        client = Client()
+        with mock.patch.object(metrics, 'TOKEN', 'secret'):
+            assert client.get('/metrics').status_code == 404, (
+                'Проверьте, что с токеном адрес клиента не даёт доступа: '
+                'за прокси он всегда один'
+            )
+            assert client.get(
+                '/metrics', HTTP_AUTHORIZATION='Bearer wrong'
+            ).status_code == 404
+            assert client.get(
+                '/metrics', HTTP_AUTHORIZATION='Bearer secret'
+            ).status_code == 200, (
+                'Проверьте, что /metrics открывается по токену'
+            )
@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from django.db import connection
+
+from core.database import apply_pragmas
+
+MANAGE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'yatube')
+
+
+def perf_check(profile):
+    env = dict(os.environ, YATUBE_PROFILE=profile,
+               SECRET_KEY=os.getenv('SECRET_KEY') or 'perf-check')
+    env.pop('DJANGO_SETTINGS_MODULE', None)
+    return subprocess.run(
+        [sys.executable, 'manage.py', 'perf_check'],
+        cwd=MANAGE_DIR, env=env, capture_output=True, text=True,
+    )
+
+
+class TestPerfCheck:
+
+    def test_development_profile_reported(self):
+        result = perf_check('development')
+        assert result.returncode != 0, (
+            'Проверьте, что perf_check завершается с ошибкой при '
+            'настройках разработки'
+        )
+        for check_id in ('W001', 'W002', 'W003', 'W004', 'W005', 'W007'):
+            assert f'yatube.{check_id}' in result.stderr, (
+                f'Проверьте, что perf_check сообщает yatube.{check_id}'
+            )
+
+    def test_production_profile_clean(self):
+        result = perf_check('production')
+        assert result.returncode == 0, result.stderr
+        assert 'no issues' in result.stdout, (
+            'Проверьте, что профиль production проходит perf_check'
+        )
+
+    @pytest.mark.django_db
+    def test_sqlite_pragmas(self, settings):
+        settings.SQLITE_PRAGMAS = {'cache_size': -1234}
+        apply_pragmas(sender=None, connection=connection)
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA cache_size')
+            assert cursor.fetchone()[0] == -1234, (
+                'Проверьте, что прагмы SQLITE_PRAGMAS применяются к '
+                'соединению'
+            )
@@ -0,0 +1,46 @@
+from unittest import mock
+
+import pytest
+
+from posts import fragments
+from posts.models import Post
+
+pytestmark = [pytest.mark.django_db]
+
+
+class TestPostCards:
+
+    def posts(self):
+        return list(Post.objects.select_related('author', 'group'))
+
+    def test_cards_are_cached(self, post_with_group):
+        first = fragments.render_cards(self.posts())
+        with mock.patch.object(fragments, 'render_to_string') as render:
+            second = fragments.render_cards(self.posts())
+        assert not render.called, (
+            'Проверьте, что карточка поста берётся из кэша, а не рендерится'
+        )
+        assert first == second
+
+    def test_post_edit_invalidates_card(self, post_with_group):
+        fragments.render_cards(self.posts())
+        post_with_group.text = 'Исправленный текст'
+        post_with_group.save()
+        [card] = fragments.render_cards(self.posts())
+        assert 'Исправленный текст' in card
+
+    def test_group_and_author_invalidate_card(self, post_with_group):
+        fragments.render_cards(self.posts())
+        group = post_with_group.group
+        group.title = 'Новое название'
+        group.save()
+        author = post_with_group.author
+        author.first_name = 'Лев'
+        author.save()
+        [card] = fragments.render_cards(self.posts())
+        assert 'Новое название' in card
+        assert 'Лев' in card
+
+    def test_feed_pages_render_cards(self, client, post_with_group):
+        response = client.get(f'/group/{post_with_group.group.slug}/')
+        assert post_with_group.text in response.content.decode()
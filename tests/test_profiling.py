@@ -0,0 +1,82 @@
+import pstats
+
+import pytest
+from django.test import Client
+
+from core import profiling
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture(autouse=True)
+def spool(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, 'SPOOL_DIR', str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def staff_client(client, user):
+    user.is_staff = True
+    user.save()
+    client.force_login(user)
+    return client
+
+
+class TestProfiling:
+
+    def test_not_triggered(self, client, user_client, post, spool):
+        client.get('/')
+        user_client.get('/?_profile=1')
+        client.get('/', HTTP_X_PROFILE='подделка')
+        assert not list(spool.iterdir()), (
+            'Проверьте, что без токена или прав сотрудника запрос '
+            'не профилируется'
+        )
+
+    def test_flag_is_exact_parameter(self, staff_client, post, spool):
+        staff_client.get('/?x_profile=1')
+        staff_client.get('/search/', {'q': '_profile=1'})
+        assert not list(spool.iterdir()), (
+            'Проверьте, что профилирование включает только параметр '
+            '_profile, а не подстрока в строке запроса'
+        )
+
+    def test_signed_header(self, client, post, spool):
+        response = client.get(
+            f'/posts/{post.pk}/', HTTP_X_PROFILE=profiling.make_token())
+        name = response['X-Profile-File']
+        assert 'posts.post_detail' in name, (
+            'Проверьте, что файл профиля помечен именем view'
+        )
+        stats = pstats.Stats(str(spool / name))
+        assert stats.total_calls > 0
+
+    def test_staff_flag_sampling(self, staff_client, post, spool,
+                                 monkeypatch):
+        monkeypatch.setattr(profiling, 'SAMPLE_INTERVAL', 0.0005)
+        response = staff_client.get('/?_profile=sample')
+        name = response['X-Profile-File']
+        assert name.endswith('.folded')
+        lines = (spool / name).read_text().splitlines()
+        for line in lines:
+            stack, count = line.rsplit(' ', 1)
+            assert int(count) > 0 and stack, (
+                'Проверьте формат свёрнутых стеков для flamegraph'
+            )
+
+    def test_list_and_download(self, staff_client, another_user, post):
+        name = staff_client.get('/?_profile=1')['X-Profile-File']
+        response = staff_client.get('/profiles/')
+        assert name in response.content.decode(), (
+            'Проверьте, что профиль виден в списке'
+        )
+        response = staff_client.get(f'/profiles/{name}')
+        assert response.status_code == 200
+        assert b''.join(response.streaming_content)
+        assert staff_client.get('/profiles/..%2Fsettings.prof') \
+            .status_code == 404
+        other = Client()
+        other.force_login(another_user)
+        assert other.get('/profiles/').status_code == 302, (
+            'Проверьте, что список профилей доступен только сотрудникам'
+        )
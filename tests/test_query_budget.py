@@ -0,0 +1,68 @@
+import pytest
+from django.contrib.auth import get_user_model
+
+from posts.models import Comment, Follow, Group, Post
+from tests.utils import query_budget
+
+pytestmark = [pytest.mark.django_db]
+
+User = get_user_model()
+
+# Сессия и пользователь — 2 запроса, дальше запросы самой страницы.
+# Профиль и пост тратят ещё один запрос на ETag (posts/conditional.py)
+BUDGETS = {
+    'index': 4,
+    'group_list': 5,
+    'profile': 8,
+    'post_detail': 6,
+    'follow_index': 4,
+}
+
+
+@pytest.fixture
+def feed_data(user):
+    def make(size):
+        author = User.objects.create_user(username=f'author_{size}')
+        group = Group.objects.create(
+            title=f'Группа {size}', slug=f'group-{size}', description='-')
+        Follow.objects.create(user=user, author=author)
+        for number in range(size):
+            post = Post.objects.create(
+                text=f'Пост {number}', author=author, group=group)
+            commenter = User.objects.create_user(
+                username=f'reader_{size}_{number}')
+            Comment.objects.create(post=post, author=commenter, text='Ок')
+        return {
+            'index': '/',
+            'group_list': f'/group/{group.slug}/',
+            'profile': f'/profile/{author.username}/',
+            'post_detail': f'/posts/{post.id}/',
+            'follow_index': '/follow/',
+        }
+    return make
+
+
+class TestQueryBudget:
+
+    def count_queries(self, client, url, budget, label):
+        with query_budget(budget, label) as queries:
+            response = client.get(url)
+        assert response.status_code == 200, url
+        return len(queries)
+
+    @pytest.mark.parametrize('view_name', BUDGETS)
+    def test_view_query_count_does_not_grow(
+            self, user_client, feed_data, view_name):
+        small = feed_data(1)[view_name]
+        budget = BUDGETS[view_name]
+        small_count = self.count_queries(
+            user_client, small, budget, f'`{small}`')
+        Post.objects.all().delete()
+        large = feed_data(15)[view_name]
+        large_count = self.count_queries(
+            user_client, large, budget, f'`{large}`')
+        assert small_count == large_count, (
+            f'Число запросов страницы `{view_name}` растёт вместе с числом '
+            f'записей: {small_count} -> {large_count}. '
+            'Проверьте select_related/prefetch_related'
+        )
@@ -0,0 +1,81 @@
+import re
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from posts.models import Comment
+
+pytestmark = [pytest.mark.django_db]
+
+# Таблицы, которые растут вместе с сайтом: по ним полный скан недопустим
+BIG_TABLES = (
+    'posts_post', 'posts_comment', 'posts_follow', 'posts_timelineentry',
+)
+FULL_SCAN = re.compile(r'\bSCAN (TABLE )?(\w+)(?! USING)')
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def bad_steps(sql):
+    problems = []
+    for step in explain(sql):
+        if 'TEMP B-TREE' in step:
+            problems.append(step)
+        match = FULL_SCAN.search(step)
+        if match and match.group(2) in BIG_TABLES and 'USING' not in step:
+            problems.append(step)
+    return problems
+
+
+class TestQueryPlan:
+
+    @pytest.fixture
+    def feed_urls(self, another_few_posts_with_group_with_follower,
+                  post_with_group, another_user):
+        post = another_user.posts.first()
+        Comment.objects.create(post=post, author=another_user, text='Текст')
+        group = post.group
+        return [
+            '/',
+            '/?page=2',
+            f'/group/{group.slug}/',
+            f'/group/{group.slug}/?page=2',
+            f'/profile/{another_user.username}/',
+            f'/profile/{another_user.username}/?page=2',
+            f'/posts/{post.id}/',
+            '/follow/',
+            '/follow/?page=2',
+        ]
+
+    def check(self, client, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        assert response.status_code == 200, url
+        next_cursor = response.context.get('next_cursor')
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            problems = bad_steps(sql)
+            assert not problems, (
+                f'Запрос страницы `{url}` читает таблицу без подходящего '
+                f'индекса: {problems}\n{sql}'
+            )
+        return next_cursor
+
+    def test_feed_queries_use_indexes(self, user_client, feed_urls):
+        for url in feed_urls:
+            self.check(user_client, url)
+
+    def test_cursor_queries_use_indexes(self, user_client, feed_urls):
+        for url in ('/', '/follow/'):
+            cursor = self.check(user_client, f'{url}?cursor=')
+            if cursor:
+                self.check(user_client, f'{url}?cursor={cursor}')
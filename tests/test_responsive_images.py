@@ -0,0 +1,46 @@
+import os
+
+import pytest
+from PIL import features
+
+from posts import feed_cache, thumbnails
+
+pytestmark = [pytest.mark.django_db]
+
+
+class TestResponsiveImages:
+
+    def test_variants_have_predictable_names(self, post_with_image):
+        thumbnails.generate(post_with_image.image.name)
+        post_with_image.refresh_from_db()
+        variants = post_with_image.variants
+        stem = os.path.splitext(post_with_image.image.name)[0]
+        directory = stem.replace('posts/', 'posts/variants/', 1) + '/'
+        for width in thumbnails.SRCSET_WIDTHS:
+            stored = variants[f'{width}x{width * 3 // 2}.jpg']
+            assert stored['name'].startswith(directory), (
+                'Проверьте, что варианты картинки лежат в '
+                '`posts/variants/<имя картинки>/`'
+            )
+            assert stored['width'] == width
+        has_webp = any(key.endswith('.webp') for key in variants)
+        assert has_webp == features.check('webp'), (
+            'Проверьте, что WebP-варианты создаются, когда Pillow их '
+            'поддерживает'
+        )
+
+    def test_card_renders_srcset(self, client, post_with_image):
+        content = client.get('/').content.decode()
+        assert 'srcset' not in content
+        thumbnails.generate(post_with_image.image.name)
+        # Готовые миниатюры сбрасывают только карточку поста, а страница
+        # ленты с оригиналом живёт до смены поколения
+        feed_cache.bump_generation()
+        content = client.get('/').content.decode()
+        assert 'srcset="' in content, (
+            'Проверьте, что карточка выводит адаптивные варианты картинки'
+        )
+        assert 'loading="lazy"' in content
+        assert 'decoding="async"' in content
+        for width in thumbnails.SRCSET_WIDTHS:
+            assert f' {width}w' in content
@@ -0,0 +1,83 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from posts.models import Group, Post
+from posts.search import search_posts
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture
+def cats(user):
+    group = Group.objects.create(
+        title='Котики', slug='cats', description='Всё про котов')
+    return {
+        'text': Post.objects.create(
+            text='Мой кот <b>Барсик</b> спит', author=user),
+        'group': Post.objects.create(
+            text='Фото с прогулки', author=user, group=group),
+        'other': Post.objects.create(text='Про собак', author=user),
+    }
+
+
+class TestSearch:
+
+    def test_ranked_and_highlighted(self, client, cats):
+        response = client.get('/search/', {'q': 'кот'})
+        assert response.status_code == 200
+        found = list(response.context['page_obj'])
+        assert found == [cats['text'], cats['group']], (
+            'Проверьте, что совпадение в тексте поста ранжируется выше '
+            'совпадения в группе, а посты без совпадений не выводятся'
+        )
+        snippet = found[0].snippet
+        assert '<mark>кот</mark>' in snippet, (
+            'Проверьте, что совпадения выделяются в сниппете'
+        )
+        assert '&lt;b&gt;' in snippet, (
+            'Проверьте, что текст поста в сниппете экранируется'
+        )
+
+    def test_index_follows_changes(self, cats):
+        group = cats['group'].group
+        group.title = 'Птички'
+        group.description = 'Всё про птиц'
+        group.save()
+        assert list(search_posts('кот')) == [cats['text']]
+        assert list(search_posts('птички')) == [cats['group']]
+        cats['other'].text = 'Про котят'
+        cats['other'].save()
+        assert cats['other'] in list(search_posts('кот'))
+        cats['text'].delete()
+        assert cats['text'] not in list(search_posts('кот'))
+
+    def test_keyset_pages(self, user):
+        posts = [
+            Post.objects.create(text=f'Поиск номер {n}', author=user)
+            for n in range(25)
+        ]
+        seen, cursor = [], None
+        while True:
+            page = search_posts('поиск', cursor, per_page=10)
+            seen.extend(page)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        assert sorted(post.id for post in seen) == [
+            post.id for post in posts], (
+            'Проверьте, что страницы поиска не теряют и не повторяют посты'
+        )
+
+    def test_admin_uses_index(self, client, django_user_model, cats):
+        admin = django_user_model.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        client.force_login(admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/admin/posts/post/', {'q': 'кот'})
+        assert set(response.context['cl'].result_list) == {
+            cats['text'], cats['group']}
+        sql = ' '.join(query['sql'] for query in queries)
+        assert 'posts_search' in sql and 'LIKE' not in sql, (
+            'Проверьте, что поиск в админке идёт по FTS5-индексу'
+        )
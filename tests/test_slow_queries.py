@@ -0,0 +1,105 @@
+import sqlite3
+from io import StringIO
+from unittest import mock
+
+import pytest
+from django.core.management import call_command
+
+from core import slow_queries
+from core.sqlite import LocalConnection
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture(autouse=True)
+def journal(tmp_path, monkeypatch):
+    monkeypatch.setattr(slow_queries, 'journal', LocalConnection(
+        str(tmp_path / 'slow.sqlite3'), slow_queries.SCHEMA))
+    # Медленным считается любой запрос
+    monkeypatch.setattr(slow_queries, 'THRESHOLD_MS', 0)
+    slow_queries.clear()
+
+
+def samples():
+    return slow_queries.db().execute(
+        'SELECT fingerprint, view, plan FROM slow_query_samples'
+    ).fetchall()
+
+
+class TestSlowQueries:
+
+    def test_fingerprint(self):
+        first = slow_queries.normalize(
+            "SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'a''b' "
+            'LIMIT 10')
+        second = slow_queries.normalize(
+            "SELECT *  FROM t WHERE id IN (%s) AND name = 'c'\nLIMIT 20")
+        assert first == second == (
+            'SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?'
+        ), 'Проверьте, что отпечаток не зависит от значений и длины IN'
+        assert slow_queries.fingerprint('SELECT 1 FROM t1') == \
+            slow_queries.fingerprint('SELECT 2 FROM t1')
+
+    def test_view_queries_logged_with_plan(self, client, post):
+        client.get(f'/profile/{post.author.username}/')
+        rows = samples()
+        assert rows, 'Проверьте, что медленные запросы попадают в журнал'
+        assert {view for _, view, _ in rows} == {'posts:profile'}, (
+            'Проверьте, что запрос записывается с именем view'
+        )
+        assert any(
+            'SCAN' in plan or 'SEARCH' in plan for _, _, plan in rows
+        ), 'Проверьте, что к запросу сохраняется EXPLAIN QUERY PLAN'
+
+    def test_rate_limit(self, client, post):
+        url = f'/posts/{post.pk}/'
+        client.get(url)
+        logged = len(samples())
+        counts = dict(slow_queries.db().execute(
+            'SELECT fingerprint, count FROM slow_query_stats').fetchall())
+        client.get(url)
+        assert len(samples()) == logged, (
+            'Проверьте, что повторный отпечаток не пишется в журнал чаще '
+            'SLOW_QUERY_RATE_LIMIT'
+        )
+        repeated = dict(slow_queries.db().execute(
+            'SELECT fingerprint, count FROM slow_query_stats').fetchall())
+        assert any(
+            repeated[key] > count for key, count in counts.items()
+        ), 'Проверьте, что подавленные повторы всё равно учитываются'
+
+    def test_report_command(self, client, post):
+        client.get(f'/profile/{post.author.username}/')
+        out = StringIO()
+        call_command('slow_queries', '--plans', '--order', 'count',
+                     stdout=out)
+        text = out.getvalue()
+        assert 'view: posts:profile' in text
+        key = samples()[0][0]
+        assert key in text, 'Проверьте, что отчёт группирует по отпечатку'
+        call_command('slow_queries', '--clear', stdout=StringIO())
+        out = StringIO()
+        call_command('slow_queries', stdout=out)
+        assert 'Медленных запросов нет' in out.getvalue()
+
+    def test_stats_without_upsert(self, client, post):
+        statements = []
+        slow_queries.db().set_trace_callback(statements.append)
+        for _ in range(2):
+            client.get(f'/posts/{post.pk}/')
+        assert slow_queries.report(order='count')[0]['count'] >= 2
+        assert not any('ON CONFLICT' in sql for sql in statements), (
+            'Проверьте, что журнал пишется без UPSERT '
+            '(его нет в SQLite до 3.24)'
+        )
+
+    def test_journal_errors_do_not_break_view(self, client, post):
+        broken = mock.Mock()
+        broken.get.side_effect = sqlite3.OperationalError('disk I/O error')
+        with mock.patch.object(slow_queries, 'journal', broken), \
+                mock.patch.object(slow_queries.logger, 'exception') as log:
+            response = client.get(f'/posts/{post.pk}/')
+        assert response.status_code == 200, (
+            'Проверьте, что ошибка записи в журнал не доходит до view'
+        )
+        assert log.called, 'Проверьте, что ошибка журнала логируется'
@@ -0,0 +1,79 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from core.cache.sqlite import SQLiteCache
+
+
+@pytest.fixture
+def make_cache(tmp_path):
+    def make(**options):
+        params = {'TIMEOUT': 60, 'OPTIONS': options}
+        return SQLiteCache(str(tmp_path / 'cache.sqlite3'), params)
+    return make
+
+
+class TestSQLiteCache:
+
+    def test_get_set_delete(self, make_cache):
+        cache = make_cache()
+        cache.set('key', {'value': [1, 2]})
+        assert cache.get('key') == {'value': [1, 2]}
+        cache.delete('key')
+        assert cache.get('key', 'нет') == 'нет'
+
+    def test_shared_between_instances(self, make_cache):
+        # Два экземпляра на одном файле — как два воркера WSGI
+        first, second = make_cache(), make_cache()
+        first.set('key', 'value')
+        assert second.get('key') == 'value'
+        second.delete('key')
+        assert first.get('key') is None
+
+    def test_many(self, make_cache):
+        cache = make_cache()
+        cache.set_many({'a': 1, 'b': 'два'})
+        assert cache.get_many(['a', 'b', 'c']) == {'a': 1, 'b': 'два'}
+
+    def test_expiry_and_add(self, make_cache):
+        cache = make_cache()
+        cache.set('short', 'value', 0.01)
+        time.sleep(0.05)
+        assert cache.get('short') is None
+        assert cache.add('short', 'new')
+        assert not cache.add('short', 'newer')
+        assert cache.get('short') == 'new'
+
+    def test_incr(self, make_cache):
+        cache = make_cache()
+        cache.set('counter', 1)
+        assert cache.incr('counter') == 2
+        assert make_cache().incr('counter', 5) == 7
+        cache.set('float', 1.5)
+        assert cache.incr('float') == 2.5
+        with pytest.raises(ValueError):
+            cache.incr('missing')
+
+    def test_concurrent_incr(self, make_cache):
+        make_cache().set('counter', 0)
+
+        def bump(_):
+            cache = make_cache()
+            for _ in range(50):
+                cache.incr('counter')
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(bump, range(4)))
+        assert make_cache().get('counter') == 200, (
+            'Проверьте, что incr атомарен для нескольких соединений'
+        )
+
+    def test_lru_eviction(self, make_cache):
+        cache = make_cache(MAX_ENTRIES=10, CULL_EVERY=1, CULL_FREQUENCY=2)
+        cache.set_many({f'old:{n}': n for n in range(10)})
+        cache._db.execute(
+            "UPDATE cache SET accessed = 0 WHERE key LIKE '%old:%'")
+        cache.set_many({f'new:{n}': n for n in range(5)})
+        assert len(cache.get_many([f'new:{n}' for n in range(5)])) == 5
+        assert len(cache.get_many([f'old:{n}' for n in range(10)])) < 10
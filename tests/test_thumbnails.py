@@ -0,0 +1,99 @@
+from unittest import mock
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from sorl.thumbnail import default
+
+from core import metrics
+from posts import thumbnails
+from posts.models import Post
+from tests.utils import image_file
+
+
+class TestDeferredThumbnails:
+
+    @pytest.mark.django_db
+    def test_request_does_not_generate(self, post_with_image):
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            im = default.backend.get_thumbnail(
+                post_with_image.image, '200x300', crop='center', upscale=True)
+        assert im.name == post_with_image.image.name, (
+            'Проверьте, что до готовности миниатюры отдаётся оригинал'
+        )
+        assert schedule.called, (
+            'Проверьте, что недостающая миниатюра ставится в очередь'
+        )
+
+    @pytest.mark.django_db
+    def test_generated_thumbnail_is_served(self, post_with_image):
+        thumbnails.generate(post_with_image.image.name)
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            im = default.backend.get_thumbnail(
+                post_with_image.image, '200x300', crop='center', upscale=True)
+        assert not schedule.called
+        assert im.name != post_with_image.image.name
+        assert (im.width, im.height) == (200, 300)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_post_create_schedules_presets(self, mock_media, user_client):
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            user_client.post('/create/', data={
+                'text': 'Новый пост', 'image': image_file('new.png')})
+        post = Post.objects.get(text='Новый пост')
+        schedule.assert_called_once_with(post.image.name)
+
+
+class TestThumbnailBatch:
+
+    @pytest.fixture
+    def posts_with_images(self, mock_media, user):
+        posts = []
+        for number in range(5):
+            post = Post(text=f'Пост {number}', author=user)
+            post.image.save(
+                f'image{number}.png', image_file(color=(number, 0, 0)),
+                save=True)
+            posts.append(post)
+        return posts
+
+    @pytest.mark.django_db
+    def test_page_resolved_in_one_pass(self, posts_with_images):
+        for post in posts_with_images[:3]:
+            thumbnails.generate(post.image.name)
+        default.kvstore.cache.clear()
+        metrics.store.clear()
+        kv_cache = default.kvstore.cache
+        with mock.patch.object(thumbnails, 'schedule') as schedule, \
+                mock.patch.object(kv_cache, 'get', wraps=kv_cache.get) as get, \
+                CaptureQueriesContext(connection) as queries:
+            images = thumbnails.resolve(
+                post.image for post in posts_with_images)
+        assert not get.called, (
+            'Проверьте, что миниатюры страницы не запрашиваются по одной'
+        )
+        assert len(queries) == 1, (
+            'Проверьте, что промахи кэша дочитываются одним запросом к БД'
+        )
+        for post in posts_with_images[:3]:
+            assert images[post.image.name].name != post.image.name
+        for post in posts_with_images[3:]:
+            assert images[post.image.name].name == post.image.name, (
+                'Проверьте, что до готовности миниатюры отдаётся оригинал'
+            )
+        assert schedule.call_count == 2
+        assert (
+            'yatube_thumbnail_images_total', '', 5
+        ) in metrics.store.collect(), (
+            'Проверьте, что пакетное разрешение видно в метриках'
+        )
+
+    @pytest.mark.django_db
+    def test_index_uses_resolved_thumbnail(self, client, posts_with_images):
+        post = posts_with_images[0]
+        thumbnails.generate(post.image.name)
+        thumbnail = thumbnails.resolve([post.image])[post.image.name]
+        content = client.get('/').content.decode()
+        assert thumbnail.url in content, (
+            'Проверьте, что карточка поста выводит готовую миниатюру'
+        )
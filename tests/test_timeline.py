@@ -0,0 +1,80 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.core.management import call_command
+
+from posts import timeline
+from posts.models import Follow, Post, TimelineEntry
+
+pytestmark = [pytest.mark.django_db]
+
+
+class TestTimeline:
+
+    def test_follow_backfills_timeline(self, user, another_user):
+        Post.objects.create(text='Старый пост', author=another_user)
+        Follow.objects.create(user=user, author=another_user)
+        assert TimelineEntry.objects.filter(user=user).count() == 1, (
+            'Проверьте, что при подписке лента заполняется постами автора'
+        )
+
+    def test_new_post_fans_out(self, user, another_user):
+        Follow.objects.create(user=user, author=another_user)
+        post = Post.objects.create(text='Новый пост', author=another_user)
+        assert TimelineEntry.objects.filter(user=user, post=post).exists(), (
+            'Проверьте, что новый пост попадает в ленты подписчиков'
+        )
+        assert not TimelineEntry.objects.filter(user=another_user).exists(), (
+            'Проверьте, что пост не попадает в ленту самого автора'
+        )
+
+    def test_unfollow_trims_timeline(self, user_client, user, another_user):
+        Post.objects.create(text='Пост', author=another_user)
+        user_client.get(f'/profile/{another_user.username}/follow/')
+        assert TimelineEntry.objects.filter(user=user).count() == 1
+        user_client.get(f'/profile/{another_user.username}/unfollow/')
+        assert not TimelineEntry.objects.filter(user=user).exists(), (
+            'Проверьте, что при отписке посты автора убираются из ленты'
+        )
+
+    def test_follow_index_reads_timeline(self, user_client, user, another_user):
+        Follow.objects.create(user=user, author=another_user)
+        first = Post.objects.create(text='Первый', author=another_user)
+        second = Post.objects.create(text='Второй', author=another_user)
+        response = user_client.get('/follow/')
+        assert list(response.context['page_obj']) == [second, first], (
+            'Проверьте, что `/follow/` выводит посты из ленты, новые сверху'
+        )
+
+    def test_rebuild_timeline_command(self, user, another_user):
+        Follow.objects.create(user=user, author=another_user)
+        Post.objects.create(text='Пост', author=another_user)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timeline')
+        assert TimelineEntry.objects.filter(user=user).count() == 1, (
+            'Проверьте, что команда `rebuild_timeline` восстанавливает ленты'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_async_fan_out_revalidates_follow_index(
+            self, monkeypatch, user_client, user, another_user):
+        monkeypatch.setattr(timeline, 'SYNC_FANOUT_LIMIT', 0)
+        executor = ThreadPoolExecutor(max_workers=1)
+        monkeypatch.setattr(timeline, '_executor', executor)
+        Follow.objects.create(user=user, author=another_user)
+        # Задача раскладки ждёт, пока подписчик смотрит ленту без поста
+        release = threading.Event()
+        executor.submit(release.wait, 10)
+        Post.objects.create(text='Пост знаменитости', author=another_user)
+        response = user_client.get('/follow/')
+        assert 'Пост знаменитости' not in response.content.decode()
+        release.set()
+        executor.shutdown(wait=True)
+        response = user_client.get(
+            '/follow/', HTTP_IF_NONE_MATCH=response['ETag'])
+        assert response.status_code == 200, (
+            'Проверьте, что после фоновой раскладки ETag `/follow/` '
+            'меняется и клиент не получает 304 на ленту без поста'
+        )
+        assert 'Пост знаменитости' in response.content.decode()
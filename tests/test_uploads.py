@@ -0,0 +1,55 @@
+from io import BytesIO
+from unittest import mock
+
+import pytest
+from django.core.files.base import File
+from PIL import Image
+
+from posts import uploads
+from posts.models import Post
+from tests.utils import create_post, image_file
+
+pytestmark = [pytest.mark.django_db]
+
+
+def jpeg_with_exif(name='photo.jpg'):
+    exif = Image.Exif()
+    exif[0x010e] = 'Секретное описание'
+    buffer = BytesIO()
+    Image.new('RGB', (400, 600), (0, 128, 0)).save(
+        buffer, 'jpeg', exif=exif.tobytes())
+    buffer.seek(0)
+    return File(buffer, name=name)
+
+
+class TestUploads:
+
+    def test_upload_is_downscaled_and_stripped(self, mock_media, user_client):
+        with mock.patch.object(uploads, 'MAX_SIDE', 300):
+            create_post(user_client, 'Фото', jpeg_with_exif())
+        post = Post.objects.get(text='Фото')
+        assert (post.image_width, post.image_height) == (200, 300), (
+            'Проверьте, что большие картинки уменьшаются при загрузке'
+        )
+        with Image.open(post.image.path) as image:
+            assert image.size == (200, 300)
+            assert not image.getexif(), (
+                'Проверьте, что метаданные удаляются из картинки'
+            )
+
+    def test_small_upload_keeps_size(self, mock_media, user_client):
+        create_post(user_client, 'Фото', image_file())
+        post = Post.objects.get(text='Фото')
+        assert (post.image_width, post.image_height) == (400, 600)
+
+    def test_too_many_pixels_rejected(self, mock_media, user_client):
+        with mock.patch.object(uploads, 'MAX_PIXELS', 1000), \
+                mock.patch.object(uploads, 'get_executor') as get_executor:
+            response = create_post(user_client, 'Фото', image_file())
+        assert not Post.objects.filter(text='Фото').exists(), (
+            'Проверьте, что картинка с лишними пикселями не сохраняется'
+        )
+        assert response.context['form'].errors['image']
+        assert not get_executor.called, (
+            'Проверьте, что число пикселей проверяется до декодирования'
+        )
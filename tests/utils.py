@@ -1,5 +1,39 @@
+from contextlib import contextmanager
+from io import BytesIO
+
+from django.core.files.base import File
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+
+
 def get_field_from_context(context, field_type):
     for field in context.keys():
         if field not in ('user', 'request') and isinstance(context[field], field_type):
             return context[field]
     return
+
+
+@contextmanager
+def query_budget(budget, label=''):
+    """Проверяет, что внутри блока выполнено не больше `budget` SQL-запросов."""
+    with CaptureQueriesContext(connection) as context:
+        yield context
+    executed = len(context)
+    queries = '\n'.join(query['sql'] for query in context.captured_queries)
+    assert executed <= budget, (
+        f'{label} выполняет {executed} SQL-запросов при бюджете {budget}:\n'
+        f'{queries}'
+    )
+
+
+def image_file(name='image.png', color=(255, 0, 0)):
+    buffer = BytesIO()
+    Image.new('RGB', (400, 600), color).save(buffer, 'png')
+    buffer.seek(0)
+    return File(buffer, name=name)
+
+
+def create_post(client, text, image):
+    """Публикует пост с картинкой через форму и возвращает ответ."""
+    return client.post('/create/', data={'text': text, 'image': image})
@@ -1,5 +1,12 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        # Регистрируем проверки настроек и прагмы SQLite
+        from . import checks  # noqa: F401
+        from .database import apply_pragmas
+        connection_created.connect(apply_pragmas)
@@ -0,0 +1,166 @@
+"""Замеры страниц для команды bench_views.
+
+Каждый URL из posts.urls, users.urls и about.urls запрашивается через
+тестовый клиент несколько раз подряд. Для каждого запроса считаются
+полное время, число и время SQL-запросов и время рендеринга шаблонов,
+отдельным запросом под tracemalloc — пик выделенной памяти. В холодном
+режиме кэш очищается перед каждым запросом, так что замеряется сборка
+страницы, а не чтение готовой копии. Отчёт — словарь, который пишется
+в JSON и сравнивается с сохранённой базой.
+"""
+import math
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+from importlib import import_module
+
+from django.core.cache import cache
+from django.db import connection
+from django.template.backends.django import Template
+from django.urls import reverse
+
+from core.metrics import QueryCounter
+
+URL_MODULES = ('posts.urls', 'users.urls', 'about.urls')
+# Эти адреса меняют состояние клиента или данных, их не замеряем
+SKIP = {
+    'users:logout',
+    'posts:profile_follow',
+    'posts:profile_unfollow',
+    'posts:add_comment',
+}
+PERCENTILES = (50, 95, 99)
+
+
+def url_names():
+    """Имена всех адресов из URL_MODULES с аргументами шаблона."""
+    for module_name in URL_MODULES:
+        module = import_module(module_name)
+        for pattern in module.urlpatterns:
+            name = f'{module.app_name}:{pattern.name}'
+            if name not in SKIP:
+                yield name, tuple(pattern.pattern.converters)
+
+
+def build_urls(arguments, query=None):
+    """{имя: url}; arguments — значения для параметров адресов."""
+    query = query or {}
+    urls = {}
+    for name, params in url_names():
+        url = reverse(name, kwargs={key: arguments[key] for key in params})
+        if name in query:
+            url = f'{url}?{query[name]}'
+        urls[name] = url
+    return urls
+
+
+class TemplateTimer:
+    """Суммирует время рендеринга шаблонов верхнего уровня."""
+
+    def __init__(self):
+        self.elapsed = 0.0
+        self.depth = 0
+
+    @contextmanager
+    def installed(self):
+        original = Template.render
+        timer = self
+
+        def render(template, context=None, request=None):
+            # Вложенные render_to_string (карточки постов) уже входят
+            # во время внешнего шаблона
+            timer.depth += 1
+            started = time.perf_counter()
+            try:
+                return original(template, context, request)
+            finally:
+                timer.depth -= 1
+                if not timer.depth:
+                    timer.elapsed += time.perf_counter() - started
+
+        Template.render = render
+        try:
+            yield self
+        finally:
+            Template.render = original
+
+
+def percentile(values, percent):
+    """Перцентиль методом ближайшего ранга."""
+    ordered = sorted(values)
+    rank = math.ceil(percent / 100 * len(ordered))
+    return ordered[max(rank, 1) - 1]
+
+
+def peak_memory(client, url, cold=False):
+    if cold:
+        cache.clear()
+    tracemalloc.start()
+    try:
+        client.get(url)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(client, url, repeat, warmup=2, cold=False):
+    """Замеры одного адреса; время в миллисекундах.
+
+    cold — очищать кэш перед каждым запросом (вне замера).
+    """
+    for _ in range(warmup):
+        status = client.get(url).status_code
+    timer = TemplateTimer()
+    latencies, queries, sql_times, render_times = [], [], [], []
+    with timer.installed():
+        for _ in range(repeat):
+            timer.elapsed = 0.0
+            query_timer = QueryCounter()
+            if cold:
+                cache.clear()
+            with connection.execute_wrapper(query_timer):
+                started = time.perf_counter()
+                status = client.get(url).status_code
+                latencies.append((time.perf_counter() - started) * 1000)
+            queries.append(query_timer.count)
+            sql_times.append(query_timer.elapsed * 1000)
+            render_times.append(timer.elapsed * 1000)
+    result = {'url': url, 'status': status}
+    for percent in PERCENTILES:
+        result[f'p{percent}_ms'] = round(percentile(latencies, percent), 3)
+    result.update({
+        'mean_ms': round(statistics.mean(latencies), 3),
+        'queries': max(queries),
+        'sql_ms': round(statistics.median(sql_times), 3),
+        'template_ms': round(statistics.median(render_times), 3),
+        'alloc_peak_kb': round(peak_memory(client, url, cold) / 1024, 1),
+    })
+    return result
+
+
+def compare(report, baseline, tolerance=0.25, min_delta_ms=2.0):
+    """Список регрессий отчёта относительно базы.
+
+    Время считается регрессией, если p95 вырос больше чем на tolerance
+    и больше чем на min_delta_ms (шум быстрых страниц); число запросов —
+    при любом росте.
+    """
+    regressions = []
+    for size, views in report['results'].items():
+        base_views = baseline.get('results', {}).get(size, {})
+        for name, result in views.items():
+            base = base_views.get(name)
+            if base is None:
+                continue
+            delta = result['p95_ms'] - base['p95_ms']
+            if (delta > base['p95_ms'] * tolerance
+                    and delta > min_delta_ms):
+                regressions.append(
+                    f'{size} {name}: p95 {base["p95_ms"]} -> '
+                    f'{result["p95_ms"]} мс')
+            if result['queries'] > base['queries']:
+                regressions.append(
+                    f'{size} {name}: запросов {base["queries"]} -> '
+                    f'{result["queries"]}')
+    return regressions
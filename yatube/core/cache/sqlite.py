@@ -0,0 +1,256 @@
+"""Общий для всех процессов кэш в файле SQLite.
+
+LocMemCache живёт внутри процесса: при нескольких воркерах WSGI у каждого
+своя копия, а сброс кэша не доходит до соседей. Этот бэкенд хранит
+записи в одном файле SQLite (WAL), поэтому его видят все процессы
+на хосте, и не требует внешних сервисов.
+
+Вытеснение — LRU по времени последнего чтения. Чтобы чтения не
+превращались в записи, время доступа обновляется не чаще, чем раз
+в ACCESS_RESOLUTION секунд для ключа.
+"""
+import pickle
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from core import metrics
+from core.sqlite import LocalConnection
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+)
+# Лимит параметров в одном запросе SQLite
+MAX_VARIABLES = 900
+ACCESS_RESOLUTION = 10
+
+
+def chunks(items, size=MAX_VARIABLES):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class SQLiteCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._connection = LocalConnection(
+            location, SCHEMA, ('journal_mode=WAL', 'synchronous=NORMAL'))
+        # Проверка размера — раз в столько записей, а не на каждой
+        options = params.get('OPTIONS', {})
+        self._cull_every = int(options.get('CULL_EVERY', 100))
+        self._writes = 0
+
+    @property
+    def _db(self):
+        return self._connection.get()
+
+    def _encode(self, value):
+        # Целые числа храним как есть: их можно сравнивать и читать в SQL
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+        return pickle.dumps(value, self.pickle_protocol)
+
+    @staticmethod
+    def _decode(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _touch_accessed(self, keys, now):
+        for part in chunks(keys):
+            marks = ','.join('?' * len(part))
+            self._db.execute(
+                f'UPDATE cache SET accessed = ? WHERE key IN ({marks}) '
+                f'AND accessed < ?',
+                [now, *part, now - ACCESS_RESOLUTION],
+            )
+
+    def _fetch(self, keys):
+        now = time.time()
+        found, fresh, expired = {}, [], []
+        for part in chunks(keys):
+            marks = ','.join('?' * len(part))
+            rows = self._db.execute(
+                f'SELECT key, value, expires, accessed FROM cache '
+                f'WHERE key IN ({marks})',
+                part,
+            )
+            for key, value, expires, accessed in rows:
+                if expires is not None and expires <= now:
+                    expired.append(key)
+                    continue
+                found[key] = value
+                if accessed < now - ACCESS_RESOLUTION:
+                    fresh.append(key)
+        if fresh:
+            self._touch_accessed(fresh, now)
+        if expired:
+            self._delete_keys(expired)
+        return found
+
+    def _delete_keys(self, keys):
+        deleted = 0
+        for part in chunks(keys):
+            marks = ','.join('?' * len(part))
+            deleted += self._db.execute(
+                f'DELETE FROM cache WHERE key IN ({marks})', part).rowcount
+        return deleted
+
+    def _write(self, rows):
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)',
+                rows,
+            )
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        self._writes += len(rows)
+        if self._writes >= self._cull_every:
+            self._writes = 0
+            self._cull()
+
+    def _cull(self):
+        db = self._db
+        now = time.time()
+        db.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+        count = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        # Как и другие бэкенды Django, удаляем 1/CULL_FREQUENCY записей,
+        # но самых давно прочитанных.
+        if self._cull_frequency == 0:
+            db.execute('DELETE FROM cache')
+            return
+        excess = count - self._max_entries
+        limit = max(excess, count // self._cull_frequency)
+        db.execute(
+            'DELETE FROM cache WHERE key IN '
+            '(SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+            (limit,),
+        )
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        found = self._fetch([key])
+        metrics.count_cache(len(found), 1 - len(found))
+        if key not in found:
+            return default
+        return self._decode(found[key])
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        mapping = {self._key(key, version): key for key in keys}
+        found = self._fetch(list(mapping))
+        metrics.count_cache(len(found), len(mapping) - len(found))
+        return {
+            mapping[key]: self._decode(value) for key, value in found.items()
+        }
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        self._write([(
+            key, self._encode(value),
+            self.get_backend_timeout(timeout), time.time(),
+        )])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        self._write([
+            (self._key(key, version), self._encode(value), expires, now)
+            for key, value in data.items()
+        ])
+        return []
+
+    # UPSERT и RETURNING есть только в свежих SQLite (3.24 и 3.35),
+    # поэтому add и incr читают и пишут под BEGIN IMMEDIATE
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            found = db.execute(
+                'SELECT expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            added = found is None or (
+                found[0] is not None and found[0] <= now)
+            if added:
+                db.execute(
+                    'INSERT OR REPLACE INTO cache '
+                    '(key, value, expires, accessed) VALUES (?, ?, ?, ?)',
+                    (key, self._encode(value),
+                     self.get_backend_timeout(timeout), now),
+                )
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            found = db.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if found is None or (found[1] is not None and found[1] <= now):
+                raise ValueError("Key '%s' not found" % key)
+            new_value = self._decode(found[0]) + delta
+            db.execute(
+                'UPDATE cache SET value = ?, accessed = ? WHERE key = ?',
+                (self._encode(new_value), now, key),
+            )
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return new_value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        return self._db.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, now),
+        ).rowcount > 0
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return key in self._fetch([key])
+
+    def delete(self, key, version=None):
+        self._delete_keys([self._key(key, version)])
+
+    def delete_many(self, keys, version=None):
+        self._delete_keys([self._key(key, version) for key in keys])
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение держим открытым между запросами, как и файловый кэш
+        pass
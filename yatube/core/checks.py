@@ -0,0 +1,142 @@
+"""Проверки настроек, от которых зависит производительность.
+
+Проверки с тегом performance выполняются при каждом запуске manage.py,
+если выбран профиль production, и всегда — в check --deploy и в
+perf_check. Так ошибка в настройках production видна сразу при старте,
+а в разработке не мешает предупреждениями.
+"""
+from django.conf import settings
+from django.core.checks import Warning, register
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+from django.template.loaders.cached import Loader as CachedLoader
+from django.urls import Resolver404, resolve
+from django.views.static import serve
+
+PER_PROCESS_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+UNCACHED_SESSIONS = (
+    'django.contrib.sessions.backends.db',
+    'django.contrib.sessions.backends.file',
+)
+
+
+def check_debug():
+    issues = []
+    if settings.DEBUG:
+        issues.append(Warning(
+            'DEBUG включён: Django хранит каждый SQL-запрос в памяти.',
+            hint='Выберите профиль YATUBE_PROFILE=production.',
+            id='yatube.W001',
+        ))
+    if ('debug_toolbar' in settings.INSTALLED_APPS or any(
+            'debug_toolbar' in name for name in settings.MIDDLEWARE)):
+        issues.append(Warning(
+            'debug_toolbar подключён: его middleware обрабатывает '
+            'каждый ответ.',
+            hint='Подключайте debug_toolbar только при DEBUG.',
+            id='yatube.W002',
+        ))
+    return issues
+
+
+def check_templates():
+    issues = []
+    for engine in engines.all():
+        if not isinstance(engine, DjangoTemplates):
+            continue
+        if not any(isinstance(loader, CachedLoader)
+                   for loader in engine.engine.template_loaders):
+            issues.append(Warning(
+                f'Шаблоны движка {engine.name} не кэшируются и '
+                f'компилируются заново на каждый запрос.',
+                hint='Укажите django.template.loaders.cached.Loader '
+                     'в OPTIONS["loaders"].',
+                id='yatube.W003',
+            ))
+    return issues
+
+
+def check_databases():
+    issues = []
+    for alias, database in settings.DATABASES.items():
+        if not database.get('CONN_MAX_AGE'):
+            issues.append(Warning(
+                f'База {alias} открывает новое соединение на каждый '
+                f'запрос.',
+                hint='Задайте CONN_MAX_AGE, например DB_CONN_MAX_AGE=600.',
+                id='yatube.W004',
+            ))
+        pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+        if (database['ENGINE'].endswith('sqlite3') and str(
+                pragmas.get('journal_mode', '')).upper() != 'WAL'):
+            issues.append(Warning(
+                f'База {alias} на SQLite работает без WAL: запись '
+                f'блокирует все чтения.',
+                hint="Задайте SQLITE_PRAGMAS = {'journal_mode': 'WAL', "
+                     "'synchronous': 'NORMAL', ...}.",
+                id='yatube.W005',
+            ))
+    return issues
+
+
+def check_caches():
+    issues = []
+    for alias in settings.CACHES:
+        backend = settings.CACHES[alias]['BACKEND']
+        if backend in PER_PROCESS_CACHES:
+            issues.append(Warning(
+                f'Кэш {alias} ({backend}) свой у каждого процесса: '
+                f'сброс поколений ленты не дойдёт до других воркеров.',
+                hint='Используйте core.cache.sqlite.SQLiteCache.',
+                id='yatube.W006',
+            ))
+    if settings.SESSION_ENGINE in UNCACHED_SESSIONS:
+        issues.append(Warning(
+            'Сессия читается из базы на каждый запрос.',
+            hint='SESSION_ENGINE = '
+                 '"django.contrib.sessions.backends.cached_db".',
+            id='yatube.W007',
+        ))
+    return issues
+
+
+def check_media():
+    try:
+        match = resolve(f'{settings.MEDIA_URL}check.jpg')
+    except Resolver404:
+        return []
+    if match.func is not serve:
+        return []
+    return [Warning(
+        'Медиафайлы отдаёт Django: каждая картинка занимает воркер.',
+        hint='Отдавайте MEDIA_ROOT веб-сервером.',
+        id='yatube.W008',
+    )]
+
+
+def performance_issues():
+    return [
+        *check_debug(),
+        *check_templates(),
+        *check_databases(),
+        *check_caches(),
+        *check_media(),
+    ]
+
+
+@register('performance')
+def startup_check(app_configs, **kwargs):
+    if not getattr(settings, 'PRODUCTION', False):
+        return []
+    return performance_issues()
+
+
+@register('performance', deploy=True)
+def deploy_check(app_configs, **kwargs):
+    # В production те же проверки уже выполнил startup_check
+    if getattr(settings, 'PRODUCTION', False):
+        return []
+    return performance_issues()
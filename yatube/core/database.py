@@ -0,0 +1,19 @@
+"""Настройка соединений с SQLite прагмами из SQLITE_PRAGMAS.
+
+Django 2.2 не умеет передавать прагмы в настройках базы, поэтому они
+выполняются по сигналу connection_created для каждого нового
+соединения. С CONN_MAX_AGE это происходит раз в несколько минут на
+воркер, а не на каждый запрос.
+"""
+from django.conf import settings
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,63 @@
+import os
+import tempfile
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache.sqlite import SQLiteCache
+
+PARAMS = {'TIMEOUT': 300, 'OPTIONS': {'MAX_ENTRIES': 1000000}}
+
+
+def make_backends(directory):
+    return {
+        'locmem': LocMemCache('bench', PARAMS),
+        'filebased': FileBasedCache(os.path.join(directory, 'files'), PARAMS),
+        'sqlite': SQLiteCache(
+            os.path.join(directory, 'bench.sqlite3'), PARAMS),
+    }
+
+
+def measure(operation, repeat):
+    started = time.perf_counter()
+    for number in range(repeat):
+        operation(number)
+    elapsed = time.perf_counter() - started
+    return repeat / elapsed if elapsed else float('inf')
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает скорость бэкендов кэша: LocMem, filebased и SQLite.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=2000)
+        parser.add_argument('--keys', type=int, default=500)
+
+    def handle(self, *args, **options):
+        repeat, keys = options['repeat'], options['keys']
+        card = 'x' * 2048
+        page = [f'card:{number}' for number in range(10)]
+        with tempfile.TemporaryDirectory() as directory:
+            results = {}
+            for name, cache in make_backends(directory).items():
+                cache.set_many({key: card for key in page})
+                cache.set('counter', 0)
+                results[name] = {
+                    'set': measure(
+                        lambda n: cache.set(f'key:{n % keys}', card), repeat),
+                    'get': measure(
+                        lambda n: cache.get(f'key:{n % keys}'), repeat),
+                    'get_many(10)': measure(
+                        lambda n: cache.get_many(page), repeat),
+                    'incr': measure(lambda n: cache.incr('counter'), repeat),
+                }
+                cache.clear()
+        operations = list(results['locmem'])
+        self.stdout.write(
+            f'{"операций/с":<14}' + ''.join(f'{op:>14}' for op in operations))
+        for name, row in results.items():
+            self.stdout.write(
+                f'{name:<14}'
+                + ''.join(f'{row[op]:>14.0f}' for op in operations))
@@ -0,0 +1,58 @@
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import resolve
+
+from core import metrics
+
+
+def measure(handler, request, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        handler(request)
+    return (time.perf_counter() - started) / repeat * 1_000_000
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет, сколько MetricsMiddleware добавляет ко времени запроса '
+        'и сколько стоит сброс счётчиков в общий файл.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        response = HttpResponse(b'x' * 4096)
+
+        def view(request):
+            return response
+
+        request = RequestFactory().get('/')
+        request.resolver_match = resolve('/')
+        original = metrics.store
+        with tempfile.TemporaryDirectory() as directory:
+            # Сброс не чаще, чем в настройках: его цена считается отдельно
+            metrics.store = metrics.Store(
+                os.path.join(directory, 'metrics.sqlite3'),
+                flush_interval=float('inf'))
+            try:
+                bare = measure(view, request, repeat)
+                wrapped = measure(
+                    metrics.MetricsMiddleware(view), request, repeat)
+                started = time.perf_counter()
+                metrics.store.flush()
+                flush = (time.perf_counter() - started) * 1000
+                collected = len(metrics.store.collect())
+            finally:
+                metrics.store = original
+        self.stdout.write(f'Без middleware: {bare:.2f} мкс на запрос')
+        self.stdout.write(f'С middleware: {wrapped:.2f} мкс на запрос')
+        self.stdout.write(self.style.SUCCESS(
+            f'Накладные расходы: {wrapped - bare:.2f} мкс на запрос; '
+            f'сброс {collected} счётчиков: {flush:.2f} мс'))
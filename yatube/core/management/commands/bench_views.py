@@ -0,0 +1,178 @@
+import datetime
+import json
+import platform
+import tempfile
+from io import StringIO
+
+import django
+from django.contrib.auth.tokens import default_token_generator
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from core import benchmark
+from posts.models import AuthorStats, Group, Post
+
+SIZES = {
+    'small': {
+        'users': 200, 'groups': 10, 'posts': 2000,
+        'comments': 4000, 'follows': 2000,
+    },
+    'medium': {
+        'users': 2000, 'groups': 30, 'posts': 20000,
+        'comments': 40000, 'follows': 20000,
+    },
+    'large': {
+        'users': 10000, 'groups': 100, 'posts': 200000,
+        'comments': 400000, 'follows': 100000,
+    },
+}
+QUERY = {'posts:search': 'q=кот'}
+# Эти страницы открывает только автор поста, остальным они отвечают 404
+AS_AUTHOR = {'posts:post_edit'}
+MODES = ('warm', 'cold')
+COLUMNS = (
+    'status', 'p50_ms', 'p95_ms', 'p99_ms', 'queries', 'sql_ms',
+    'template_ms', 'alloc_peak_kb',
+)
+
+
+def seeded_arguments():
+    """Читатель, автор поста и аргументы адресов.
+
+    Берутся самые тяжёлые объекты набора данных.
+    """
+    reader = AuthorStats.objects.order_by('-following_count').first().user
+    author = AuthorStats.objects.order_by('-follower_count').first().user
+    post = Post.objects.annotate(total=Count('comments')).order_by(
+        '-total').first()
+    group = Group.objects.annotate(total=Count('posts')).order_by(
+        '-total').first()
+    return reader, post.author, {
+        'username': author.username,
+        'slug': group.slug,
+        'post_id': post.pk,
+        'uidb64': urlsafe_base64_encode(force_bytes(reader.pk)),
+        'token': default_token_generator.make_token(reader),
+    }
+
+
+def result_key(size, mode):
+    # Прогретый режим хранится под именем размера, как в старых отчётах
+    return size if mode == 'warm' else f'{size}-{mode}'
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет страницы posts, users и about на синтетических данных '
+        'разного размера и сравнивает результат с базовым отчётом.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', choices=list(SIZES),
+            default=['small', 'medium'],
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Сколько замеров на адрес.',
+        )
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument(
+            '--modes', nargs='+', choices=MODES, default=list(MODES),
+            help='warm — с прогретым кэшем, cold — с очисткой кэша перед '
+                 'каждым запросом.',
+        )
+        parser.add_argument('--output', help='Куда записать JSON-отчёт.')
+        parser.add_argument(
+            '--baseline', help='JSON-отчёт, с которым сравнивать.')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.25,
+            help='Допустимый относительный рост p95.',
+        )
+        parser.add_argument(
+            '--min-delta-ms', type=float, default=2.0,
+            help='Рост p95 меньше этого значения не считается регрессией.',
+        )
+
+    def handle(self, *args, **options):
+        report = {
+            'meta': {
+                'created': datetime.datetime.now(
+                    datetime.timezone.utc).isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'repeat': options['repeat'],
+            },
+            'results': {},
+        }
+        setup_test_environment()
+        try:
+            for size in options['sizes']:
+                for mode, results in self.run_size(size, options).items():
+                    report['results'][result_key(size, mode)] = results
+        finally:
+            teardown_test_environment()
+        if options['output']:
+            with open(options['output'], 'w') as stream:
+                json.dump(report, stream, indent=2, ensure_ascii=False)
+        if options['baseline']:
+            self.check_baseline(report, options)
+
+    def run_size(self, size, options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False)
+        # Отладка выключена, чтобы не мешал debug_toolbar; кэш и медиа —
+        # свои у каждого набора данных
+        with tempfile.TemporaryDirectory() as media, override_settings(
+                DEBUG=False, MEDIA_ROOT=media, CACHES={'default': {
+                    'BACKEND':
+                        'django.core.cache.backends.locmem.LocMemCache',
+                    'LOCATION': f'bench-{size}',
+                }}):
+            try:
+                call_command('seed_yatube', stdout=StringIO(), **SIZES[size])
+                return {
+                    mode: self.run_urls(size, mode, options)
+                    for mode in options['modes']
+                }
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run_urls(self, size, mode, options):
+        reader, author, arguments = seeded_arguments()
+        clients = {}
+        for user in (reader, author):
+            clients[user.pk] = Client()
+            clients[user.pk].force_login(user)
+        results = {}
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{result_key(size, mode)}: {SIZES[size]}'))
+        self.stdout.write(
+            f'{"":<32}' + ''.join(f'{column:>14}' for column in COLUMNS))
+        for name, url in benchmark.build_urls(arguments, QUERY).items():
+            client = clients[author.pk if name in AS_AUTHOR else reader.pk]
+            results[name] = benchmark.measure(
+                client, url, options['repeat'], options['warmup'],
+                cold=mode == 'cold')
+            self.stdout.write(f'{name:<32}' + ''.join(
+                f'{results[name][column]:>14}' for column in COLUMNS))
+        return results
+
+    def check_baseline(self, report, options):
+        with open(options['baseline']) as stream:
+            baseline = json.load(stream)
+        regressions = benchmark.compare(
+            report, baseline, options['tolerance'], options['min_delta_ms'])
+        for regression in regressions:
+            self.stderr.write(regression)
+        if regressions:
+            raise CommandError(f'Регрессий: {len(regressions)}')
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
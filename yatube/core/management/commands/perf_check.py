@@ -0,0 +1,26 @@
+from django.core import checks
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверяет настройки на производительность, как check --deploy: '
+        'отладку, кэш шаблонов, соединения с базой, SQLite, кэш, сессии '
+        'и раздачу медиа.'
+    )
+    requires_system_checks = False
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fail-level', default='WARNING',
+            choices=['CRITICAL', 'ERROR', 'WARNING', 'INFO', 'DEBUG'],
+            help='С какого уровня команда завершается с ошибкой.',
+        )
+
+    def handle(self, *args, **options):
+        self.check(
+            tags=['performance'],
+            display_num_errors=True,
+            include_deployment_checks=True,
+            fail_level=getattr(checks, options['fail_level']),
+        )
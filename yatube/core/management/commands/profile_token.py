@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from core import profiling
+
+
+class Command(BaseCommand):
+    help = (
+        'Выдаёт подписанный токен для заголовка X-Profile: запрос с ним '
+        'будет профилирован.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mode', choices=profiling.MODES, default='cprofile',
+            help='cprofile — дамп pstats, sample — стеки для flamegraph.',
+        )
+
+    def handle(self, *args, **options):
+        token = profiling.make_token(options['mode'])
+        self.stdout.write(
+            f'{token}\n'
+            f'Действует {profiling.TOKEN_MAX_AGE} с: '
+            f'curl -H "X-Profile: {token}" ...'
+        )
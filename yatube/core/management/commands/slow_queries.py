@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import slow_queries
+
+
+class Command(BaseCommand):
+    help = (
+        'Сводка журнала медленных SQL-запросов по отпечаткам: сколько раз, '
+        'суммарное и худшее время, из каких view и последний план.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--order', choices=slow_queries.ORDERS, default='total_ms')
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--view', help='Только запросы этого view.')
+        parser.add_argument(
+            '--since', type=float,
+            help='Только отпечатки, замеченные за последние N часов.',
+        )
+        parser.add_argument(
+            '--plans', action='store_true',
+            help='Показывать параметры и план последнего примера.',
+        )
+        parser.add_argument(
+            '--clear', action='store_true', help='Очистить журнал.')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            slow_queries.clear()
+            self.stdout.write(self.style.SUCCESS('Журнал очищен'))
+            return
+        since = options['since']
+        rows = slow_queries.report(
+            order=options['order'],
+            limit=options['limit'],
+            view=options['view'],
+            since=time.time() - since * 3600 if since else None,
+        )
+        if not rows:
+            self.stdout.write('Медленных запросов нет')
+            return
+        for row in rows:
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{row["fingerprint"]}  x{row["count"]}  '
+                f'всего {row["total_ms"]:.1f} мс  '
+                f'среднее {row["avg_ms"]:.1f} мс  '
+                f'максимум {row["max_ms"]:.1f} мс'))
+            self.stdout.write(f'  view: {row["views"]}')
+            self.stdout.write(f'  {row["sql"]}')
+            if options['plans']:
+                self.stdout.write(f'  params: {row["params"]}')
+                for line in row['plan'].splitlines():
+                    self.stdout.write(f'    {line}')
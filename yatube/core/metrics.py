@@ -0,0 +1,303 @@
+"""Метрики запросов в формате Prometheus.
+
+MetricsMiddleware считает по имени view число запросов, гистограммы
+времени ответа и размера ответа, число и время SQL-запросов. Кэш
+(core/cache/sqlite.py) добавляет попадания и промахи. Счётчики копятся
+в памяти процесса и раз в METRICS_FLUSH_INTERVAL секунд прибавляются
+к общему файлу SQLite, поэтому /metrics показывает сумму по всем
+воркерам, а запрос платит только за сложение в словаре.
+
+Доступ к /metrics: если задан METRICS_TOKEN, нужен заголовок
+Authorization: Bearer <токен> (bearer_token в scrape_config Prometheus),
+адрес клиента не проверяется. Без токена пускаются только адреса из
+METRICS_ALLOWED_IPS — это годится, лишь когда перед приложением нет
+прокси: за ним REMOTE_ADDR у всех запросов адрес самого прокси.
+"""
+import bisect
+import functools
+import hmac
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.http import Http404, HttpResponse
+
+from core.sqlite import LocalConnection
+
+METRICS_DB = getattr(
+    settings, 'METRICS_DB',
+    os.path.join(settings.BASE_DIR, 'cache', 'metrics.sqlite3'))
+FLUSH_INTERVAL = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+ALLOWED_IPS = getattr(settings, 'METRICS_ALLOWED_IPS', ('127.0.0.1',))
+TOKEN = getattr(settings, 'METRICS_TOKEN', '')
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576)
+HISTOGRAMS = {
+    'yatube_request_duration_seconds': LATENCY_BUCKETS,
+    'yatube_response_size_bytes': SIZE_BUCKETS,
+}
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+HELP = {
+    'yatube_requests_total': ('counter', 'Обработанные запросы.'),
+    'yatube_request_duration_seconds': (
+        'histogram', 'Время ответа view.'),
+    'yatube_response_size_bytes': ('histogram', 'Размер ответа.'),
+    'yatube_db_queries_total': ('counter', 'SQL-запросы.'),
+    'yatube_db_query_seconds_total': ('counter', 'Время SQL-запросов.'),
+    'yatube_cache_requests_total': ('counter', 'Чтения ключей из кэша.'),
+    'yatube_thumbnail_images_total': (
+        'counter', 'Картинки, миниатюры которых разрешены пакетно.'),
+    'yatube_thumbnail_round_trips_total': (
+        'counter', 'Обращения к KV-хранилищу миниатюр.'),
+    'yatube_thumbnail_round_trips_saved_total': (
+        'counter', 'Обращения, сэкономленные пакетным разрешением.'),
+}
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS metrics ('
+    ' name TEXT NOT NULL,'
+    ' labels TEXT NOT NULL,'
+    ' value REAL NOT NULL,'
+    ' PRIMARY KEY (name, labels)'
+    ') WITHOUT ROWID'
+)
+
+
+class Store:
+    """Счётчики процесса и общий для процессов файл с их суммой."""
+
+    def __init__(self, path=METRICS_DB, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.flushed = time.monotonic()
+        self.connection = LocalConnection(path, (SCHEMA,))
+
+    @property
+    def db(self):
+        return self.connection.get()
+
+    def add(self, values):
+        """values — {(имя, метки): прибавка}."""
+        with self.lock:
+            pending = self.pending
+            for key, value in values.items():
+                pending[key] = pending.get(key, 0) + value
+        if time.monotonic() - self.flushed >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.flushed = time.monotonic()
+        if not pending:
+            return
+        db = self.db
+        # UPSERT появился только в SQLite 3.24: сначала UPDATE, а строки,
+        # которых ещё нет, вставляются под тем же BEGIN IMMEDIATE
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            for (name, labels), value in pending.items():
+                updated = db.execute(
+                    'UPDATE metrics SET value = value + ? '
+                    'WHERE name = ? AND labels = ?',
+                    (value, name, labels),
+                ).rowcount
+                if not updated:
+                    db.execute(
+                        'INSERT INTO metrics (name, labels, value) '
+                        'VALUES (?, ?, ?)',
+                        (name, labels, value),
+                    )
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+
+    def collect(self):
+        self.flush()
+        return self.db.execute(
+            'SELECT name, labels, value FROM metrics ORDER BY name, labels'
+        ).fetchall()
+
+    def clear(self):
+        with self.lock:
+            self.pending = {}
+        self.db.execute('DELETE FROM metrics')
+
+
+store = Store()
+
+
+def labels(**values):
+    return ','.join(
+        f'{key}="{str(value).replace(chr(34), chr(39))}"'
+        for key, value in sorted(values.items())
+    )
+
+
+# Строки меток собираются один раз на view: имена view ограничены URLconf
+@functools.lru_cache(maxsize=4096)
+def view_key(name, view, **extra):
+    return name, labels(view=view, **extra)
+
+
+@functools.lru_cache(maxsize=1024)
+def histogram_keys(name, view):
+    view_labels = labels(view=view)
+    buckets = tuple(
+        (f'{name}_bucket', f'{view_labels},le="{border}"')
+        for border in (*HISTOGRAMS[name], '+Inf')
+    )
+    return buckets, (f'{name}_sum', view_labels), (
+        f'{name}_count', view_labels)
+
+
+def observe(values, name, view, value):
+    """Добавляет наблюдение в гистограмму.
+
+    В хранилище корзины не накопительные: накопительными их делает
+    render().
+    """
+    buckets, sum_key, count_key = histogram_keys(name, view)
+    values[buckets[bisect.bisect_left(HISTOGRAMS[name], value)]] = 1
+    values[sum_key] = value
+    values[count_key] = 1
+
+
+def count_cache(hits, misses):
+    values = {}
+    if hits:
+        values[('yatube_cache_requests_total', 'result="hit"')] = hits
+    if misses:
+        values[('yatube_cache_requests_total', 'result="miss"')] = misses
+    if values:
+        store.add(values)
+
+
+def count_thumbnails(images, round_trips, saved):
+    store.add({
+        ('yatube_thumbnail_images_total', ''): images,
+        ('yatube_thumbnail_round_trips_total', ''): round_trips,
+        ('yatube_thumbnail_round_trips_saved_total', ''): saved,
+    })
+
+
+class QueryCounter:
+    """Считает SQL-запросы и их время через execute_wrapper."""
+
+    def __init__(self):
+        self.count = 0
+        self.elapsed = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.elapsed += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        values = {
+            view_key(
+                'yatube_requests_total', view, method=request.method,
+                status=response.status_code): 1,
+            view_key('yatube_db_queries_total', view): queries.count,
+            view_key('yatube_db_query_seconds_total', view): queries.elapsed,
+        }
+        observe(values, 'yatube_request_duration_seconds', view, elapsed)
+        if not response.streaming:
+            observe(values, 'yatube_response_size_bytes', view,
+                    len(response.content))
+        store.add(values)
+        return response
+
+
+def _number(value):
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def _family(name):
+    for family in HISTOGRAMS:
+        if name.startswith(family):
+            return family
+    return name
+
+
+def _histogram(family, rows):
+    buckets, totals = {}, {}
+    for name, label_text, value in rows:
+        if name.endswith('_bucket'):
+            series, border = label_text.rsplit(',le=', 1)
+            buckets.setdefault(series, {})[border.strip('"')] = value
+        else:
+            totals[(name, label_text)] = value
+    lines = []
+    for series in sorted(buckets):
+        cumulative = 0
+        for border in (*HISTOGRAMS[family], '+Inf'):
+            cumulative += buckets[series].get(str(border), 0)
+            lines.append(
+                f'{family}_bucket{{{series},le="{border}"}} '
+                f'{_number(cumulative)}')
+        for suffix in ('_sum', '_count'):
+            value = totals.get((family + suffix, series), 0)
+            lines.append(f'{family}{suffix}{{{series}}} {_number(value)}')
+    return lines
+
+
+def _series(name, label_text):
+    return f'{name}{{{label_text}}}' if label_text else name
+
+
+def render(rows):
+    """Текст в формате Prometheus; корзины становятся накопительными."""
+    families = {}
+    for row in rows:
+        families.setdefault(_family(row[0]), []).append(row)
+    lines = []
+    for family, family_rows in sorted(families.items()):
+        if family in HELP:
+            kind, text = HELP[family]
+            lines.append(f'# HELP {family} {text}')
+            lines.append(f'# TYPE {family} {kind}')
+        if family in HISTOGRAMS:
+            lines.extend(_histogram(family, family_rows))
+            continue
+        lines.extend(
+            f'{_series(name, label_text)} {_number(value)}'
+            for name, label_text, value in sorted(family_rows)
+        )
+    return '\n'.join(lines) + '\n'
+
+
+def allowed(request):
+    if not TOKEN:
+        return request.META.get('REMOTE_ADDR') in ALLOWED_IPS
+    scheme, _, token = request.META.get(
+        'HTTP_AUTHORIZATION', '').partition(' ')
+    return scheme.lower() == 'bearer' and hmac.compare_digest(
+        token.encode(), TOKEN.encode())
+
+
+def metrics_view(request):
+    if not allowed(request):
+        raise Http404
+    return HttpResponse(render(store.collect()), content_type=CONTENT_TYPE)
@@ -0,0 +1,175 @@
+"""Профилирование отдельных запросов по требованию.
+
+Запрос профилируется, если в нём есть заголовок X-Profile с токеном
+из команды profile_token или если сотрудник добавил к адресу
+?_profile=1. Режим cprofile пишет дамп pstats (.prof), режим sample —
+стеки, которые поток-сэмплер снимает каждые PROFILE_SAMPLE_INTERVAL
+секунд, в свёрнутом формате flamegraph (.folded). Файлы копятся в
+PROFILE_SPOOL_DIR с именем view в названии, а список и скачивание —
+в /profiles/ для сотрудников. Остальные запросы платят за проверку
+одного заголовка и строки запроса.
+"""
+import cProfile
+import datetime
+import os
+import re
+import sys
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core import signing
+from django.http import FileResponse, Http404
+from django.shortcuts import render
+
+SPOOL_DIR = getattr(
+    settings, 'PROFILE_SPOOL_DIR',
+    os.path.join(settings.BASE_DIR, 'cache', 'profiles'))
+SPOOL_LIMIT = getattr(settings, 'PROFILE_SPOOL_LIMIT', 200)
+TOKEN_MAX_AGE = getattr(settings, 'PROFILE_TOKEN_MAX_AGE', 60 * 60)
+SAMPLE_INTERVAL = getattr(settings, 'PROFILE_SAMPLE_INTERVAL', 0.005)
+HEADER = 'HTTP_X_PROFILE'
+FLAG = '_profile'
+SALT = 'core.profiling'
+MODES = ('cprofile', 'sample')
+EXTENSIONS = {'cprofile': '.prof', 'sample': '.folded'}
+FILE_NAME = re.compile(r'^[\w.-]+\.(prof|folded)$')
+
+
+def make_token(mode='cprofile'):
+    return signing.TimestampSigner(salt=SALT).sign(mode)
+
+
+def requested_mode(request):
+    """Режим профилирования или None, если запрос его не просит."""
+    token = request.META.get(HEADER)
+    if token:
+        try:
+            mode = signing.TimestampSigner(salt=SALT).unsign(
+                token, max_age=TOKEN_MAX_AGE)
+        except signing.BadSignature:
+            return None
+        return mode if mode in MODES else None
+    # Подстрока отсеивает обычные запросы без разбора строки запроса,
+    # решает точное имя параметра: ?x_profile=1 или ?q=_profile= не в счёт
+    if FLAG not in request.META.get('QUERY_STRING', ''):
+        return None
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_staff or FLAG not in request.GET:
+        return None
+    mode = request.GET.get(FLAG)
+    return mode if mode in MODES else 'cprofile'
+
+
+class Sampler(threading.Thread):
+    """Снимает стек потока запроса через равные промежутки времени."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f'{code.co_name} ({code.co_filename}:{frame.f_lineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def folded(self):
+        return ''.join(
+            f'{stack} {count}\n' for stack, count in self.stacks.items())
+
+
+def spool_path(view, mode):
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    tag = re.sub(r'[^\w.-]', '.', view)
+    stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    return os.path.join(
+        SPOOL_DIR, f'{stamp}-{tag}-{os.getpid()}{EXTENSIONS[mode]}')
+
+
+def spooled():
+    """Файлы профилей, новые первыми."""
+    if not os.path.isdir(SPOOL_DIR):
+        return []
+    entries = [
+        entry for entry in os.scandir(SPOOL_DIR)
+        if entry.is_file() and FILE_NAME.match(entry.name)
+    ]
+    return sorted(entries, key=lambda entry: entry.name, reverse=True)
+
+
+def trim_spool():
+    for entry in spooled()[SPOOL_LIMIT:]:
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+
+class ProfilingMiddleware:
+    """Стоит после AuthenticationMiddleware: флагу нужен request.user."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = requested_mode(request)
+        if mode is None:
+            return self.get_response(request)
+        if mode == 'sample':
+            sampler = Sampler(threading.get_ident())
+            sampler.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                sampler.stop()
+        else:
+            profiler = cProfile.Profile()
+            response = profiler.runcall(self.get_response, request)
+        match = request.resolver_match
+        path = spool_path(match.view_name if match else 'unresolved', mode)
+        if mode == 'sample':
+            with open(path, 'w') as stream:
+                stream.write(sampler.folded())
+        else:
+            profiler.dump_stats(path)
+        trim_spool()
+        response['X-Profile-File'] = os.path.basename(path)
+        return response
+
+
+@staff_member_required
+def profile_list(request):
+    profiles = []
+    for entry in spooled():
+        stat = entry.stat()
+        profiles.append({
+            'name': entry.name,
+            'size': stat.st_size,
+            'created': datetime.datetime.fromtimestamp(stat.st_mtime),
+        })
+    return render(request, 'core/profiles.html', {'profiles': profiles})
+
+
+@staff_member_required
+def profile_download(request, name):
+    if not FILE_NAME.match(name):
+        raise Http404
+    path = os.path.join(SPOOL_DIR, name)
+    if not os.path.isfile(path):
+        raise Http404
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=name)
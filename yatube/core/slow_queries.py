@@ -0,0 +1,243 @@
+"""Журнал медленных SQL-запросов.
+
+SlowQueryMiddleware ставит execute_wrapper на соединение с базой на
+время запроса. Запросы дольше SLOW_QUERY_THRESHOLD_MS учитываются по
+отпечатку — SQL без значений и длины списков IN. Счётчики по отпечатку
+и view пишутся всегда, а подробная запись с параметрами и планом
+(EXPLAIN) и строка в лог — не чаще раза в SLOW_QUERY_RATE_LIMIT секунд
+на отпечаток. Записи лежат в общем файле SQLite, отчёт по ним строит
+команда slow_queries.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from core.sqlite import LocalConnection
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_DB = getattr(
+    settings, 'SLOW_QUERY_DB',
+    os.path.join(settings.BASE_DIR, 'cache', 'slow_queries.sqlite3'))
+THRESHOLD_MS = getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', 100)
+RATE_LIMIT = getattr(settings, 'SLOW_QUERY_RATE_LIMIT', 60)
+EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+ORDERS = ('total_ms', 'count', 'max_ms', 'avg_ms')
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS slow_query_stats ('
+    ' fingerprint TEXT NOT NULL,'
+    ' view TEXT NOT NULL,'
+    ' count INTEGER NOT NULL,'
+    ' total_ms REAL NOT NULL,'
+    ' max_ms REAL NOT NULL,'
+    ' last_seen REAL NOT NULL,'
+    ' PRIMARY KEY (fingerprint, view)'
+    ') WITHOUT ROWID',
+    'CREATE TABLE IF NOT EXISTS slow_query_samples ('
+    ' id INTEGER PRIMARY KEY,'
+    ' fingerprint TEXT NOT NULL,'
+    ' created REAL NOT NULL,'
+    ' view TEXT NOT NULL,'
+    ' duration_ms REAL NOT NULL,'
+    ' sql TEXT NOT NULL,'
+    ' params TEXT NOT NULL,'
+    ' plan TEXT NOT NULL'
+    ')',
+    'CREATE INDEX IF NOT EXISTS slow_query_samples_fingerprint '
+    'ON slow_query_samples (fingerprint, created)',
+)
+
+journal = LocalConnection(SLOW_QUERY_DB, SCHEMA)
+_explained = {}
+_explained_lock = threading.Lock()
+
+STRINGS = re.compile(r"'(?:[^']|'')*'")
+NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+IN_LISTS = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.I)
+SPACES = re.compile(r'\s+')
+
+
+def normalize(sql):
+    """SQL без конкретных значений: одинаков для запросов одной формы."""
+    sql = STRINGS.sub('?', sql)
+    sql = NUMBERS.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = IN_LISTS.sub('IN (...)', sql)
+    return SPACES.sub(' ', sql).strip()
+
+
+def fingerprint(sql):
+    return hashlib.md5(normalize(sql).encode()).hexdigest()[:16]
+
+
+def db():
+    return journal.get()
+
+
+def explain(sql, params):
+    """План запроса; ошибки не мешают самому запросу."""
+    if not sql.lstrip().upper().startswith(EXPLAINABLE):
+        return ''
+    prefix = (
+        'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite'
+        else 'EXPLAIN ')
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            return '\n'.join(
+                ' '.join(str(column) for column in row)
+                for row in cursor.fetchall()
+            )
+    except Exception as error:
+        return f'EXPLAIN не удался: {error}'
+
+
+def should_explain(key, now):
+    with _explained_lock:
+        if now - _explained.get(key, float('-inf')) < RATE_LIMIT:
+            return False
+        _explained[key] = now
+        return True
+
+
+def count_query(conn, key, view, duration_ms, now):
+    # UPSERT появился только в SQLite 3.24: UPDATE, а если строки ещё
+    # нет — INSERT под тем же BEGIN IMMEDIATE
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        updated = conn.execute(
+            'UPDATE slow_query_stats SET count = count + 1, '
+            'total_ms = total_ms + ?, max_ms = max(max_ms, ?), '
+            'last_seen = ? WHERE fingerprint = ? AND view = ?',
+            (duration_ms, duration_ms, now, key, view),
+        ).rowcount
+        if not updated:
+            conn.execute(
+                'INSERT INTO slow_query_stats '
+                '(fingerprint, view, count, total_ms, max_ms, last_seen) '
+                'VALUES (?, ?, 1, ?, ?, ?)',
+                (key, view, duration_ms, duration_ms, now),
+            )
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+
+
+def record(sql, params, many, duration_ms, view):
+    key = fingerprint(sql)
+    now = time.time()
+    conn = db()
+    count_query(conn, key, view, duration_ms, now)
+    if not should_explain(key, now):
+        return
+    plan = '' if many else explain(sql, params)
+    params_text = repr(params)[:1000]
+    conn.execute(
+        'INSERT INTO slow_query_samples '
+        '(fingerprint, created, view, duration_ms, sql, params, plan) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?)',
+        (key, now, view, duration_ms, sql, params_text, plan),
+    )
+    logger.warning(
+        'Slow query %s in %s: %.1f ms\n%s\nparams: %s\nplan:\n%s',
+        key, view, duration_ms, sql, params_text, plan,
+    )
+
+
+class SlowQueryLogger:
+    """execute_wrapper, который замечает медленные запросы view."""
+
+    def __init__(self, request):
+        self.request = request
+        self.active = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.active:
+            # EXPLAIN внутри record тоже идёт через этот wrapper
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            if duration_ms >= THRESHOLD_MS:
+                self.report(sql, params, many, duration_ms)
+
+    def report(self, sql, params, many, duration_ms):
+        # Ошибка журнала не должна ронять запрос, который его вызвал
+        self.active = True
+        try:
+            match = self.request.resolver_match
+            record(
+                sql, params, many, duration_ms,
+                match.view_name if match else self.request.path,
+            )
+        except Exception:
+            logger.exception('Slow query was not recorded')
+        finally:
+            self.active = False
+
+
+class SlowQueryMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with connection.execute_wrapper(SlowQueryLogger(request)):
+            return self.get_response(request)
+
+
+def report(order='total_ms', limit=20, view=None, since=None):
+    """Отпечатки с суммарной статистикой и последним примером."""
+    if order not in ORDERS:
+        raise ValueError(f'Неизвестная сортировка: {order}')
+    where, params = [], []
+    if view:
+        where.append('view = ?')
+        params.append(view)
+    if since:
+        where.append('last_seen >= ?')
+        params.append(since)
+    condition = f'WHERE {" AND ".join(where)}' if where else ''
+    rows = db().execute(
+        f'SELECT fingerprint, SUM(count) AS count, SUM(total_ms) AS total_ms,'
+        f' MAX(max_ms) AS max_ms, SUM(total_ms) / SUM(count) AS avg_ms,'
+        f" GROUP_CONCAT(view, ', ') AS views "
+        f'FROM slow_query_stats {condition} GROUP BY fingerprint '
+        f'ORDER BY {order} DESC LIMIT ?',
+        [*params, limit],
+    ).fetchall()
+    result = []
+    for key, count, total_ms, max_ms, avg_ms, views in rows:
+        sample = db().execute(
+            'SELECT sql, params, plan FROM slow_query_samples '
+            'WHERE fingerprint = ? ORDER BY created DESC LIMIT 1', (key,),
+        ).fetchone() or ('', '', '')
+        result.append({
+            'fingerprint': key,
+            'count': count,
+            'total_ms': total_ms,
+            'max_ms': max_ms,
+            'avg_ms': avg_ms,
+            'views': views,
+            'sql': normalize(sample[0]),
+            'params': sample[1],
+            'plan': sample[2],
+        })
+    return result
+
+
+def clear():
+    conn = db()
+    conn.execute('DELETE FROM slow_query_stats')
+    conn.execute('DELETE FROM slow_query_samples')
+    with _explained_lock:
+        _explained.clear()
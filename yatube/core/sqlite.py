@@ -0,0 +1,42 @@
+"""Соединения с общими файлами SQLite: кэш, метрики, журнал запросов.
+
+sqlite3 не любит делить соединение между потоками, а унаследованное
+после fork соединение использовать нельзя, поэтому у каждого потока
+каждого процесса своё. Файл при этом общий для всех процессов на хосте.
+"""
+import os
+import sqlite3
+import threading
+
+PRAGMAS = ('journal_mode=WAL',)
+
+
+def connect(path, schema=(), pragmas=PRAGMAS):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    db = sqlite3.connect(
+        path, timeout=30, isolation_level=None, check_same_thread=False)
+    for pragma in pragmas:
+        db.execute(f'PRAGMA {pragma}')
+    for statement in schema:
+        db.execute(statement)
+    return db
+
+
+class LocalConnection:
+    """connect(), которое открывается один раз на поток и процесс."""
+
+    def __init__(self, path, schema=(), pragmas=PRAGMAS):
+        self.path = path
+        self.schema = schema
+        self.pragmas = pragmas
+        self._local = threading.local()
+
+    def get(self):
+        db = getattr(self._local, 'db', None)
+        if db is None or getattr(self._local, 'pid', None) != os.getpid():
+            db = connect(self.path, self.schema, self.pragmas)
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
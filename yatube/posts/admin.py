@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from . import search
 from .models import Group, Post, Comment, Follow
 
 # Register your models here.
@@ -16,6 +17,12 @@ class PostAdmin(admin.ModelAdmin):
     # Это свойство сработает для всех колонок: где пусто — там будет эта строка
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Ищем по FTS5-индексу (posts/search.py), а не через icontains
+        if not search_term:
+            return queryset, False
+        return search.filter_posts(queryset, search_term), False
+
 # При регистрации модели Post источником конфигурации для неё назначаем
 # класс PostAdmin
 
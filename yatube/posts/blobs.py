@@ -0,0 +1,47 @@
+"""Счётчики ссылок на файлы картинок (таблица ImageBlob).
+
+Одинаковые картинки хранятся одним файлом (см. posts/storage.py), поэтому
+файл можно удалить, только когда на него не ссылается ни один пост.
+Счётчики меняются сигналами постов, а файлы без ссылок вместе с их
+миниатюрами удаляет команда gc_image_blobs.
+"""
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import ImageBlob, Post
+
+
+def acquire(name):
+    if not name:
+        return
+    updated = ImageBlob.objects.filter(name=name).update(
+        refcount=F('refcount') + 1, updated=timezone.now())
+    if not updated:
+        # Строки ещё нет: считаем ссылки с нуля, новый пост уже учтён
+        ImageBlob.objects.bulk_create(
+            [ImageBlob(
+                name=name, refcount=Post.objects.filter(image=name).count())],
+            ignore_conflicts=True,
+        )
+
+
+def release(name):
+    if not name:
+        return
+    ImageBlob.objects.filter(name=name, refcount__gt=0).update(
+        refcount=F('refcount') - 1, updated=timezone.now())
+
+
+def recount(names):
+    """Выставляет счётчики по таблице постов (после bulk_create)."""
+    names = list(names)
+    for start in range(0, len(names), 500):
+        chunk = names[start:start + 500]
+        counts = dict(
+            Post.objects.filter(image__in=chunk).values_list('image')
+            .annotate(total=Count('pk')).order_by())
+        ImageBlob.objects.bulk_create(
+            [ImageBlob(name=name) for name in counts], ignore_conflicts=True)
+        for name, total in counts.items():
+            ImageBlob.objects.filter(name=name).update(
+                refcount=total, updated=timezone.now())
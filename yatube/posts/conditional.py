@@ -0,0 +1,97 @@
+"""Условные GET-запросы (ETag / Last-Modified) к страницам постов.
+
+Валидаторы считаются без рендеринга страницы: из поколения ленты
+(posts/feed_cache.py), версий карточек (posts/fragments.py) и не более
+чем одного запроса по индексу. Если клиент прислал актуальный ETag,
+view не вызывается и уходит 304. В ETag входят пользователь и его
+CSRF-cookie, поэтому страницы разных пользователей не путаются.
+Комментарии и подписки меняют свои версии (posts/signals.py).
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from . import feed_cache, fragments
+from .models import Post, User
+from .paginators import CURSOR_PARAM
+
+
+def make_etag(request, *parts):
+    raw = ':'.join(str(part) for part in (
+        feed_cache.auth_bucket(request),
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+        request.path,
+        request.GET.get('page', ''),
+        request.GET.get(CURSOR_PARAM, ''),
+        *parts,
+    ))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _versions(*pairs):
+    keys = [fragments.version_key(kind, pk) for kind, pk in pairs if pk]
+    versions = fragments.get_versions(keys)
+    return [versions[key] for key in keys]
+
+
+def feed_etag(request, *args, **kwargs):
+    """Главная и лента группы: меняются только вместе с поколением."""
+    return make_etag(request, feed_cache.get_generation())
+
+
+def feed_last_modified(request, *args, **kwargs):
+    return feed_cache.get_changed()
+
+
+def profile_etag(request, username):
+    pk = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    if pk is None:
+        return None
+    # Посты автора (и счётчик постов) меняют поколение, подписка
+    # зрителя — его версию подписок
+    return make_etag(request, feed_cache.get_generation(), *_versions(
+        ('user', pk), ('follow', request.user.pk)))
+
+
+def post_etag(request, post_id):
+    row = Post.objects.filter(pk=post_id).values_list(
+        'author_id', 'group_id').order_by().first()
+    if row is None:
+        return None
+    author_id, group_id = row
+    return make_etag(request, feed_cache.get_generation(), *_versions(
+        ('post', post_id), ('comments', post_id),
+        ('user', author_id), ('group', group_id)))
+
+
+def follow_etag(request):
+    # Строки ленты подписок меняют поколение: при сохранении поста и
+    # ещё раз после фоновой раскладки (posts/timeline.py); подписки
+    # пользователя меняют его версию. Запросов к базе не нужно
+    return make_etag(request, feed_cache.get_generation(), *_versions(
+        ('follow', request.user.pk)))
+
+
+def conditional_page(etag_func, last_modified_func=None):
+    """condition() из Django для страниц, которые зависят от пользователя.
+
+    Ответ помечается Vary: Cookie и no-cache, чтобы браузер и прокси
+    хранили копию, но каждый раз сверяли её по ETag.
+    """
+    def decorator(view):
+        conditional_view = condition(etag_func, last_modified_func)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            patch_vary_headers(response, ('Cookie',))
+            patch_cache_control(
+                response, no_cache=True,
+                private=request.user.is_authenticated)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,149 @@
+"""Формат выгрузки и загрузки данных (export_yatube / import_yatube).
+
+Каждая модель пишется в отдельный файл JSONL или CSV, по записи на
+строку. Связи хранятся естественными ключами: пользователь — username,
+группа — slug, поэтому выгрузку можно загрузить в другую базу.
+Комментарии ссылаются на пост по его id в исходной базе.
+"""
+import csv
+import datetime
+import gzip
+import io
+import json
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Comment, Follow, Group, Post, User
+
+FORMATS = ('jsonl', 'csv')
+
+# Порядок важен для загрузки: ссылки идут только на модели выше
+MODELS = {
+    'user': {
+        'model': User,
+        'fields': {
+            'id': 'id',
+            'username': 'username',
+            'first_name': 'first_name',
+            'last_name': 'last_name',
+            'date_joined': 'date_joined',
+        },
+        'date_field': 'date_joined',
+    },
+    'group': {
+        'model': Group,
+        'fields': {
+            'id': 'id',
+            'title': 'title',
+            'slug': 'slug',
+            'description': 'description',
+        },
+        'date_field': None,
+    },
+    'post': {
+        'model': Post,
+        'fields': {
+            'id': 'id',
+            'text': 'text',
+            'pub_date': 'pub_date',
+            'author': 'author__username',
+            'group': 'group__slug',
+            'image': 'image',
+        },
+        'date_field': 'pub_date',
+    },
+    'comment': {
+        'model': Comment,
+        'fields': {
+            'id': 'id',
+            'post': 'post_id',
+            'author': 'author__username',
+            'text': 'text',
+            'created': 'created',
+        },
+        'date_field': 'created',
+    },
+    'follow': {
+        'model': Follow,
+        'fields': {
+            'id': 'id',
+            'user': 'user__username',
+            'author': 'author__username',
+        },
+        'date_field': None,
+    },
+}
+DATE_COLUMNS = {
+    name: spec['date_field'] for name, spec in MODELS.items()
+    if spec['date_field']
+}
+
+
+def filename(name, file_format, compress=False):
+    return f'{name}.{file_format}' + ('.gz' if compress else '')
+
+
+def open_text(path, mode):
+    """Открывает файл выгрузки как текст; .gz сжимается на лету."""
+    if str(path).endswith('.gz'):
+        return io.TextIOWrapper(
+            gzip.open(path, mode + 'b'), encoding='utf-8', newline='')
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+def _plain(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+class JsonlWriter:
+
+    def __init__(self, stream, columns):
+        self.stream = stream
+        self.columns = columns
+
+    def write_rows(self, rows):
+        self.stream.writelines(
+            json.dumps(
+                dict(zip(self.columns, map(_plain, row))),
+                ensure_ascii=False,
+            ) + '\n'
+            for row in rows
+        )
+
+
+class CsvWriter:
+
+    def __init__(self, stream, columns):
+        self.writer = csv.writer(stream)
+        self.writer.writerow(columns)
+
+    def write_rows(self, rows):
+        self.writer.writerows(
+            ['' if value is None else _plain(value) for value in row]
+            for row in rows
+        )
+
+
+WRITERS = {'jsonl': JsonlWriter, 'csv': CsvWriter}
+
+
+def read_rows(stream, file_format):
+    """Записи файла выгрузки словарями; читает построчно."""
+    if file_format == 'csv':
+        for row in csv.DictReader(stream):
+            yield {key: value or None for key, value in row.items()}
+        return
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def parse_date(value):
+    """Дата из ISO 8601; дата без зоны считается временем сервера."""
+    parsed = parse_datetime(value) if value else None
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
@@ -0,0 +1,96 @@
+"""Кэш страниц ленты, который сбрасывается событиями, а не по таймеру.
+
+Ключ страницы включает номер поколения ленты. Сохранение или удаление
+поста увеличивает поколение, и все закэшированные страницы сразу
+перестают использоваться. Таймаут остаётся только страховкой.
+"""
+import datetime
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from .paginators import CURSOR_PARAM
+
+GENERATION_KEY = 'posts:feed:generation'
+CHANGED_KEY = 'posts:feed:changed'
+FEED_CACHE_TIMEOUT = getattr(settings, 'FEED_CACHE_TIMEOUT', 60 * 60)
+
+
+def get_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, 1, None)
+        generation = cache.get(GENERATION_KEY, 1)
+    return generation
+
+
+def bump_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        # Ключа нет (кэш очищен) — любое новое поколение подойдёт
+        cache.add(GENERATION_KEY, 1, None)
+    cache.set(CHANGED_KEY, time.time(), None)
+
+
+def get_changed():
+    """Время последнего изменения ленты (для Last-Modified)."""
+    changed = cache.get(CHANGED_KEY)
+    if changed is None:
+        # Время потеряно вместе с кэшем: считаем, что лента изменилась
+        # только что, иначе клиент мог бы получить 304 на старую копию
+        cache.add(CHANGED_KEY, time.time(), None)
+        changed = cache.get(CHANGED_KEY, time.time())
+    # Last-Modified хранит целые секунды: округляем вверх
+    return datetime.datetime.fromtimestamp(
+        math.ceil(changed), tz=datetime.timezone.utc)
+
+
+def auth_bucket(request):
+    # Шапка и переключатель лент зависят от пользователя,
+    # поэтому анонимы делят одну копию, а пользователи — каждый свою.
+    if request.user.is_authenticated:
+        return f'u{request.user.pk}'
+    return 'anon'
+
+
+def page_key(request):
+    return ':'.join((
+        'posts:feed:page',
+        str(get_generation()),
+        auth_bucket(request),
+        request.path,
+        request.GET.get('page', ''),
+        request.GET.get(CURSOR_PARAM, ''),
+    ))
+
+
+def feed_cache_page(timeout=FEED_CACHE_TIMEOUT):
+    """Кэширует страницу ленты до смены поколения (или таймаута)."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            key = page_key(request)
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+            else:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200 and not response.streaming:
+                    cache.set(
+                        key,
+                        (response.content, response['Content-Type']),
+                        timeout,
+                    )
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,189 @@
+"""Ленты Atom/RSS: весь сайт, группа и автор.
+
+Лента отдаётся потоком: шапка, затем записи по одной из ограниченного
+запроса через iterator(). Готовый XML кэшируется до смены поколения
+ленты (posts/feed_cache.py), поэтому повторный опрос стоит одного
+чтения из кэша, а с совпавшим ETag — ответа 304 без тела.
+"""
+import hashlib
+import io
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+from django.utils.text import Truncator
+from django.utils.xmlutils import SimplerXMLGenerator
+
+from . import feed_cache
+from .models import Group, Post, User
+
+FEED_ITEMS = getattr(settings, 'FEED_ITEMS', 20)
+ENCODING = 'utf-8'
+
+
+class StreamingFeedMixin:
+    """Лента, записи которой пишутся по одной, а не из списка items."""
+    closing_tag = ''
+    latest = None
+
+    def latest_post_date(self):
+        # Записи ещё не прочитаны: дату свежей записи передают заранее
+        return self.latest or super().latest_post_date()
+
+    def stream(self, posts, make_item):
+        posts = iter(posts)
+        first = next(posts, None)
+        self.latest = first.pub_date if first is not None else None
+        buffer = io.StringIO()
+        self.write(buffer, ENCODING)
+        # Без записей write() даёт пустую ленту: записи вставляются
+        # перед её закрывающими тегами
+        document = buffer.getvalue()
+        split = document.rindex(self.closing_tag)
+        yield document[:split]
+        if first is not None:
+            yield self.render_item(make_item(first))
+        for post in posts:
+            yield self.render_item(make_item(post))
+        yield document[split:]
+
+    def render_item(self, item):
+        buffer = io.StringIO()
+        # add_item дополняет словарь записи полями по умолчанию
+        self.items = []
+        self.add_item(**item)
+        self.write_items(SimplerXMLGenerator(buffer, ENCODING))
+        self.items = []
+        return buffer.getvalue()
+
+
+class AtomFeed(StreamingFeedMixin, Atom1Feed):
+    closing_tag = '</feed>'
+
+
+class RssFeed(StreamingFeedMixin, Rss201rev2Feed):
+    closing_tag = '</channel>'
+
+
+FORMATS = {
+    'atom': AtomFeed,
+    'rss': RssFeed,
+}
+
+
+def _format(request):
+    name = request.GET.get('format')
+    return name if name in FORMATS else 'atom'
+
+
+def feed_key(request):
+    return ':'.join((
+        'posts:feed:xml',
+        str(feed_cache.get_generation()),
+        # В XML абсолютные ссылки, поэтому хост тоже часть ключа
+        request.get_host(),
+        request.path,
+        _format(request),
+    ))
+
+
+def _item(request, post):
+    link = request.build_absolute_uri(
+        reverse('posts:post_detail', args=(post.pk,)))
+    return {
+        'title': Truncator(post.text).chars(50),
+        'link': link,
+        'description': post.text,
+        'unique_id': link,
+        'author_name': post.author.get_full_name() or post.author.username,
+        'pubdate': post.pub_date,
+        'categories': (post.group.title,) if post.group_id else (),
+    }
+
+
+def _cached(key, chunks):
+    # Лента попадает в кэш, только если клиент дочитал её до конца
+    body = []
+    for chunk in chunks:
+        chunk = chunk.encode(ENCODING)
+        body.append(chunk)
+        yield chunk
+    cache.set(key, b''.join(body), feed_cache.FEED_CACHE_TIMEOUT)
+
+
+def _stream(request, key, feed_class, title, link, posts, description=''):
+    feed = feed_class(
+        title=title,
+        link=request.build_absolute_uri(link),
+        description=description or title,
+        feed_url=request.build_absolute_uri(request.path),
+        language='ru',
+    )
+    posts = posts.select_related('author', 'group')[:FEED_ITEMS]
+    chunks = feed.stream(
+        posts.iterator(), lambda post: _item(request, post))
+    return _cached(key, chunks)
+
+
+def feed_response(request, describe):
+    """Ответ с лентой.
+
+    describe() вызывается, только когда тело нужно построить заново, и
+    возвращает заголовок, ссылку, queryset постов и описание (или бросает
+    Http404). ETag зависит лишь от ключа кэша, поэтому 304 отдаётся без
+    запросов к базе: совпавший ETag клиент мог получить только вместе с
+    лентой существующего объекта в том же поколении.
+    """
+    key = feed_key(request)
+    etag = '"%s"' % hashlib.md5(key.encode()).hexdigest()
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        feed_class = FORMATS[_format(request)]
+        content_type = (
+            f'{feed_class.content_type.split(";")[0]}; charset={ENCODING}')
+        body = cache.get(key)
+        # Пока лента в кэше, объект заведомо существует и запросов нет
+        if body is not None:
+            response = HttpResponse(body, content_type=content_type)
+        else:
+            response = StreamingHttpResponse(
+                _stream(request, key, feed_class, *describe()),
+                content_type=content_type,
+            )
+    response['ETag'] = etag
+    # Лента одинакова для всех: прокси могут хранить её, сверяя по ETag
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+def site_feed(request):
+    return feed_response(request, lambda: (
+        'Yatube: последние записи', reverse('posts:index'),
+        Post.objects.all()))
+
+
+def group_feed(request, slug):
+    def describe():
+        group = get_object_or_404(Group, slug=slug)
+        return (
+            f'Yatube: {group.title}',
+            reverse('posts:group_list', args=(slug,)),
+            group.posts.all(),
+            group.description,
+        )
+    return feed_response(request, describe)
+
+
+def profile_feed(request, username):
+    def describe():
+        author = get_object_or_404(User, username=username)
+        return (
+            f'Yatube: {author.get_full_name() or author.username}',
+            reverse('posts:profile', args=(username,)),
+            author.posts.all(),
+        )
+    return feed_response(request, describe)
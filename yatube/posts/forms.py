@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from . import uploads
 from .models import Comment, Post
 
 
@@ -13,6 +15,13 @@ class PostForm(forms.ModelForm):
             'image': 'Изображение',
         }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        # Новую загрузку пережимаем, уже сохранённую картинку не трогаем
+        if isinstance(image, UploadedFile):
+            return uploads.process(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
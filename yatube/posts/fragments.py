@@ -0,0 +1,90 @@
+"""Кэш отрендеренных карточек постов.
+
+Ключ карточки собирается из id поста и версий поста, автора и группы.
+Версии хранятся в кэше и меняются сигналами при сохранении объектов,
+поэтому старые карточки не удаляются, а просто перестают читаться.
+На страницу уходит один get_many за версиями и один за карточками,
+рендерятся только промахи.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from . import thumbnails
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+CARD_CACHE_TIMEOUT = getattr(settings, 'CARD_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def version_key(kind, pk):
+    return f'posts:ver:{kind}:{pk}'
+
+
+def new_version():
+    return uuid.uuid4().hex[:12]
+
+
+def bump_version(kind, pk):
+    cache.set(version_key(kind, pk), new_version(), None)
+
+
+def bump_versions(kind, pks):
+    """bump_version для многих объектов одной записью в кэш."""
+    cache.set_many(
+        {version_key(kind, pk): new_version() for pk in pks}, None)
+
+
+def get_versions(keys):
+    versions = cache.get_many(keys)
+    for key in set(keys) - set(versions):
+        # Версия вытеснена из кэша: заводим новую, а не начинаем с нуля,
+        # иначе могла бы ожить устаревшая карточка.
+        cache.add(key, new_version(), None)
+        versions[key] = cache.get(key)
+    return versions
+
+
+def _card_version_keys(post):
+    keys = [version_key('post', post.pk), version_key('user', post.author_id)]
+    if post.group_id:
+        keys.append(version_key('group', post.group_id))
+    return keys
+
+
+def render_cards(posts, link_author=True, show_group=True):
+    """Возвращает HTML карточек в порядке постов."""
+    posts = list(posts)
+    if not posts:
+        return []
+    version_keys = []
+    for post in posts:
+        version_keys.extend(_card_version_keys(post))
+    versions = get_versions(version_keys)
+    variant = f'{int(link_author)}{int(show_group)}'
+    card_keys = [
+        ':'.join(
+            ['posts:card', variant, str(post.pk)]
+            + [str(versions[key]) for key in _card_version_keys(post)]
+        )
+        for post in posts
+    ]
+    cards = cache.get_many(card_keys)
+    to_render = [
+        (key, post) for key, post in zip(card_keys, posts) if key not in cards]
+    # Миниатюры всех рендерящихся карточек разрешаются одним проходом
+    images = thumbnails.resolve(post.image for key, post in to_render)
+    missing = {}
+    for key, post in to_render:
+        post.card_thumbnail = images.get(post.image.name)
+        missing[key] = render_to_string(CARD_TEMPLATE, {
+            'post': post,
+            'link_author': link_author,
+            'show_group': show_group,
+        })
+    if missing:
+        cache.set_many(missing, CARD_CACHE_TIMEOUT)
+        cards.update(missing)
+    return [mark_safe(cards[key]) for key in card_keys]
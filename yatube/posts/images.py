@@ -0,0 +1,84 @@
+"""Метаданные картинок постов.
+
+Размеры, объём и хэш файла считаются один раз при загрузке и хранятся
+в Post вместе с картой готовых миниатюр. Шаблонам и коду миниатюр не
+нужно открывать файл, чтобы узнать размеры или имя миниатюры.
+"""
+import hashlib
+import json
+
+from PIL import Image
+
+CHUNK_SIZE = 64 * 1024
+FIELDS = ('image_width', 'image_height', 'image_size', 'image_hash')
+
+
+def inspect(file_):
+    """Ширина, высота, размер в байтах и SHA-256 файла картинки."""
+    file_.open('rb')
+    file_.seek(0)
+    # PIL читает только заголовок, пиксели не декодируются
+    with Image.open(file_) as image:
+        width, height = image.size
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in file_.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+        size += len(chunk)
+    file_.seek(0)
+    return {
+        'image_width': width,
+        'image_height': height,
+        'image_size': size,
+        'image_hash': digest.hexdigest(),
+    }
+
+
+def describe(post):
+    """Заполняет метаданные картинки поста перед сохранением."""
+    values = inspect(post.image) if post.image else {
+        'image_width': None,
+        'image_height': None,
+        'image_size': None,
+        'image_hash': '',
+    }
+    for field, value in values.items():
+        setattr(post, field, value)
+    # Миниатюры старой картинки к новой не относятся
+    post.image_variants = ''
+
+
+def dumps(variants):
+    return json.dumps(variants, sort_keys=True)
+
+
+def variant(thumbnail):
+    return {
+        'name': thumbnail.name,
+        'width': thumbnail.width,
+        'height': thumbnail.height,
+    }
+
+
+def record_variants(name, variants):
+    """Дописывает готовые миниатюры в посты с картинкой name.
+
+    Слияние идёт под блокировкой строк, чтобы параллельные задачи не
+    затирали варианты друг друга. save() не вызывается: сигналы сбросили
+    бы поколение всех лент, а устарели только карточки этих постов.
+    Закэшированные страницы с оригиналом доживут до смены поколения.
+    """
+    from django.db import transaction
+
+    from . import fragments
+    from .models import Post
+    with transaction.atomic():
+        posts = list(
+            Post.objects.select_for_update().filter(image=name)
+            .only('pk', 'image_variants'))
+        for post in posts:
+            stored = post.variants
+            stored.update(variants)
+            post.image_variants = dumps(stored)
+        Post.objects.bulk_update(posts, ['image_variants'])
+    fragments.bump_versions('post', [post.pk for post in posts])
@@ -0,0 +1,260 @@
+"""Массовая загрузка данных в формате posts/exchange.py.
+
+Строки пишутся через bulk_create порциями по batch_size, несколько
+порций — в одной транзакции. Пользователи и группы сопоставляются по
+username и slug через словари в памяти. Посты получают id со сдвигом
+от текущего максимума, а словарь id из выгрузки → id в базе позволяет
+комментариям находить свой пост без запросов. Посты и комментарии,
+которые уже есть в базе (тот же автор, дата и текст), пропускаются,
+поэтому повторная загрузка той же выгрузки ничего не дублирует.
+bulk_create не вызывает сигналы, поэтому счётчики, ленты подписок и
+счётчики картинок пересчитываются в finish() — только для затронутых
+загрузкой авторов и их подписчиков, порциями по своей транзакции.
+"""
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import blobs, exchange, feed_cache, stats, timeline
+from .models import Comment, Follow, Group, Post, User
+
+BATCH_SIZE = 1000
+TRANSACTION_SIZE = 20
+# Естественные ключи записей, у которых в модели нет уникального поля
+NATURAL_KEYS = {
+    'post': ('author_id', 'pub_date', 'text'),
+    'comment': ('post_id', 'created', 'author_id', 'text'),
+}
+# Столько записей сверяется одним запросом: у SQLite до 999 параметров
+LOOKUP_SIZE = 500
+
+
+@contextmanager
+def preserve_dates():
+    """Отключает auto_now_add, чтобы сохранить даты из выгрузки."""
+    fields = [
+        Post._meta.get_field('pub_date'),
+        Comment._meta.get_field('created'),
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+@contextmanager
+def deferred_indexes(models):
+    """Снимает обычные индексы моделей на время загрузки.
+
+    Уникальные ограничения остаются: на них держится ignore_conflicts.
+    """
+    removed = [
+        (model, index) for model in models for index in model._meta.indexes]
+    with connection.schema_editor() as editor:
+        for model, index in removed:
+            editor.remove_index(model, index)
+    try:
+        yield
+    finally:
+        with connection.schema_editor() as editor:
+            for model, index in removed:
+                editor.add_index(model, index)
+
+
+def parse_date(value):
+    return exchange.parse_date(value) or timezone.now()
+
+
+def batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Importer:
+
+    def __init__(self, stdout, batch_size=BATCH_SIZE,
+                 transaction_size=TRANSACTION_SIZE):
+        self.stdout = stdout
+        self.batch_size = batch_size
+        self.transaction_size = transaction_size
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        # id постов из выгрузки сдвигаются за пределы существующих
+        self.post_offset = Post.objects.aggregate(
+            last=Max('pk'))['last'] or 0
+        # id поста в выгрузке -> id в базе
+        self.posts = {}
+        self.images = set()
+        # Кого коснулась загрузка: авторы новых постов и стороны подписок
+        self.authors = set()
+        self.readers = set()
+
+    def load(self, name, rows):
+        """Загружает записи модели name; возвращает число вставленных."""
+        build = getattr(self, f'build_{name}')
+        model = exchange.MODELS[name]['model']
+        started = time.monotonic()
+        inserted = skipped = 0
+        chunks = batches(rows, self.batch_size)
+        with preserve_dates():
+            for group in batches(chunks, self.transaction_size):
+                with transaction.atomic():
+                    for batch in group:
+                        objects = self.unseen(name, [
+                            obj for obj in map(build, batch)
+                            if obj is not None
+                        ])
+                        skipped += len(batch) - len(objects)
+                        self.insert(name, model, objects)
+                        inserted += len(objects)
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            f'{name}: {inserted} строк, {inserted / elapsed:.0f} строк/с, '
+            f'пропущено {skipped}')
+        return inserted
+
+    def unseen(self, name, objects):
+        """Отбрасывает записи, которые уже загружены раньше."""
+        fields = NATURAL_KEYS.get(name)
+        if fields is None:
+            return objects
+        model = exchange.MODELS[name]['model']
+        fresh = []
+        for chunk in batches(objects, LOOKUP_SIZE):
+            # Первое поле сужает поиск по индексу, второе — дата
+            dates = [getattr(obj, fields[1]) for obj in chunk]
+            existing = {
+                row[:-1]: row[-1]
+                for row in model.objects.filter(**{
+                    f'{fields[0]}__in': {
+                        getattr(obj, fields[0]) for obj in chunk},
+                    f'{fields[1]}__range': (min(dates), max(dates)),
+                }).values_list(*fields, 'pk')
+            }
+            for obj in chunk:
+                pk = existing.get(
+                    tuple(getattr(obj, field) for field in fields))
+                if pk is None:
+                    fresh.append(obj)
+                elif name == 'post':
+                    # Комментарии пойдут к уже загруженному посту
+                    self.posts[obj.pk - self.post_offset] = pk
+        return fresh
+
+    def insert(self, name, model, objects):
+        # Размер одного INSERT Django подбирает под ограничения базы
+        # (у SQLite — не больше 500 строк), порция может быть больше
+        model.objects.bulk_create(
+            objects,
+            # Повторная подписка не ошибка: unique_follow её отбросит
+            ignore_conflicts=name == 'follow',
+        )
+        if name == 'post':
+            self.authors.update(post.author_id for post in objects)
+        elif name == 'follow':
+            self.authors.update(follow.author_id for follow in objects)
+            self.readers.update(follow.user_id for follow in objects)
+        elif name == 'user':
+            self.users.update(User.objects.filter(
+                username__in=[user.username for user in objects],
+            ).values_list('username', 'pk'))
+        elif name == 'group':
+            self.groups.update(Group.objects.filter(
+                slug__in=[group.slug for group in objects],
+            ).values_list('slug', 'pk'))
+
+    def build_user(self, row):
+        if row['username'] in self.users:
+            return None
+        # Дубликат в той же порции тоже пропускаем; id появится после вставки
+        self.users[row['username']] = None
+        return User(
+            username=row['username'],
+            first_name=row.get('first_name') or '',
+            last_name=row.get('last_name') or '',
+            date_joined=parse_date(row.get('date_joined')),
+            # Пароли не выгружаются: войти можно после сброса пароля
+            password=make_password(None),
+        )
+
+    def build_group(self, row):
+        if row['slug'] in self.groups:
+            return None
+        self.groups[row['slug']] = None
+        return Group(
+            title=row['title'], slug=row['slug'],
+            description=row.get('description') or '')
+
+    def build_post(self, row):
+        author_id = self.users.get(row['author'])
+        if author_id is None:
+            return None
+        source_id = int(row['id'])
+        self.posts[source_id] = self.post_offset + source_id
+        image = row.get('image') or ''
+        if image:
+            self.images.add(image)
+        return Post(
+            pk=self.posts[source_id],
+            text=row['text'],
+            pub_date=parse_date(row.get('pub_date')),
+            author_id=author_id,
+            group_id=self.groups.get(row.get('group')),
+            image=image,
+        )
+
+    def build_comment(self, row):
+        author_id = self.users.get(row['author'])
+        post_id = self.posts.get(int(row['post']))
+        if author_id is None or post_id is None:
+            return None
+        return Comment(
+            post_id=post_id,
+            author_id=author_id,
+            text=row['text'],
+            created=parse_date(row.get('created')),
+        )
+
+    def build_follow(self, row):
+        user_id = self.users.get(row['user'])
+        author_id = self.users.get(row['author'])
+        if user_id is None or author_id is None or user_id == author_id:
+            return None
+        return Follow(user_id=user_id, author_id=author_id)
+
+    def finish(self):
+        """Пересчитывает то, что обычно поддерживают сигналы."""
+        # Посты вставлены с явными id: последовательность надо догнать
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Post]):
+                cursor.execute(sql)
+        blobs.recount(self.images)
+        for ids in batches(sorted(self.authors | self.readers), LOOKUP_SIZE):
+            stats.reconcile(ids)
+        started = time.monotonic()
+        # Новые посты должны попасть в ленты всех подписчиков авторов
+        readers = set(self.readers)
+        for ids in batches(sorted(self.authors), LOOKUP_SIZE):
+            readers.update(Follow.objects.filter(
+                author_id__in=ids).values_list('user_id', flat=True))
+        processed = 0
+        for ids in batches(sorted(readers), LOOKUP_SIZE):
+            processed += timeline.rebuild(users=ids)
+        self.stdout.write(
+            f'Ленты подписок пересобраны: {processed} подписок за '
+            f'{time.monotonic() - started:.0f} с')
+        feed_cache.bump_generation()
@@ -0,0 +1,86 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from posts import fragments, images, thumbnails
+from posts.models import Post
+
+
+def read_metadata(post):
+    try:
+        with post.image.open('rb'):
+            return images.inspect(post.image), None
+    except Exception as error:
+        return None, error
+
+
+def ready_variants(posts):
+    """Уже созданные миниатюры постов по пресетам, из KV-хранилища."""
+    files = {post.image.name: post.image for post in posts}
+    variants = {name: {} for name in files}
+    for geometry, options in thumbnails.PRESETS:
+        found = thumbnails.lookup(files, geometry, options)
+        for name, thumbnail in found.items():
+            key = thumbnails.preset_key(geometry, options)
+            variants[name][key] = images.variant(thumbnail)
+    return variants
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет размеры, объём, хэш и карту миниатюр картинок постов, '
+        'загруженных до появления этих полей.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько постов обрабатывать за один проход.',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Сколько файлов читать параллельно.',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = Post.objects.exclude(image='').filter(image_hash='')
+        last_pk = 0
+        updated = failed = 0
+        # Работа упирается в чтение файлов и hashlib, который отпускает
+        # GIL, поэтому достаточно потоков
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            while True:
+                posts = list(
+                    queryset.filter(pk__gt=last_pk).order_by('pk')
+                    [:batch_size]
+                )
+                if not posts:
+                    break
+                last_pk = posts[-1].pk
+                changed = []
+                for post, (values, error) in zip(
+                        posts, executor.map(read_metadata, posts)):
+                    if error is not None:
+                        failed += 1
+                        self.stderr.write(f'{post.image.name}: {error}')
+                        continue
+                    for field, value in values.items():
+                        setattr(post, field, value)
+                    changed.append(post)
+                updated += self.save(changed)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено постов: {updated}, с ошибками: {failed}'))
+
+    def save(self, posts):
+        variants = ready_variants(posts)
+        for post in posts:
+            stored = post.variants
+            stored.update(variants[post.image.name])
+            post.image_variants = images.dumps(stored)
+        Post.objects.bulk_update(
+            posts, images.FIELDS + ('image_variants',))
+        # bulk_update не шлёт сигналов, а карточки с размерами и картой
+        # миниатюр выводятся иначе: сбрасываем их версии сами
+        fragments.bump_versions('post', [post.pk for post in posts])
+        return len(posts)
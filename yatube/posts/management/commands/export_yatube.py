@@ -0,0 +1,129 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from posts import exchange
+
+
+def export_model(name, path, file_format, batch_size, after_id, since):
+    """Пишет записи модели в файл; возвращает число строк и последний id.
+
+    Строки читаются порциями по ключу (id > последнего), поэтому в памяти
+    одновременно держится не больше batch_size записей.
+    """
+    spec = exchange.MODELS[name]
+    columns = list(spec['fields'])
+    queryset = spec['model'].objects.filter(pk__gt=after_id).order_by('pk')
+    if since is not None and spec['date_field']:
+        queryset = queryset.filter(**{f'{spec["date_field"]}__gte': since})
+    queryset = queryset.values_list(*spec['fields'].values())
+    total, last_id = 0, after_id
+    with exchange.open_text(path, 'w') as stream:
+        writer = exchange.WRITERS[file_format](stream, columns)
+        while True:
+            rows = list(queryset.filter(pk__gt=last_id)[:batch_size])
+            if not rows:
+                break
+            writer.write_rows(rows)
+            total += len(rows)
+            last_id = rows[-1][0]
+    return total, last_id
+
+
+def export_in_thread(*args):
+    try:
+        return export_model(*args)
+    finally:
+        # У каждого потока своё соединение с базой
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает группы, посты, комментарии, подписки и пользователей '
+        'в JSONL или CSV, по файлу на модель.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'models', nargs='*',
+            help='Какие модели выгрузить: %s (по умолчанию все).'
+                 % ', '.join(exchange.MODELS),
+        )
+        parser.add_argument(
+            '--output', default='.', help='Каталог для файлов выгрузки.')
+        parser.add_argument(
+            '--format', choices=exchange.FORMATS, default='jsonl')
+        parser.add_argument(
+            '--gzip', action='store_true', help='Сжимать файлы gzip.')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Сколько моделей выгружать параллельно.',
+        )
+        parser.add_argument(
+            '--since',
+            help='Только записи не старше этой даты (ISO 8601); для '
+                 'моделей без даты не действует.',
+        )
+        parser.add_argument(
+            '--state',
+            help='JSON-файл с последними выгруженными id. Выгружаются '
+                 'только более новые записи, после выгрузки файл '
+                 'обновляется.',
+        )
+
+    def handle(self, *args, **options):
+        names = options['models'] or list(exchange.MODELS)
+        unknown = set(names) - set(exchange.MODELS)
+        if unknown:
+            raise CommandError(f'Неизвестные модели: {", ".join(unknown)}')
+        since = None
+        if options['since']:
+            since = exchange.parse_date(options['since'])
+            if since is None:
+                raise CommandError(f'Неверная дата: {options["since"]}')
+        state = self.read_state(options['state'])
+        os.makedirs(options['output'], exist_ok=True)
+        jobs = {
+            name: (
+                name,
+                os.path.join(options['output'], exchange.filename(
+                    name, options['format'], options['gzip'])),
+                options['format'],
+                options['batch_size'],
+                state.get(name, 0),
+                since,
+            )
+            for name in names
+        }
+        for name, (total, last_id) in self.run(jobs, options['workers']):
+            state[name] = last_id
+            self.stdout.write(f'{name}: {total}')
+        if options['state']:
+            with open(options['state'], 'w') as stream:
+                json.dump(state, stream, indent=2, sort_keys=True)
+        self.stdout.write(self.style.SUCCESS('Выгрузка завершена'))
+
+    def run(self, jobs, workers):
+        if workers < 2:
+            for name, job in jobs.items():
+                yield name, export_model(*job)
+            return
+        # Выгрузка упирается в базу и запись файлов, хватает потоков
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                name: executor.submit(export_in_thread, *job)
+                for name, job in jobs.items()
+            }
+            for name, future in futures.items():
+                yield name, future.result()
+
+    def read_state(self, path):
+        if not path or not os.path.exists(path):
+            return {}
+        with open(path) as stream:
+            return json.load(stream)
@@ -0,0 +1,94 @@
+import datetime
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+from sorl.thumbnail import delete as delete_image
+from sorl.thumbnail.images import ImageFile
+
+from posts.models import ImageBlob, Post
+from posts.storage import image_storage
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет файлы картинок, на которые не ссылается ни один пост, '
+        'вместе с их миниатюрами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько файлов проверять за один проход.',
+        )
+        parser.add_argument(
+            '--grace', type=int, default=60,
+            help='Не трогать файлы, которые менялись за последние N минут.',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что было бы удалено.',
+        )
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.cutoff = timezone.now() - datetime.timedelta(
+            minutes=options['grace'])
+        candidates = ImageBlob.objects.filter(
+            refcount=0, updated__lt=self.cutoff).order_by('name')
+        last_name = ''
+        deleted = kept = 0
+        while True:
+            names = list(
+                candidates.filter(name__gt=last_name)
+                .values_list('name', flat=True)[:options['batch_size']]
+            )
+            if not names:
+                break
+            last_name = names[-1]
+            batch_deleted = self.collect(names)
+            deleted += batch_deleted
+            kept += len(names) - batch_deleted
+        verb = 'Будет удалено' if self.dry_run else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} файлов: {deleted}, оставлено: {kept}'))
+
+    def collect(self, names):
+        # Счётчик мог разойтись с постами: перепроверяем ссылки и чиним
+        referenced = dict(
+            Post.objects.filter(image__in=names).values('image')
+            .annotate(total=Count('pk')).order_by()
+            .values_list('image', 'total')
+        )
+        for name, total in referenced.items():
+            ImageBlob.objects.filter(name=name).update(refcount=total)
+        garbage = [
+            name for name in names
+            if name not in referenced and self.is_stale(name)
+        ]
+        if self.dry_run:
+            for name in garbage:
+                self.stdout.write(name)
+            return len(garbage)
+        removed = []
+        for name in garbage:
+            try:
+                # Сам файл, его миниатюры и записи о них в KV-хранилище
+                delete_image(ImageFile(name, image_storage))
+            except (FileNotFoundError, SuspiciousFileOperation):
+                pass
+            except Exception as error:
+                self.stderr.write(f'{name}: {error}')
+                continue
+            removed.append(name)
+        ImageBlob.objects.filter(name__in=removed, refcount=0).delete()
+        return len(removed)
+
+    def is_stale(self, name):
+        try:
+            modified = image_storage.get_modified_time(name)
+        except (OSError, SuspiciousFileOperation):
+            # Файла уже нет или имя вне хранилища: строку можно убрать
+            return True
+        return modified < self.cutoff
@@ -0,0 +1,67 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import exchange, importer
+from posts.models import Comment, Follow, Post
+
+
+def find_file(directory, name):
+    """Файл выгрузки модели в каталоге и его формат."""
+    for file_format in exchange.FORMATS:
+        for compress in (False, True):
+            path = os.path.join(
+                directory, exchange.filename(name, file_format, compress))
+            if os.path.exists(path):
+                return path, file_format
+    return None, None
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает выгрузку export_yatube (JSONL или CSV, можно .gz) '
+        'через bulk_create.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Каталог с файлами выгрузки.')
+        parser.add_argument(
+            '--batch-size', type=int, default=importer.BATCH_SIZE,
+            help='Сколько строк вставлять одним запросом.',
+        )
+        parser.add_argument(
+            '--transaction-size', type=int,
+            default=importer.TRANSACTION_SIZE,
+            help='Сколько порций вставлять в одной транзакции.',
+        )
+        parser.add_argument(
+            '--defer-indexes', action='store_true',
+            help='Снять индексы постов, комментариев и подписок на время '
+                 'загрузки и построить их заново в конце.',
+        )
+
+    def handle(self, *args, **options):
+        files = {
+            name: find_file(options['input'], name)
+            for name in exchange.MODELS
+        }
+        if not any(path for path, file_format in files.values()):
+            raise CommandError(
+                f'В каталоге {options["input"]} нет файлов выгрузки')
+        loader = importer.Importer(
+            self.stdout, options['batch_size'], options['transaction_size'])
+        if options['defer_indexes']:
+            with importer.deferred_indexes((Post, Comment, Follow)):
+                self.load(loader, files)
+        else:
+            self.load(loader, files)
+        loader.finish()
+        self.stdout.write(self.style.SUCCESS('Загрузка завершена'))
+
+    def load(self, loader, files):
+        # MODELS упорядочены так, что ссылки ведут на уже загруженное
+        for name, (path, file_format) in files.items():
+            if path is None:
+                continue
+            with exchange.open_text(path, 'r') as stream:
+                loader.load(name, exchange.read_rows(stream, file_format))
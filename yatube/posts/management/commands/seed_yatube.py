@@ -0,0 +1,147 @@
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from posts import images, importer, seeding
+from posts.models import Post
+from posts.storage import image_storage
+
+CHUNK_SIZE = 5000
+PLACEHOLDER_COLORS = (
+    (231, 76, 60), (46, 204, 113), (52, 152, 219), (241, 196, 15),
+    (155, 89, 182), (26, 188, 156), (230, 126, 34), (149, 165, 166),
+)
+
+
+def placeholder(color):
+    buffer = BytesIO()
+    Image.new('RGB', (800, 600), color).save(buffer, 'JPEG', quality=80)
+    return ContentFile(buffer.getvalue(), name='placeholder.jpg')
+
+
+def generated(executor, jobs, window):
+    # Порции запрашиваются окнами: вставка медленнее генерации, и без
+    # окна готовые строки копились бы в памяти
+    for window_jobs in importer.batches(jobs, max(window, 1)):
+        yield from executor.map(seeding.generate, window_jobs)
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, группами, постами, '
+        'комментариями и подписками с перекосом, как в живых данных.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument(
+            '--celebrities', type=int, default=3,
+            help='Сколько самых популярных авторов считать знаменитостями.',
+        )
+        parser.add_argument(
+            '--celebrity-share', type=float, default=0.5,
+            help='Какая доля пользователей подписана на каждую знаменитость.',
+        )
+        parser.add_argument(
+            '--zipf', type=float, default=1.1,
+            help='Показатель распределения Ципфа для авторов, групп и '
+                 'вирусных постов.',
+        )
+        parser.add_argument(
+            '--image-share', type=float, default=0.1,
+            help='Какая доля постов получает картинку-заглушку.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--start', default='2021-01-01T00:00:00+00:00',
+            help='Дата первого поста (ISO 8601).',
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней распределить посты.',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=2,
+            help='Сколько процессов генерируют строки.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=importer.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        params = {
+            'seed': options['seed'],
+            'users': options['users'],
+            'groups': options['groups'],
+            'posts': options['posts'],
+            'celebrities': min(options['celebrities'], options['users']),
+            'celebrity_share': options['celebrity_share'],
+            'zipf': options['zipf'],
+            'image_share': options['image_share'],
+            'start': options['start'],
+            'days': options['days'],
+            'images': self.placeholders() if options['image_share'] else [],
+        }
+        plan = (
+            ('user', 'user', options['users']),
+            ('group', 'group', options['groups']),
+            ('post', 'post', options['posts']),
+            ('comment', 'comment', options['comments']),
+            ('follow', 'celebrity', options['users']),
+            ('follow', 'follow', options['follows']),
+        )
+        loader = importer.Importer(self.stdout, options['batch_size'])
+        with self.executor(options['workers']) as executor:
+            for name, kind, total in plan:
+                if not total or not params['users']:
+                    continue
+                jobs = seeding.jobs(kind, params, total, CHUNK_SIZE)
+                loader.load(name, itertools.chain.from_iterable(
+                    generated(executor, jobs, options['workers'] * 2)))
+        self.describe_images(params['images'])
+        loader.finish()
+        self.stdout.write(self.style.SUCCESS('Данные сгенерированы'))
+
+    def executor(self, workers):
+        if workers < 2:
+            return InlineExecutor()
+        # Генерация — чистый Python, поэтому процессы, а не потоки
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+
+    def placeholders(self):
+        # Хранилище адресует файлы по содержимому: повторный запуск
+        # переиспользует те же файлы
+        return [
+            image_storage.save('posts/placeholder.jpg', placeholder(color))
+            for color in PLACEHOLDER_COLORS
+        ]
+
+    def describe_images(self, names):
+        for name in names:
+            with image_storage.open(name) as file_:
+                values = images.inspect(file_)
+            Post.objects.filter(image=name).update(**values)
+
+
+class InlineExecutor:
+    """Заменяет пул процессов при --workers 1."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def map(self, func, iterable):
+        return map(func, iterable)
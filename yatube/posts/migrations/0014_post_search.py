@@ -0,0 +1,71 @@
+# FTS5-индекс для поиска по постам, см. posts/search.py
+
+from django.db import migrations
+
+# Строка индекса для поста new: текст и данные его группы
+INDEX_ROW = '''
+    INSERT INTO posts_search (rowid, text, group_title, group_description)
+    SELECT new.id, new.text, g.title, g.description
+    FROM (SELECT 1) LEFT JOIN posts_group g ON g.id = new.group_id;
+'''
+
+CREATE = [
+    '''
+    CREATE VIRTUAL TABLE posts_search USING fts5(
+        text, group_title, group_description,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    ''',
+    '''
+    INSERT INTO posts_search (rowid, text, group_title, group_description)
+    SELECT p.id, p.text, g.title, g.description
+    FROM posts_post p LEFT JOIN posts_group g ON g.id = p.group_id
+    ''',
+    f'''
+    CREATE TRIGGER posts_search_insert AFTER INSERT ON posts_post
+    BEGIN {INDEX_ROW} END
+    ''',
+    f'''
+    CREATE TRIGGER posts_search_update
+    AFTER UPDATE OF text, group_id ON posts_post
+    BEGIN
+        DELETE FROM posts_search WHERE rowid = old.id;
+        {INDEX_ROW}
+    END
+    ''',
+    '''
+    CREATE TRIGGER posts_search_delete AFTER DELETE ON posts_post
+    BEGIN
+        DELETE FROM posts_search WHERE rowid = old.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER posts_search_group_update
+    AFTER UPDATE OF title, description ON posts_group
+    BEGIN
+        UPDATE posts_search
+        SET group_title = new.title, group_description = new.description
+        WHERE rowid IN (SELECT id FROM posts_post WHERE group_id = new.id);
+    END
+    ''',
+]
+
+DROP = [
+    'DROP TRIGGER IF EXISTS posts_search_group_update',
+    'DROP TRIGGER IF EXISTS posts_search_delete',
+    'DROP TRIGGER IF EXISTS posts_search_update',
+    'DROP TRIGGER IF EXISTS posts_search_insert',
+    'DROP TABLE IF EXISTS posts_search',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_image_blobs'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE, DROP),
+    ]
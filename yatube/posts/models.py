@@ -1,5 +1,10 @@
+import json
+
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils import timezone
+
+from .storage import image_storage
 
 User = get_user_model()
 
@@ -23,15 +28,44 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=image_storage,
         blank=True
     )
+    # Метаданные картинки заполняются при загрузке, см. posts/images.py
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки', null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(
+        'Высота картинки', null=True, blank=True, editable=False)
+    image_size = models.PositiveIntegerField(
+        'Размер файла картинки', null=True, blank=True, editable=False)
+    image_hash = models.CharField(
+        'SHA-256 картинки', max_length=64, blank=True, editable=False)
+    # JSON: {геометрия: {"name": ..., "width": ..., "height": ...}}
+    image_variants = models.TextField(
+        'Готовые миниатюры', blank=True, default='', editable=False)
 
     class Meta:
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
+        # Индексы повторяют порядок лент, чтобы страницы читались
+        # диапазоном индекса без сортировки во временном B-дереве.
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_date_idx'),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_date_idx'),
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_date_idx'), ]
 
     def __str__(self):
         return self.text[:15]
 
+    @property
+    def variants(self):
+        return json.loads(self.image_variants or '{}')
+
 
 class Group(models.Model):
     title = models.CharField(max_length=200)
@@ -57,7 +91,11 @@ class Comment(models.Model):
     created = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        ordering = ['-created']
+        ordering = ['-created', '-id']
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_date_idx'), ]
 
     def __str__(self):
         return self.text[:15]
@@ -84,6 +122,81 @@ class Follow(models.Model):
             models.CheckConstraint(
                 check=~models.Q(author=models.F("user")),
                 name="prevent_self_follow"), ]
+        # Подписчики автора: раскладка ленты и счётчики
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx'), ]
 
     def __str__(self):
         return f'{self.user} following {self.author}'
+
+
+class TimelineEntry(models.Model):
+    """Строка материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    # Автор и дата копируются из поста: по ним лента читается
+    # и обрезается без join с таблицей постов.
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-pub_date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'), ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_date_idx'),
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author_idx'), ]
+
+    def __str__(self):
+        return f'{self.post_id} in timeline of {self.user_id}'
+
+
+class AuthorStats(models.Model):
+    """Денормализованные счётчики автора для профиля и страницы поста."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    post_count = models.PositiveIntegerField(default=0)
+    follower_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'stats of {self.user_id}'
+
+
+class ImageBlob(models.Model):
+    """Файл картинки и число постов, которые на него ссылаются."""
+    name = models.CharField(max_length=100, primary_key=True)
+    refcount = models.PositiveIntegerField(default=0)
+    updated = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['refcount', 'updated'], name='blob_gc_idx'), ]
+
+    def __str__(self):
+        return f'{self.name} ({self.refcount})'
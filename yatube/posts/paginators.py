@@ -0,0 +1,184 @@
+"""Постраничный вывод лент.
+
+CursorPaginator листает ленту по ключу (keyset): каждая страница —
+один запрос с LIMIT по индексу, без COUNT(*) и OFFSET, поэтому глубина
+страницы не влияет на её стоимость. CappedPaginator оставлен для
+совместимости со ссылками вида ?page=N и ограничивает их глубину.
+"""
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db.models import F, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+CURSOR_PARAM = 'cursor'
+NEXT = 'n'
+PREVIOUS = 'p'
+DEFAULT_KEYS = ('pub_date', 'id')
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+def _decode_value(value):
+    if isinstance(value, str):
+        parsed = parse_datetime(value)
+        if parsed is not None:
+            return parsed
+    return value
+
+
+def _encode_value(value):
+    # DjangoJSONEncoder округляет время до миллисекунд, а ключу нужна
+    # полная точность, иначе курсор пропускает соседние записи.
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(obj, keys, direction=NEXT):
+    """Упаковывает значения ключей объекта в непрозрачный токен."""
+    payload = [direction] + [_encode_value(getattr(obj, key)) for key in keys]
+    raw = json.dumps(payload, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, keys):
+    """Возвращает направление и значения ключей из токена."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw.decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor('Некорректный курсор')
+    if (
+        not isinstance(payload, list)
+        or len(payload) != len(keys) + 1
+        or payload[0] not in (NEXT, PREVIOUS)
+    ):
+        raise InvalidCursor('Некорректный курсор')
+    return payload[0], [_decode_value(value) for value in payload[1:]]
+
+
+class CursorPage(Page):
+    def __init__(self, object_list, paginator,
+                 next_cursor=None, previous_cursor=None):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def next_page_number(self):
+        raise InvalidPage('Номер страницы в режиме курсора неизвестен')
+
+    previous_page_number = next_page_number
+
+    def start_index(self):
+        raise InvalidPage('Номер записи в режиме курсора неизвестен')
+
+    end_index = start_index
+
+
+class CursorPaginator(Paginator):
+    """Листает выборку по убыванию ключей keys.
+
+    keys — поля или аннотации выборки, которые есть и у объектов;
+    последний ключ должен быть уникальным (обычно id).
+    """
+
+    def __init__(self, object_list, per_page, keys=DEFAULT_KEYS):
+        self.keys = tuple(keys)
+        super().__init__(object_list, per_page)
+
+    def _seek(self, values, direction):
+        # (k1, k2) < (v1, v2) записано как k1 <= v1 AND (k1 < v1 OR k2 < v2):
+        # первое условие даёт диапазон по индексу.
+        op = 'lt' if direction == NEXT else 'gt'
+        head_op = 'lte' if direction == NEXT else 'gte'
+        condition = Q()
+        for position in range(len(self.keys) - 1, -1, -1):
+            key = self.keys[position]
+            step = Q(**{f'{key}__{op}': values[position]})
+            if position < len(self.keys) - 1:
+                step |= Q(**{key: values[position]}) & condition
+            condition = step
+        head = Q(**{f'{self.keys[0]}__{head_op}': values[0]})
+        return head & condition
+
+    def _ordering(self, direction):
+        if direction == NEXT:
+            return [F(key).desc() for key in self.keys]
+        return [F(key).asc() for key in self.keys]
+
+    def page(self, cursor):
+        direction, values = NEXT, None
+        if cursor:
+            direction, values = decode_cursor(cursor, self.keys)
+        queryset = self.object_list
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, direction))
+        queryset = queryset.order_by(*self._ordering(direction))
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        if direction == PREVIOUS and not has_more:
+            # Дошли до начала ленты — отдаём обычную первую страницу
+            return self.page(None)
+        rows = rows[:self.per_page]
+        if direction == PREVIOUS:
+            rows.reverse()
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or direction == PREVIOUS:
+                next_cursor = encode_cursor(rows[-1], self.keys, NEXT)
+            if values is not None:
+                previous_cursor = encode_cursor(rows[0], self.keys, PREVIOUS)
+        return CursorPage(rows, self, next_cursor, previous_cursor)
+
+    def get_page(self, cursor):
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page(None)
+
+
+class CappedPaginator(Paginator):
+    """Обычный Paginator, который считает записи не дальше max_pages.
+
+    COUNT(*) выполняется по подзапросу с LIMIT, поэтому его стоимость
+    ограничена. Если записей больше, truncated равен True и дальше
+    листать нужно курсором.
+    """
+
+    def __init__(self, object_list, per_page, max_pages, **kwargs):
+        self.max_pages = max_pages
+        super().__init__(object_list, per_page, **kwargs)
+
+    @cached_property
+    def _bounded_count(self):
+        limit = self.max_pages * self.per_page
+        # Порядок и аннотации для подсчёта не нужны, без них SQLite
+        # не сортирует и не группирует подзапрос.
+        rows = self.object_list.values('pk').order_by()[:limit + 1]
+        return rows.count(), limit
+
+    @cached_property
+    def count(self):
+        count, limit = self._bounded_count
+        return min(count, limit)
+
+    @cached_property
+    def truncated(self):
+        count, limit = self._bounded_count
+        return count > limit
@@ -0,0 +1,110 @@
+"""Полнотекстовый поиск по постам (FTS5-таблица posts_search).
+
+В таблице текст поста, название и описание его группы; rowid совпадает
+с id поста. Индекс ведут триггеры из миграции 0014, поэтому он не
+расходится с постами и при массовых операциях в обход сигналов.
+Выдача ранжируется bm25 и листается по ключу (ранг, id) без OFFSET.
+"""
+import re
+from types import SimpleNamespace
+
+from django.db import connection
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+
+from .models import Post
+from .paginators import CursorPage, InvalidCursor, decode_cursor, encode_cursor
+
+TABLE = 'posts_search'
+# Веса колонок для bm25: текст поста, название и описание группы
+WEIGHTS = (10.0, 2.0, 1.0)
+SNIPPET_TOKENS = 16
+MAX_WORDS = 8
+KEYS = ('search_rank', 'id')
+# Служебные символы отмечают совпадения, пока сниппет не экранирован
+MARK_START, MARK_END = '\x02', '\x03'
+WORD_RE = re.compile(r'\w+')
+
+
+def fts_query(text):
+    """Запрос пользователя в синтаксисе FTS5: все слова как префиксы.
+
+    Русской морфологии в FTS5 нет, поиск по префиксу находит часть
+    словоформ. Кавычки не дают пользователю сломать синтаксис запроса.
+    """
+    words = WORD_RE.findall(text.lower())[:MAX_WORDS]
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def highlight(snippet):
+    return escape(snippet).replace(
+        MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+def filter_posts(queryset, text):
+    """Оставляет в выборке посты, подходящие под запрос."""
+    match = fts_query(text)
+    if not match:
+        return queryset.none()
+    # Не pk__in=RawSQL(...): Django 2.2 оборачивает подзапрос во вторые
+    # скобки, и SQLite берёт из него только первую строку
+    column = f'"{Post._meta.db_table}"."id"'
+    return queryset.annotate(search_match=RawSQL(
+        f'{column} IN (SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s)',
+        [match], output_field=BooleanField(),
+    )).filter(search_match=True)
+
+
+def _fetch(match, after, limit):
+    sql = (
+        f'SELECT rowid, search_rank, snippet FROM ('
+        f'SELECT rowid, bm25({TABLE}, %s, %s, %s) AS search_rank, '
+        f"snippet({TABLE}, -1, %s, %s, '…', %s) AS snippet "
+        f'FROM {TABLE} WHERE {TABLE} MATCH %s)'
+    )
+    params = [*WEIGHTS, MARK_START, MARK_END, SNIPPET_TOKENS, match]
+    if after is not None:
+        sql += ' WHERE search_rank > %s OR (search_rank = %s AND rowid > %s)'
+        params += [after[0], after[0], after[1]]
+    sql += ' ORDER BY search_rank, rowid LIMIT %s'
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def search_posts(text, cursor=None, per_page=10):
+    """Страница результатов поиска, лучшие совпадения первыми.
+
+    У постов страницы есть атрибуты search_rank и snippet (готовый HTML).
+    Некорректный курсор открывает первую страницу.
+    """
+    match = fts_query(text)
+    if not match:
+        return CursorPage([], None)
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor, KEYS)[1]
+        except InvalidCursor:
+            after = None
+    rows = _fetch(match, after, per_page + 1)
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [row[0] for row in rows])
+    results = []
+    for post_id, rank, snippet in rows:
+        post = posts.get(post_id)
+        if post is None:
+            continue
+        post.search_rank = rank
+        post.snippet = highlight(snippet)
+        results.append(post)
+    next_cursor = None
+    if has_next and rows:
+        # Ключ берём из строки индекса: пост мог быть удалён
+        last = SimpleNamespace(id=rows[-1][0], search_rank=rows[-1][1])
+        next_cursor = encode_cursor(last, KEYS)
+    return CursorPage(results, None, next_cursor=next_cursor)
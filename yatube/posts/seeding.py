@@ -0,0 +1,171 @@
+"""Генерация синтетических данных для seed_yatube.
+
+Строки получаются в формате posts/exchange.py и загружаются через
+posts/importer.py. Модуль не импортирует модели: порции генерируются
+в процессах пула (spawn), где Django не настроен. Каждая порция берёт
+свой генератор случайных чисел от (seed, модель, начало порции),
+поэтому результат не зависит от числа процессов.
+"""
+import bisect
+import datetime
+import functools
+import itertools
+import math
+import random
+
+WORDS = (
+    'кот пёс утро вечер город море лес дом книга музыка кофе дождь солнце '
+    'дорога друг работа отпуск фото рецепт снег лето вокзал'
+).split()
+NAMES = ('Анна', 'Иван', 'Мария', 'Пётр', 'Ольга', 'Сергей', 'Елена', 'Олег')
+GROUP_SHARE = 0.7
+
+
+def rng(seed, kind, start):
+    return random.Random(f'{seed}:{kind}:{start}')
+
+
+@functools.lru_cache(maxsize=8)
+def zipf_weights(size, exponent):
+    """Накопленные веса рангов 1..size для распределения Ципфа."""
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, size + 1)))
+
+
+def zipf(random_, size, exponent):
+    """Ранг от 0 до size - 1: первые ранги выпадают чаще остальных."""
+    weights = zipf_weights(size, exponent)
+    return bisect.bisect(weights, random_.random() * weights[-1])
+
+
+def shuffled(rank, size):
+    """Номер 1..size по рангу, чтобы популярные записи не шли подряд."""
+    step = size // 2 + 1
+    while math.gcd(step, size) != 1:
+        step += 1
+    return rank * step % size + 1
+
+
+def username(number):
+    return f'user{number}'
+
+
+def post_date(params, number):
+    start = datetime.datetime.fromisoformat(params['start'])
+    span = datetime.timedelta(days=params['days'])
+    return start + span * (number / max(params['posts'], 1))
+
+
+def text(random_, words):
+    return ' '.join(random_.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def users(params, start, stop):
+    random_ = rng(params['seed'], 'user', start)
+    return [
+        {
+            'username': username(number),
+            'first_name': random_.choice(NAMES),
+            'last_name': '',
+            'date_joined': params['start'],
+        }
+        for number in range(start, stop)
+    ]
+
+
+def groups(params, start, stop):
+    return [
+        {
+            'title': f'Группа {number}',
+            'slug': f'group-{number}',
+            'description': f'Сообщество номер {number}',
+        }
+        for number in range(start, stop)
+    ]
+
+
+def posts(params, start, stop):
+    random_ = rng(params['seed'], 'post', start)
+    rows = []
+    for number in range(start + 1, stop + 1):
+        group = None
+        if params['groups'] and random_.random() < GROUP_SHARE:
+            group = f'group-{zipf(random_, params["groups"], params["zipf"])}'
+        image = ''
+        if params['images'] and random_.random() < params['image_share']:
+            image = random_.choice(params['images'])
+        rows.append({
+            'id': number,
+            'text': text(random_, random_.randint(3, 25)),
+            'pub_date': post_date(params, number).isoformat(),
+            'author': username(
+                zipf(random_, params['users'], params['zipf'])),
+            'group': group,
+            'image': image,
+        })
+    return rows
+
+
+def comments(params, start, stop):
+    random_ = rng(params['seed'], 'comment', start)
+    rows = []
+    for _ in range(start, stop):
+        # Вирусные посты собирают большую часть комментариев
+        post = shuffled(
+            zipf(random_, params['posts'], params['zipf']), params['posts'])
+        created = post_date(params, post) + datetime.timedelta(
+            minutes=random_.randint(1, 3 * 24 * 60))
+        rows.append({
+            'post': post,
+            'author': username(random_.randrange(params['users'])),
+            'text': text(random_, random_.randint(2, 12)),
+            'created': created.isoformat(),
+        })
+    return rows
+
+
+def follows(params, start, stop):
+    """Обычные подписки: подписчик любой, автор — по Ципфу."""
+    random_ = rng(params['seed'], 'follow', start)
+    return [
+        {
+            'user': username(random_.randrange(params['users'])),
+            'author': username(
+                zipf(random_, params['users'], params['zipf'])),
+        }
+        for _ in range(start, stop)
+    ]
+
+
+def celebrity_follows(params, start, stop):
+    """Подписки на знаменитостей: их читает заданная доля пользователей."""
+    random_ = rng(params['seed'], 'celebrity', start)
+    return [
+        {'user': username(number), 'author': username(celebrity)}
+        for number in range(start, stop)
+        for celebrity in range(params['celebrities'])
+        if number != celebrity
+        and random_.random() < params['celebrity_share']
+    ]
+
+
+GENERATORS = {
+    'user': users,
+    'group': groups,
+    'post': posts,
+    'comment': comments,
+    'follow': follows,
+    'celebrity': celebrity_follows,
+}
+
+
+def generate(job):
+    kind, params, start, stop = job
+    return GENERATORS[kind](params, start, stop)
+
+
+def jobs(kind, params, total, chunk_size):
+    return [
+        (kind, params, start, min(start + chunk_size, total))
+        for start in range(0, total, chunk_size)
+    ]
@@ -0,0 +1,137 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import blobs, feed_cache, fragments, stats, timeline
+from .models import Comment, Follow, Group, Post, User
+
+# Поля пользователя, которые выводятся на карточках постов
+CARD_USER_FIELDS = ('username', 'first_name', 'last_name')
+
+
+# Поколение и версии меняются только после COMMIT: иначе параллельный
+# запрос успел бы закэшировать старые данные уже под новым ключом.
+# Значения ключей берём сразу: после удаления у объекта нет pk.
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def feed_changed(sender, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(feed_cache.bump_generation)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(
+            partial(fragments.bump_version, 'post', instance.pk))
+
+
+@receiver(post_save, sender=Group)
+def group_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(
+            partial(fragments.bump_version, 'group', instance.pk))
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or instance.pk is None:
+        return
+    # Вход сохраняет только last_login: такие сохранения не сравниваем
+    if update_fields is not None and not set(update_fields) & set(
+            CARD_USER_FIELDS):
+        return
+    instance._card_fields_before = User.objects.filter(
+        pk=instance.pk).values_list(*CARD_USER_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, raw=False, **kwargs):
+    before = instance.__dict__.pop('_card_fields_before', None)
+    if raw or created or before is None:
+        return
+    if before == tuple(getattr(instance, name) for name in CARD_USER_FIELDS):
+        return
+    # Имя автора есть на карточках, а страницы ленты кэшируются целиком
+    # по поколению, поэтому меняется и оно
+    transaction.on_commit(
+        partial(fragments.bump_version, 'user', instance.pk))
+    transaction.on_commit(feed_cache.bump_generation)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comments_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(
+            partial(fragments.bump_version, 'comments', instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follows_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(
+            partial(fragments.bump_version, 'follow', instance.user_id))
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.increment(instance.author_id, 'post_count')
+        timeline.schedule_fan_out(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    stats.decrement(instance.author_id, 'post_count')
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.increment(instance.author_id, 'follower_count')
+        stats.increment(instance.user_id, 'following_count')
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    stats.decrement(instance.author_id, 'follower_count')
+    stats.decrement(instance.user_id, 'following_count')
+    timeline.trim(instance.user_id, instance.author_id)
+
+
+@receiver(pre_save, sender=Post)
+def post_image_saving(sender, instance, raw=False, update_fields=None,
+                      **kwargs):
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and 'image' not in update_fields:
+        return
+    # Прежнее имя файла берём из базы: в памяти уже может быть новая картинка
+    instance._image_before = Post.objects.filter(
+        pk=instance.pk).values_list('image', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def post_image_saved(sender, instance, created, raw=False, **kwargs):
+    before = instance.__dict__.pop('_image_before', None)
+    if raw:
+        return
+    if created:
+        blobs.acquire(instance.image.name)
+    elif before is not None and before != instance.image.name:
+        blobs.acquire(instance.image.name)
+        blobs.release(before)
+
+
+@receiver(post_delete, sender=Post)
+def post_image_deleted(sender, instance, **kwargs):
+    blobs.release(instance.image.name)
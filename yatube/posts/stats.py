@@ -0,0 +1,80 @@
+"""Счётчики постов и подписок автора (таблица AuthorStats).
+
+Счётчики меняются F()-выражениями в той же транзакции, что и сама
+запись, а расхождения чинит команда reconcile_author_stats.
+"""
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import AuthorStats, Follow, Post
+
+FIELDS = ('post_count', 'follower_count', 'following_count')
+
+
+def count_stats(user_id):
+    """Считает значения счётчиков по исходным таблицам."""
+    return {
+        'post_count': Post.objects.filter(author_id=user_id).count(),
+        'follower_count': Follow.objects.filter(author_id=user_id).count(),
+        'following_count': Follow.objects.filter(user_id=user_id).count(),
+    }
+
+
+def get_stats(user):
+    """Возвращает счётчики пользователя, при необходимости создаёт их."""
+    stats = AuthorStats.objects.filter(user_id=user.pk).first()
+    if stats is None:
+        AuthorStats.objects.bulk_create(
+            [AuthorStats(user_id=user.pk, **count_stats(user.pk))],
+            ignore_conflicts=True,
+        )
+        stats = AuthorStats.objects.get(user_id=user.pk)
+    return stats
+
+
+def increment(user_id, field):
+    updated = AuthorStats.objects.filter(user_id=user_id).update(
+        **{field: F(field) + 1})
+    if not updated:
+        # Строки ещё нет: считаем с нуля, новая запись уже учтена
+        AuthorStats.objects.bulk_create(
+            [AuthorStats(user_id=user_id, **count_stats(user_id))],
+            ignore_conflicts=True,
+        )
+
+
+def decrement(user_id, field):
+    # Строку не создаём: пользователь может удаляться вместе с записями
+    AuthorStats.objects.filter(user_id=user_id, **{f'{field}__gt': 0}).update(
+        **{field: F(field) - 1})
+
+
+def grouped_counts(queryset, field, ids):
+    rows = queryset.filter(**{f'{field}__in': ids}).values(field).annotate(
+        total=Count('pk')).order_by()
+    return {row[field]: row['total'] for row in rows}
+
+
+@transaction.atomic
+def reconcile(ids):
+    """Чинит счётчики пользователей ids; возвращает число исправленных."""
+    actual = {
+        'post_count': grouped_counts(Post.objects, 'author_id', ids),
+        'follower_count': grouped_counts(Follow.objects, 'author_id', ids),
+        'following_count': grouped_counts(Follow.objects, 'user_id', ids),
+    }
+    stored = AuthorStats.objects.select_for_update().in_bulk(ids)
+    missing, changed = [], []
+    for user_id in ids:
+        values = {field: actual[field].get(user_id, 0) for field in FIELDS}
+        stats = stored.get(user_id)
+        if stats is None:
+            missing.append(AuthorStats(user_id=user_id, **values))
+            continue
+        if any(getattr(stats, f) != values[f] for f in FIELDS):
+            for field, value in values.items():
+                setattr(stats, field, value)
+            changed.append(stats)
+    AuthorStats.objects.bulk_create(missing, ignore_conflicts=True)
+    AuthorStats.objects.bulk_update(changed, FIELDS)
+    return len(missing) + len(changed)
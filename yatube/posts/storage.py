@@ -0,0 +1,51 @@
+"""Хранилище картинок с адресацией по содержимому.
+
+Файл называется SHA-256 своего содержимого: posts/ab/abcd….jpg. Повторная
+загрузка той же картинки не пишет новый файл, а возвращает имя уже
+сохранённого, поэтому у одинаковых картинок общие и файл, и миниатюры.
+Удаляет файлы только команда gc_image_blobs, когда на них не осталось
+ссылок из постов (см. posts/blobs.py).
+"""
+import hashlib
+import os
+import posixpath
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+CHUNK_SIZE = 64 * 1024
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        digest = content_hash(content)
+        extension = os.path.splitext(name)[1].lower()
+        name = posixpath.join(
+            posixpath.dirname(name), digest[:2], digest + extension)
+        try:
+            if self.exists(name):
+                # Обновляем время изменения: сборщик мусора не тронет
+                # файл, на который вот-вот сошлётся новый пост
+                os.utime(self.path(name))
+                return name
+            return super().save(name, content, max_length)
+        finally:
+            if hasattr(content, 'temporary_file_path'):
+                # Временный файл перенесён в хранилище или не нужен:
+                # закрываем сразу, а не при сборке мусора
+                content.close()
+
+
+image_storage = ContentAddressedStorage()
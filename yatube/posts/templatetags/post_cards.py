@@ -0,0 +1,30 @@
+from django import template
+
+from posts import thumbnails
+from posts.fragments import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(posts, link_author=True, show_group=True):
+    """Карточки постов страницы из кэша фрагментов."""
+    return render_cards(posts, link_author, show_group)
+
+
+@register.simple_tag
+def post_thumbnail(post):
+    """Миниатюра картинки поста, см. posts.thumbnails.resolve."""
+    if not post.image:
+        return None
+    return thumbnails.resolve([post.image]).get(post.image.name)
+
+
+@register.inclusion_tag('posts/includes/post_image.html')
+def post_image(post, fallback, sizes=thumbnails.SRCSET_SIZES):
+    """<picture> с WebP/JPEG srcset или миниатюра fallback, пока их нет."""
+    return {
+        'image': thumbnails.srcset(post) if post.image else None,
+        'fallback': fallback,
+        'sizes': sizes,
+    }
@@ -0,0 +1,366 @@
+"""Фоновая подготовка миниатюр.
+
+Тег {% thumbnail %} по умолчанию создаёт миниатюру прямо в запросе,
+который первым выводит пост: декодирование, ресайз и запись файла.
+DeferredThumbnailBackend этого не делает: если миниатюры ещё нет, он
+отдаёт оригинал и ставит задачу в пул процессов. Сразу после загрузки
+картинки задачи на все геометрии из PRESETS ставят post_create и
+post_edit, так что обычно миниатюра готова к первому показу.
+
+Карточки постов не ходят в KV-хранилище на каждый тег: resolve()
+берёт готовые миниатюры из карты вариантов поста (её заполняет
+generate), а остальные разрешает одним get_many и одним запросом к БД.
+Адаптивные варианты из SRCSET_PRESETS выводит тег {% post_image %}
+по той же карте, см. srcset().
+"""
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from PIL import features
+from sorl.thumbnail import default
+from sorl.thumbnail.base import EXTENSIONS, ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.helpers import serialize, tokey, toint
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.parsers import parse_geometry
+
+from core import metrics
+
+from . import images
+from .storage import image_storage
+
+logger = logging.getLogger(__name__)
+
+# Геометрии, которые используются в шаблонах постов
+CARD_GEOMETRY = '200x300'
+CARD_OPTIONS = {'crop': 'center', 'upscale': True}
+# Адаптивные варианты карточки: те же пропорции в нескольких ширинах,
+# WebP для браузеров, которые его понимают, и JPEG для остальных.
+# WebP пропускается, если Pillow собран без него.
+SRCSET_WIDTHS = tuple(getattr(settings, 'POST_IMAGE_WIDTHS', (200, 400, 600)))
+SRCSET_FORMATS = tuple(
+    format_ for format_ in ('WEBP', 'JPEG')
+    if format_ != 'WEBP' or features.check('webp')
+)
+SRCSET_SIZES = getattr(settings, 'POST_IMAGE_SIZES', '200px')
+_card_width, _card_height = parse_geometry(CARD_GEOMETRY)
+SRCSET_PRESETS = tuple(
+    (f'{width}x{width * _card_height // _card_width}',
+     dict(CARD_OPTIONS, format=format_))
+    for format_ in SRCSET_FORMATS
+    for width in SRCSET_WIDTHS
+)
+PRESETS = ((CARD_GEOMETRY, CARD_OPTIONS),) + SRCSET_PRESETS
+# Миниатюры картинок постов лежат под предсказуемыми именами
+UPLOAD_DIR = 'posts/'
+VARIANTS_DIR = 'posts/variants/'
+WORKERS = getattr(settings, 'THUMBNAIL_WORKERS', 2)
+
+_executor = None
+# Уже поставленные задачи, чтобы не дублировать их на каждом запросе
+_scheduled = set()
+MAX_SCHEDULED = 10000
+
+
+def preset_key(geometry, options):
+    """Ключ варианта в Post.image_variants, например 200x300.jpg."""
+    format_ = options.get('format', thumbnail_settings.THUMBNAIL_FORMAT)
+    return f'{geometry}.{EXTENSIONS[format_]}'
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+        )
+    return _executor
+
+
+def generate(name, presets=PRESETS):
+    """Создаёт миниатюры картинки; выполняется в процессе пула."""
+    variants = {}
+    for geometry, options in presets:
+        try:
+            thumbnail = default.backend.generate(
+                ImageFile(name, image_storage), geometry, **options)
+        except Exception:
+            logger.exception('Thumbnail %s for %s failed', geometry, name)
+            continue
+        if (geometry, options) in PRESETS:
+            variants[preset_key(geometry, options)] = images.variant(
+                thumbnail)
+    if variants:
+        images.record_variants(name, variants)
+
+
+def _job_done(future):
+    if future.exception() is not None:
+        logger.error('Thumbnail job failed', exc_info=future.exception())
+
+
+def schedule(name, presets=PRESETS):
+    """Ставит картинку в очередь на подготовку миниатюр."""
+    if not name:
+        return
+    key = (name, tuple(geometry for geometry, options in presets))
+    if key in _scheduled:
+        return
+    if len(_scheduled) >= MAX_SCHEDULED:
+        _scheduled.clear()
+    _scheduled.add(key)
+    try:
+        future = get_executor().submit(generate, name, presets)
+    except BrokenProcessPool:
+        # Упавший пул больше не принимает задачи: пересоздаём его
+        global _executor
+        _executor = None
+        _scheduled.discard(key)
+        logger.exception('Thumbnail pool is broken, restarting')
+        return
+    future.add_done_callback(_job_done)
+
+
+class DeferredThumbnailBackend(ThumbnailBackend):
+    """Не создаёт миниатюры в запросе, только отдаёт готовые."""
+
+    def _prepare(self, file_, geometry_string, options):
+        # Те же шаги, что в ThumbnailBackend.get_thumbnail до проверки
+        # хранилища: от них зависит имя файла миниатюры.
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return source, ImageFile(name, default.storage)
+
+    def _get_thumbnail_filename(self, source, geometry_string, options):
+        # posts/variants/<картинка>/<геометрия>-<опции>.<формат>: имя
+        # зависит только от оригинала и параметров миниатюры
+        if not source.name.startswith(UPLOAD_DIR):
+            return super()._get_thumbnail_filename(
+                source, geometry_string, options)
+        stem = os.path.splitext(source.name[len(UPLOAD_DIR):])[0]
+        digest = tokey(source.key, serialize(options))[:8]
+        extension = EXTENSIONS[options['format']]
+        return (
+            f'{VARIANTS_DIR}{stem}/{geometry_string}-{digest}.{extension}')
+
+    def get_ready_thumbnail(self, file_, geometry_string, **options):
+        """Возвращает готовую миниатюру или None."""
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        source, thumbnail = self._prepare(file_, geometry_string, options)
+        return default.kvstore.get(thumbnail)
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        ready = self.get_ready_thumbnail(
+            file_, geometry_string, **options)
+        if ready:
+            return ready
+        source = ImageFile(file_)
+        if source.exists():
+            schedule(source.name, ((geometry_string, options),))
+        # Пока миниатюры нет, показываем оригинал
+        return source
+
+    def generate(self, file_, geometry_string, **options):
+        """Создаёт миниатюру так же, как обычный бэкенд sorl-thumbnail."""
+        return super().get_thumbnail(file_, geometry_string, **options)
+
+
+def _fetch_raw(kvstore, keys):
+    """Читает значения KV-хранилища: один get_many и один запрос к БД."""
+    from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+    from sorl.thumbnail.models import KVStore as KVStoreModel
+    cache = kvstore.cache
+    values = cache.get_many(keys)
+    round_trips = 1
+    missing = [key for key in keys if key not in values]
+    if missing:
+        round_trips += 1
+        rows = dict(KVStoreModel.objects.filter(
+            key__in=missing).values_list('key', 'value'))
+        # Как и sorl-thumbnail, запоминаем и отсутствие значения
+        fetched = {key: rows.get(key, EMPTY_VALUE) for key in missing}
+        cache.set_many(fetched, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(fetched)
+    return values, round_trips, len(missing)
+
+
+def _lookup_keys(files, geometry, options):
+    """Ключи KV-хранилища для миниатюр картинок: {имя: (оригинал, ключ)}."""
+    keys = {}
+    for name, file_ in files.items():
+        try:
+            source, thumbnail = default.backend._prepare(
+                file_, geometry, dict(options))
+        except Exception:
+            # Как и тег {% thumbnail %}, не роняем страницу из-за картинки
+            logger.exception('Thumbnail for %s failed', name)
+            continue
+        keys[name] = (source, add_prefix(thumbnail.key))
+    return keys
+
+
+def _count(images_count, round_trips, saved):
+    metrics.count_thumbnails(images_count, round_trips, saved)
+    logger.debug(
+        'Resolved %s thumbnails in %s round trips (%s saved)',
+        images_count, round_trips, saved)
+
+
+def lookup(files, geometry=CARD_GEOMETRY, options=CARD_OPTIONS):
+    """Готовые миниатюры из KV-хранилища: {имя картинки: миниатюра}.
+
+    Вместо обращения на каждую картинку, как у тега {% thumbnail %},
+    делается один get_many к кэшу и, при промахах, один запрос к БД.
+    """
+    # Модули с моделями импортируются здесь: этот модуль загружают
+    # процессы пула ещё до django.setup()
+    from sorl.thumbnail.kvstores.cached_db_kvstore import (
+        EMPTY_VALUE, KVStore as CachedDBKVStore,
+    )
+    if not isinstance(default.kvstore, CachedDBKVStore):
+        ready = {
+            name: default.backend.get_ready_thumbnail(
+                file_, geometry, **options)
+            for name, file_ in files.items()
+        }
+        return {name: im for name, im in ready.items() if im}
+    keys = _lookup_keys(files, geometry, options)
+    if not keys:
+        return {}
+    values, round_trips, misses = _fetch_raw(
+        default.kvstore, [key for source, key in keys.values()])
+    found = {}
+    for name, (source, key) in keys.items():
+        value = values.get(key)
+        if value and value != EMPTY_VALUE:
+            found[name] = deserialize_image_file(value)
+    # По одному тегу: обращение к кэшу на каждую картинку и к БД на промах
+    _count(len(keys), round_trips, len(keys) + misses - round_trips)
+    return found
+
+
+def display_size(geometry, options, size=None):
+    """Размер миниатюры по геометрии и размеру оригинала, если он известен."""
+    ratio = size[0] / size[1] if size else None
+    width, height = parse_geometry(geometry, ratio)
+    if size and not options.get('crop'):
+        factor = min(width / size[0], height / size[1])
+        if not options.get('upscale'):
+            factor = min(factor, 1)
+        width, height = toint(size[0] * factor), toint(size[1] * factor)
+    return width, height
+
+
+def _from_variants(file_, key):
+    """Миниатюра из карты вариантов поста, без KV-хранилища и диска."""
+    post = getattr(file_, 'instance', None)
+    stored = getattr(post, 'variants', {}).get(key)
+    if not stored:
+        return None
+    thumbnail = ImageFile(stored['name'], default.storage)
+    thumbnail.set_size((stored['width'], stored['height']))
+    return thumbnail
+
+
+def _fallback(file_, geometry, options):
+    """Оригинал вместо ещё не готовой миниатюры; ставит её в очередь."""
+    post = getattr(file_, 'instance', None)
+    source = ImageFile(file_)
+    try:
+        # Метаданные есть только у сохранённых картинок, stat не нужен
+        if getattr(post, 'image_size', None) is None and not source.exists():
+            return None
+        schedule(source.name, ((geometry, options),))
+    except Exception:
+        logger.exception('Thumbnail for %s failed', source.name)
+        return None
+    # Оригинал показывается в рамке будущей миниатюры
+    size = None
+    if getattr(post, 'image_width', None) and post.image_height:
+        size = (post.image_width, post.image_height)
+    source.set_size(display_size(geometry, options, size))
+    return source
+
+
+def resolve(files, geometry=CARD_GEOMETRY, options=CARD_OPTIONS):
+    """Возвращает {имя картинки: миниатюра} для всех картинок страницы.
+
+    Сначала используется карта вариантов поста, затем один пакетный
+    запрос к KV-хранилищу. Если миниатюры ещё нет, вместо неё отдаётся
+    оригинал, а картинка ставится в очередь на подготовку.
+    """
+    files = {file_.name: file_ for file_ in files if file_}
+    resolved = {}
+    if (geometry, options) in PRESETS:
+        key = preset_key(geometry, options)
+        for name, file_ in files.items():
+            thumbnail = _from_variants(file_, key)
+            if thumbnail is not None:
+                resolved[name] = thumbnail
+        if resolved:
+            _count(len(resolved), 0, len(resolved))
+    pending = {
+        name: file_ for name, file_ in files.items() if name not in resolved}
+    if pending:
+        resolved.update(lookup(pending, geometry, options))
+    for name, file_ in pending.items():
+        if name not in resolved:
+            resolved[name] = _fallback(file_, geometry, options)
+    return resolved
+
+
+def srcset(post):
+    """Адаптивные варианты картинки поста для <picture> и <img srcset>.
+
+    Читает только карту вариантов поста. Возвращает None, пока не готовы
+    JPEG-варианты: тогда шаблон показывает обычную миниатюру.
+    """
+    variants = post.variants
+    sets = {}
+    for geometry, options in SRCSET_PRESETS:
+        stored = variants.get(preset_key(geometry, options))
+        if stored:
+            sets.setdefault(options['format'], []).append(stored)
+    fallback = sets.pop('JPEG', None)
+    if not fallback:
+        return None
+    smallest = fallback[0]
+    return {
+        'sources': [
+            {'type': f'image/{format_.lower()}', 'srcset': _srcset(items)}
+            for format_, items in sets.items()
+        ],
+        'src': default.storage.url(smallest['name']),
+        'srcset': _srcset(fallback),
+        'width': smallest['width'],
+        'height': smallest['height'],
+    }
+
+
+def _srcset(items):
+    return ', '.join(
+        f'{default.storage.url(item["name"])} {item["width"]}w'
+        for item in items
+    )
@@ -0,0 +1,137 @@
+"""Материализованная лента подписок (fan-out on write).
+
+Новый пост раскладывается по лентам всех подписчиков автора, поэтому
+страница follow_index читает один диапазон индекса по пользователю
+вместо join постов с подписками и сортировки.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from . import feed_cache
+from .models import Follow, Post, TimelineEntry
+
+logger = logging.getLogger(__name__)
+
+# Авторы с числом подписчиков до этого порога раскладываются сразу,
+# в той же транзакции, что и сам пост. Остальные уходят в фоновый поток.
+SYNC_FANOUT_LIMIT = getattr(settings, 'TIMELINE_SYNC_FANOUT_LIMIT', 500)
+# Сколько последних постов автора попадает в ленту при подписке.
+BACKFILL_SIZE = getattr(settings, 'TIMELINE_BACKFILL_SIZE', 200)
+BATCH_SIZE = getattr(settings, 'TIMELINE_BATCH_SIZE', 1000)
+FANOUT_WORKERS = getattr(settings, 'TIMELINE_FANOUT_WORKERS', 2)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=FANOUT_WORKERS,
+            thread_name_prefix='timeline-fanout',
+        )
+    return _executor
+
+
+def _entries(post, user_ids):
+    return [
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for user_id in user_ids
+    ]
+
+
+def fan_out(post):
+    """Добавляет пост в ленты всех подписчиков автора."""
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True).order_by('user_id')
+    batch = []
+    for user_id in followers.iterator(chunk_size=BATCH_SIZE):
+        batch.append(user_id)
+        if len(batch) >= BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(
+                _entries(post, batch), ignore_conflicts=True)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(
+            _entries(post, batch), ignore_conflicts=True)
+
+
+def _fan_out_job(post_id):
+    try:
+        post = Post.objects.filter(pk=post_id).first()
+        if post is not None:
+            fan_out(post)
+            # Пост уже сменил поколение при сохранении, но строки лент
+            # появились только сейчас: иначе /follow/ отдавал бы 304
+            # на страницу без него
+            feed_cache.bump_generation()
+    except Exception:
+        logger.exception('Timeline fan-out failed for post %s', post_id)
+    finally:
+        # Поток живёт дольше запроса, соединение закрываем сами.
+        connection.close()
+
+
+def schedule_fan_out(post):
+    """Раскладывает пост сразу или ставит задачу фоновому потоку."""
+    followers_count = Follow.objects.filter(author_id=post.author_id).count()
+    if followers_count <= SYNC_FANOUT_LIMIT:
+        fan_out(post)
+        return
+    post_id = post.pk
+    transaction.on_commit(
+        lambda: get_executor().submit(_fan_out_job, post_id))
+
+
+def backfill(user_id, author_id):
+    """Заполняет ленту последними постами нового автора из подписок."""
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-pk')[:BACKFILL_SIZE]
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post.pk,
+                author_id=author_id,
+                pub_date=post.pub_date,
+            )
+            for post in posts.only('pk', 'pub_date')
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def trim(user_id, author_id):
+    """Убирает из ленты посты автора, от которого отписались."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild(users=None):
+    """Пересобирает ленты с нуля по текущему графу подписок.
+
+    Возвращает число обработанных подписок.
+    """
+    follows = Follow.objects.order_by('pk')
+    entries = TimelineEntry.objects.all()
+    if users is not None:
+        follows = follows.filter(user__in=users)
+        entries = entries.filter(user__in=users)
+    processed = 0
+    with transaction.atomic():
+        entries.delete()
+        for user_id, author_id in follows.values_list(
+                'user_id', 'author_id').iterator(chunk_size=BATCH_SIZE):
+            backfill(user_id, author_id)
+            processed += 1
+    return processed
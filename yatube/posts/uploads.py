@@ -0,0 +1,187 @@
+"""Обработка загруженных картинок до сохранения в хранилище.
+
+В процессе запроса читается только заголовок: формат, размеры и число
+пикселей проверяются до декодирования. Само декодирование идёт в
+отдельном пуле процессов с таймаутом на задачу: большие картинки
+уменьшаются через draft/reduce без полной распаковки, метаданные
+(EXIF с геометкой и т. п.) отбрасываются. Результат пишется во временный
+файл, который хранилище переносит к себе без чтения в память.
+"""
+import logging
+import multiprocessing
+import shutil
+import signal
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+MAX_BYTES = getattr(settings, 'POST_IMAGE_MAX_BYTES', 10 * 1024 * 1024)
+MAX_PIXELS = getattr(settings, 'POST_IMAGE_MAX_PIXELS', 40_000_000)
+MAX_SIDE = getattr(settings, 'POST_IMAGE_MAX_SIDE', 2560)
+TIMEOUT = getattr(settings, 'POST_IMAGE_TIMEOUT', 20)
+WORKERS = getattr(settings, 'POST_IMAGE_WORKERS', 2)
+FORMATS = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'GIF': 'image/gif',
+    'WEBP': 'image/webp',
+}
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 85, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 85},
+}
+CHUNK_SIZE = 64 * 1024
+
+_executor = None
+
+
+class ProcessingTimeout(Exception):
+    pass
+
+
+def _init_worker(max_pixels):
+    Image.MAX_IMAGE_PIXELS = max_pixels
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(MAX_PIXELS,),
+        )
+    return _executor
+
+
+def _reset_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+    _executor = None
+
+
+def _alarm(signum, frame):
+    raise ProcessingTimeout
+
+
+def transform(source, target, max_side, timeout):
+    """Уменьшает картинку и убирает метаданные; выполняется в пуле."""
+    signal.signal(signal.SIGALRM, _alarm)
+    signal.alarm(timeout)
+    try:
+        with Image.open(source) as image:
+            if getattr(image, 'is_animated', False):
+                # Анимацию не пережимаем: размеры уже проверены
+                shutil.copyfile(source, target)
+                return image.size
+            image_format = image.format
+            icc_profile = image.info.get('icc_profile')
+            # thumbnail сам включает draft у JPEG и reduce у остальных
+            # форматов, поэтому полноразмерные пиксели не распаковываются
+            image.thumbnail((max_side, max_side), reducing_gap=2.0)
+            image = ImageOps.exif_transpose(image)
+            if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            options = dict(SAVE_OPTIONS.get(image_format, {}))
+            if icc_profile:
+                options['icc_profile'] = icc_profile
+            # exif не передаём: так он не попадает в новый файл
+            image.save(target, image_format, **options)
+            return image.size
+    finally:
+        signal.alarm(0)
+
+
+def check_header(upload):
+    """Проверяет картинку по заголовку, не декодируя пиксели."""
+    if upload.size > MAX_BYTES:
+        raise ValidationError(
+            'Файл слишком большой: не более %(limit)s МБ.',
+            params={'limit': MAX_BYTES // (1024 * 1024)},
+            code='file_too_large',
+        )
+    upload.seek(0)
+    try:
+        with Image.open(upload) as image:
+            image_format, (width, height) = image.format, image.size
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError(
+            'Не удалось прочитать картинку.', code='invalid_image')
+    finally:
+        upload.seek(0)
+    if image_format not in FORMATS:
+        raise ValidationError(
+            'Формат %(format)s не поддерживается.',
+            params={'format': image_format}, code='invalid_format')
+    if width * height > MAX_PIXELS:
+        raise ValidationError(
+            'Картинка слишком большая: %(width)s×%(height)s.',
+            params={'width': width, 'height': height}, code='too_many_pixels')
+    return image_format
+
+
+def _source_path(upload):
+    """Путь к файлу загрузки; небольшие загрузки из памяти копирует."""
+    if hasattr(upload, 'temporary_file_path'):
+        return upload.temporary_file_path(), None
+    copy = tempfile.NamedTemporaryFile(
+        suffix='.upload', dir=settings.FILE_UPLOAD_TEMP_DIR)
+    for chunk in upload.chunks(CHUNK_SIZE):
+        copy.write(chunk)
+    copy.flush()
+    upload.seek(0)
+    return copy.name, copy
+
+
+def process(upload):
+    """Возвращает обработанную копию загруженной картинки.
+
+    Бросает ValidationError, если картинка не прошла проверку или не
+    обработалась за TIMEOUT секунд.
+    """
+    image_format = check_header(upload)
+    source, copy = _source_path(upload)
+    result = TemporaryUploadedFile(
+        upload.name, FORMATS[image_format], 0, None)
+    try:
+        future = get_executor().submit(
+            transform, source, result.temporary_file_path(), MAX_SIDE,
+            TIMEOUT)
+        # Запас на запуск процесса: сам таймаут задачи срабатывает в пуле
+        future.result(timeout=TIMEOUT + 5)
+    except (ProcessingTimeout, FutureTimeoutError):
+        result.close()
+        logger.warning('Image %s timed out', upload.name)
+        # Зависший процесс не должен занимать место в пуле
+        _reset_executor()
+        raise ValidationError(
+            'Картинка обрабатывается слишком долго.', code='timeout')
+    except BrokenProcessPool:
+        result.close()
+        logger.exception('Image pool is broken, restarting')
+        _reset_executor()
+        raise ValidationError(
+            'Не удалось обработать картинку.', code='processing_failed')
+    except Exception:
+        result.close()
+        logger.exception('Image %s processing failed', upload.name)
+        raise ValidationError(
+            'Не удалось обработать картинку.', code='processing_failed')
+    finally:
+        if copy is not None:
+            copy.close()
+    result.file.seek(0, 2)
+    result.size = result.file.tell()
+    result.file.seek(0)
+    return result
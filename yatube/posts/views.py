@@ -1,38 +1,78 @@
 import datetime
 
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import F
 from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
 
+from . import images, thumbnails
+from .conditional import (conditional_page, feed_etag, feed_last_modified,
+                          follow_etag, post_etag, profile_etag)
+from .feed_cache import feed_cache_page
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post, User
+from .paginators import (CURSOR_PARAM, DEFAULT_KEYS, CappedPaginator,
+                         CursorPaginator, encode_cursor)
+from .search import search_posts
+from .stats import get_stats
 
 PER_PAGE = 10
-
-
-def get_page_context(queryset, request):
-    paginator = Paginator(queryset, PER_PAGE)
+# Глубже этой страницы номерная навигация не ведёт, дальше — курсор
+MAX_PAGE_NUMBER = 50
+# Ключи курсора ленты подписок: дата и пост из таблицы ленты
+FOLLOW_KEYS = ('feed_date', 'feed_post')
+# Комментарии под постом: первые выводятся сразу, остальные догружаются
+COMMENTS_PER_PAGE = 20
+COMMENT_KEYS = ('created', 'id')
+
+
+def get_page_context(queryset, request, keys=DEFAULT_KEYS):
+    """Страница ленты: по курсору, если он передан, иначе по номеру."""
+    cursor = request.GET.get(CURSOR_PARAM)
+    if cursor is not None:
+        paginator = CursorPaginator(queryset, PER_PAGE, keys)
+        page_obj = paginator.get_page(cursor)
+        return {
+            'paginator': paginator,
+            'page_number': None,
+            'page_obj': page_obj,
+            'next_cursor': page_obj.next_cursor,
+            'previous_cursor': page_obj.previous_cursor,
+        }
+    paginator = CappedPaginator(queryset, PER_PAGE, MAX_PAGE_NUMBER)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    next_cursor = None
+    if (
+        paginator.truncated
+        and page_obj.number == paginator.num_pages
+        and len(page_obj)
+    ):
+        # Дальше номерных страниц нет — продолжаем курсором
+        next_cursor = encode_cursor(page_obj[-1], keys)
     return {
         'paginator': paginator,
         'page_number': page_number,
         'page_obj': page_obj,
+        'next_cursor': next_cursor,
+        'previous_cursor': None,
     }
 
 
-@cache_page(20)
+@conditional_page(feed_etag, feed_last_modified)
+@feed_cache_page()
 def index(request):
-    post_list = Post.objects.all()
+    post_list = Post.objects.select_related('author', 'group')
     context = get_page_context(post_list, request)
     return render(request, 'posts/index.html', context)
 
 
+@conditional_page(feed_etag, feed_last_modified)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
+    # Группа уже известна менеджеру связи, догружаем только авторов
+    post_list = group.posts.select_related('author')
     context = {
         'post_list': post_list,
         'group': group,
@@ -41,10 +81,11 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional_page(profile_etag)
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
-    post_count = post_list.count()
+    post_list = author.posts.select_related('group')
+    post_count = get_stats(author).post_count
     if request.user.is_authenticated:
         following = Follow.objects.filter(
             user=request.user.id,
@@ -61,11 +102,22 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+def get_comments_page(post, request):
+    paginator = CursorPaginator(
+        post.comments.select_related('author'),
+        COMMENTS_PER_PAGE,
+        COMMENT_KEYS,
+    )
+    return paginator.get_page(request.GET.get(CURSOR_PARAM))
+
+
+@conditional_page(post_etag)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    post_count = Post.objects.filter(author__exact=post.author).count()
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), pk=post_id)
+    post_count = get_stats(post.author).post_count
     form = CommentForm(None)
-    comments = post.comments.all()
+    comments = get_comments_page(post, request)
     context = {
         'post': post,
         'post_count': post_count,
@@ -77,6 +129,16 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    # Фрагмент со следующей порцией комментариев для post_detail
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    context = {
+        'post': post,
+        'comments': get_comments_page(post, request),
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -84,14 +146,19 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.pub_date = datetime.datetime.now()
-        post.save()
+        images.describe(post)
+        # Пост, его счётчик и раскладка по лентам пишутся одной транзакцией
+        with transaction.atomic():
+            post.save()
+        if post.image:
+            transaction.on_commit(lambda: thumbnails.schedule(post.image.name))
         return redirect('posts:profile', username=request.user)
     return render(request, 'posts/create_post.html', {'form': form})
 
 
 @login_required
 def post_edit(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(Post.objects.select_related('author'), pk=post_id)
     if post.author != request.user:
         raise Http404("You are not allowed to edit this Post")
     is_edit = True
@@ -99,7 +166,11 @@ def post_edit(request, post_id):
         request.POST or None, files=request.FILES or None, instance=post)
     if form.is_valid():
         post = form.save(commit=False)
+        if 'image' in form.changed_data:
+            images.describe(post)
         post.save()
+        if post.image and 'image' in form.changed_data:
+            transaction.on_commit(lambda: thumbnails.schedule(post.image.name))
         return redirect('posts:post_detail', post_id)
     context = {'form': form, 'post': post, 'is_edit': is_edit}
     return render(request, 'posts/create_post.html', context)
@@ -119,9 +190,16 @@ def add_comment(request, post_id):
 
 
 @login_required
+@conditional_page(follow_etag)
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    context = get_page_context(post_list, request)
+    # Лента читается из материализованной таблицы, см. posts/timeline.py
+    post_list = Post.objects.filter(
+        timeline_entries__user=request.user
+    ).select_related('author', 'group').annotate(
+        feed_date=F('timeline_entries__pub_date'),
+        feed_post=F('timeline_entries__post'),
+    ).order_by(F('feed_date').desc(), F('feed_post').desc())
+    context = get_page_context(post_list, request, FOLLOW_KEYS)
     return render(request, 'posts/follow.html', context)
 
 
@@ -131,9 +209,10 @@ def profile_follow(request, username):
     follow_author = get_object_or_404(User, username=username)
     follow_user = request.user
     if follow_author != follow_user:
-        Follow.objects.get_or_create(
-            user=follow_user, author=follow_author
-        )
+        with transaction.atomic():
+            Follow.objects.get_or_create(
+                user=follow_user, author=follow_author
+            )
     return redirect('posts:profile', username=follow_author.username)
 
 
@@ -147,3 +226,13 @@ def profile_unfollow(request, username):
             user=follow_user, author=follow_author
         ).delete()
     return redirect('posts:profile', username=follow_author.username)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        page_obj = search_posts(
+            query, request.GET.get(CURSOR_PARAM), PER_PAGE)
+    context = {'query': query, 'page_obj': page_obj}
+    return render(request, 'posts/search.html', context)
@@ -14,8 +14,16 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.getenv('SECRET_KEY')
 
+# Профиль выбирается переменной окружения: development (по умолчанию)
+# или production. В production выключены отладка и debug_toolbar,
+# шаблоны кэшируются, соединения с базой переиспользуются, а SQLite
+# настраивается прагмами (core/database.py). Проверка настроек на
+# производительность: manage.py perf_check
+YATUBE_PROFILE = os.getenv('YATUBE_PROFILE', 'development')
+PRODUCTION = YATUBE_PROFILE == 'production'
+
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = not PRODUCTION
 
 ALLOWED_HOSTS = [
     'localhost',
@@ -23,6 +31,8 @@ ALLOWED_HOSTS = [
     '[::1]',
     'testserver',
 ]
+if os.getenv('ALLOWED_HOSTS'):
+    ALLOWED_HOSTS += os.getenv('ALLOWED_HOSTS').split(',')
 
 INTERNAL_IPS = [
     '127.0.0.1',
@@ -40,20 +50,27 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    # Первым, чтобы в метрики попадало время всех остальных слоёв
+    'core.metrics.MetricsMiddleware',
+    'core.slow_queries.SlowQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # После аутентификации: флаг ?_profile= доступен только сотрудникам
+    'core.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
@@ -61,10 +78,9 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
+        'APP_DIRS': not PRODUCTION,
         'OPTIONS': {
             'context_processors': [
-                'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
@@ -73,6 +89,17 @@ TEMPLATES = [
         },
     },
 ]
+if PRODUCTION:
+    # Шаблоны компилируются один раз на процесс
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+else:
+    TEMPLATES[0]['OPTIONS']['context_processors'].insert(
+        0, 'django.template.context_processors.debug')
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
@@ -84,9 +111,27 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Сколько секунд держать соединение между запросами; 0 — новое
+        # соединение на каждый запрос
+        'CONN_MAX_AGE': int(os.getenv(
+            'DB_CONN_MAX_AGE', 600 if PRODUCTION else 0)),
+        'OPTIONS': {
+            'timeout': 20,
+        },
     }
 }
 
+# Прагмы для каждого нового соединения с SQLite (core/database.py):
+# WAL не блокирует чтения на время записи, а synchronous=NORMAL в WAL
+# не теряет целостность при сбое процесса
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+} if PRODUCTION else {}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -142,8 +187,67 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# В production сессия читается из кэша, а не запросом к базе
+SESSION_ENGINE = (
+    'django.contrib.sessions.backends.cached_db' if PRODUCTION
+    else 'django.contrib.sessions.backends.db')
+
+# Общий для всех воркеров кэш в файле SQLite (core/cache/sqlite.py):
+# сброс поколений ленты и версий карточек виден всем процессам сразу
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.sqlite.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'default.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
     }
 }
+
+# Метрики для Prometheus (core/metrics.py): счётчики процесса раз в
+# METRICS_FLUSH_INTERVAL секунд складываются в общий файл SQLite
+METRICS_DB = os.path.join(BASE_DIR, 'cache', 'metrics.sqlite3')
+METRICS_FLUSH_INTERVAL = 5
+# За обратным прокси REMOTE_ADDR у всех запросов один и тот же, поэтому
+# там /metrics закрывается токеном: Authorization: Bearer <METRICS_TOKEN>.
+# Без токена доступ только с METRICS_ALLOWED_IPS
+METRICS_ALLOWED_IPS = INTERNAL_IPS
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Журнал медленных SQL-запросов (core/slow_queries.py): EXPLAIN и запись
+# в лог — не чаще раза в SLOW_QUERY_RATE_LIMIT секунд на отпечаток
+SLOW_QUERY_DB = os.path.join(BASE_DIR, 'cache', 'slow_queries.sqlite3')
+SLOW_QUERY_THRESHOLD_MS = 100
+SLOW_QUERY_RATE_LIMIT = 60
+
+# Профилирование по требованию (core/profiling.py): заголовок X-Profile с
+# токеном из manage.py profile_token или ?_profile=1 от сотрудника
+PROFILE_SPOOL_DIR = os.path.join(BASE_DIR, 'cache', 'profiles')
+PROFILE_SPOOL_LIMIT = 200
+PROFILE_TOKEN_MAX_AGE = 60 * 60
+PROFILE_SAMPLE_INTERVAL = 0.005
+
+# Материализованная лента подписок (posts/timeline.py)
+TIMELINE_SYNC_FANOUT_LIMIT = 500
+TIMELINE_BACKFILL_SIZE = 200
+TIMELINE_FANOUT_WORKERS = 2
+
+# Страховочный таймаут кэша ленты; свежесть обеспечивает поколение
+# ленты (posts/feed_cache.py), которое меняется при изменении постов
+FEED_CACHE_TIMEOUT = 60 * 60
+
+# Таймаут кэша карточек постов (posts/fragments.py)
+CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Миниатюры создаются в фоновом пуле процессов, а не в запросе
+# (posts/thumbnails.py)
+THUMBNAIL_BACKEND = 'posts.thumbnails.DeferredThumbnailBackend'
+THUMBNAIL_WORKERS = 2
+
+# Загруженные картинки проверяются по заголовку и пережимаются в пуле
+# процессов до сохранения (posts/uploads.py)
+POST_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40_000_000
+POST_IMAGE_MAX_SIDE = 2560
+POST_IMAGE_TIMEOUT = 20
+POST_IMAGE_WORKERS = 2